@@ -0,0 +1,26 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: throughput of the content generator, per content type.
+
+Usage: python -m benchmarks.file_content
+'''
+import os
+import sys
+import tempfile
+import time
+
+from procsim.core.file_content import CONTENT_TYPES, ContentGenerator, _MB
+
+
+if __name__ == '__main__':
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    for content in CONTENT_TYPES:
+        generator = ContentGenerator(content, seed=0)
+        with tempfile.NamedTemporaryFile(prefix='tmp_procsim_') as f:
+            start = time.perf_counter()
+            generator.write(f, size_mb * _MB)
+            f.flush()
+            os.fsync(f.fileno())
+            elapsed = time.perf_counter() - start
+        print('{:8} {:6} MB in {:6.3f} s, {:8.1f} MB/s'.format(content, size_mb, elapsed, size_mb / elapsed))
@@ -0,0 +1,37 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: data takes of 10 to 40 minutes during a year, queried for 2000
+periods of 15 minutes, with a linear scan and with the index.
+
+Usage: python -m benchmarks.interval_index
+'''
+import datetime
+import random
+import time
+
+from procsim.core.interval_index import IntervalIndex
+
+
+if __name__ == '__main__':
+    rnd = random.Random(1)
+    t = datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc)
+    intervals = []
+    while len(intervals) < 10000:
+        t += datetime.timedelta(minutes=rnd.uniform(10, 60))
+        stop = t + datetime.timedelta(minutes=rnd.uniform(10, 40))
+        intervals.append((t, stop, len(intervals)))
+        t = stop
+    index = IntervalIndex(intervals)
+    periods = [(t, t + datetime.timedelta(minutes=15)) for t in
+               sorted(intervals[0][0] + (t - intervals[0][0]) * rnd.random() for _ in range(2000))]
+
+    t0 = time.perf_counter()
+    scanned = [[i for i in intervals if i[0] <= end and i[1] >= start] for start, end in periods]
+    elapsed_scan = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    indexed = [index.overlapping(start, end) for start, end in periods]
+    elapsed_index = time.perf_counter() - t0
+    assert scanned == indexed
+    print('{} intervals, {} queries: scan {:.1f} ms, index {:.1f} ms'.format(
+        len(intervals), len(periods), elapsed_scan * 1000, elapsed_index * 1000))
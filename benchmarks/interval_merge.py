@@ -0,0 +1,46 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: a day of partial slices of 3 sensors, 5 to 60 s each, in random
+order, merged with the former per key sort and pairwise check, and by the
+sweep.
+
+Usage: python -m benchmarks.interval_merge
+'''
+import datetime
+import random
+import time
+from typing import Dict
+
+from procsim.core.interval_merge import merge_intervals
+
+
+if __name__ == '__main__':
+    rnd = random.Random(1)
+    day_start = datetime.datetime(2023, 4, 11, tzinfo=datetime.timezone.utc)
+    partials = []
+    for sensor in ('HR1', 'HR2', 'LR'):
+        t = day_start
+        while t < day_start + datetime.timedelta(days=1):
+            key = (1 + (t - day_start) // datetime.timedelta(minutes=100), sensor, None)
+            stop = t + datetime.timedelta(seconds=rnd.uniform(5, 60))
+            partials.append((key, t, stop, ('on_grid', 'on_grid')))
+            t = stop
+    rnd.shuffle(partials)
+
+    t0 = time.perf_counter()
+    key_periods: Dict = {}
+    for key, start, stop, (start_pos, stop_pos) in partials:
+        key_periods.setdefault(key, []).append((start, stop, start_pos, stop_pos))
+    pairwise = {}
+    for key, periods in key_periods.items():
+        periods = sorted(periods)
+        if all(periods[i + 1][0] <= periods[i][1] for i in range(len(periods) - 1)):
+            pairwise[key] = (periods[0][0], periods[-1][1])
+    elapsed_pairwise = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    swept = {key: coverage.spans[0] for key, coverage in merge_intervals(partials).items() if coverage.is_contiguous}
+    elapsed_sweep = time.perf_counter() - t0
+    assert pairwise == swept
+    print('{} partials, {} keys: pairwise {:.1f} ms, sweep {:.1f} ms'.format(
+        len(partials), len(swept), elapsed_pairwise * 1000, elapsed_sweep * 1000))
@@ -0,0 +1,172 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: generate the virtual frames of a 24 hour data take with the batch
+writer, and with the former per frame path that sets up the header for every
+frame, serializing via minidom or directly. Then generate stripmap products
+with the former file by file path, and with the file tree materializer and 1
+or 4 output workers, and parse them as stack inputs with 1 or 4 input workers.
+Checks that the outputs are identical.
+
+Usage: python -m benchmarks.level1_product_generator
+'''
+import datetime
+import filecmp
+import os
+import tempfile
+import time
+import xml.dom.minidom as md
+from typing import List, Optional
+from xml.etree import ElementTree as et
+
+from procsim.biomass import constants
+from procsim.biomass.level1_product_generator import Frame, Level1PreProcessor, Level1Stack, Level1Stripmap
+from procsim.core.job_order import JobOrderInput
+
+
+if __name__ == '__main__':
+    class _Logger:
+        def debug(self, *args, **kwargs):
+            pass
+
+        info = warning = error = debug
+
+    class _PerFramePreProcessor(Level1PreProcessor):
+        def _write_frame_products(self, frames: List[Frame]) -> None:
+            for frame in frames:
+                self._hdr.acquisitions[0].slice_frame_nr = frame.id
+                self._hdr.set_phenomenon_times(frame.sensing_start, frame.sensing_stop)
+                self._hdr.set_validity_times(frame.sensing_start, frame.sensing_stop)
+                self._frame_status = frame.status
+                self._generate_product()
+
+    class _MinidomPreProcessor(_PerFramePreProcessor):
+        def _generate_xml(self, file_name: str, frame: Optional[Frame] = None) -> str:
+            dom = md.parseString(et.tostring(self._create_xml_tree(file_name, frame), encoding='unicode'))
+            return dom.toprettyxml(indent='    ')
+
+    # Slices are numbered from each ANX, the data take covers whole orbits.
+    data_take_start = datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc)
+    nr_orbits = round(datetime.timedelta(hours=24) / constants.ORBITAL_PERIOD)
+    nr_slices_per_orbit = int(constants.ORBITAL_PERIOD / constants.SLICE_GRID_SPACING)
+    anx_list = [data_take_start + i * constants.ORBITAL_PERIOD for i in range(nr_orbits)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_paths = []
+        for name, generator_class in (('minidom', _MinidomPreProcessor), ('per frame', _PerFramePreProcessor),
+                                      ('batch', Level1PreProcessor)):
+            output_path = os.path.join(tmp_dir, name)
+            config = {
+                'output_path': output_path,
+                'baseline': 0,
+                'type': 'CPF_L1VFRA',
+                'source_L0S': 'L0S',
+                'source_L0M': 'L0M',
+                'source_AUX_ORB': 'AUX_ORB',
+                'anx': [anx.strftime('%Y-%m-%dT%H:%M:%S.%fZ') for anx in anx_list],
+                'creation_date': '2021-02-02T00:00:00.000Z',
+            }
+            gen = generator_class(_Logger(), None, config, config)
+            gen.read_scenario_parameters()
+            start = time.perf_counter()
+            for anx in anx_list:
+                for i in range(nr_slices_per_orbit):
+                    slice_start = anx + i * constants.SLICE_GRID_SPACING
+                    slice_stop = slice_start + constants.SLICE_GRID_SPACING
+                    gen._hdr.acquisitions[0].slice_frame_nr = i + 1
+                    gen._hdr.set_phenomenon_times(slice_start, slice_stop)
+                    gen._hdr.set_validity_times(slice_start, slice_stop)
+                    gen._generate_frame_products()
+            elapsed = time.perf_counter() - start
+            nr_frames = len(os.listdir(output_path))
+            print('{:9} {} frames in {:.2f} s, {:.0f} frames/s'.format(name, nr_frames, elapsed, nr_frames / elapsed))
+            output_paths.append(output_path)
+        names = sorted(os.listdir(output_paths[0]))
+        identical = True
+        for output_path in output_paths[1:]:
+            _, mismatch, errors = filecmp.cmpfiles(output_paths[0], output_path, names, shallow=False)
+            identical = identical and names == sorted(os.listdir(output_path)) and not mismatch and not errors
+        print('identical' if identical else 'DIFFERENT')
+
+    class _PerFileStripmap(Level1Stripmap):
+        def _add_files_to_product(self, files, name_gen, base_dir):
+            nr_binfiles = sum(1 for file in files if file.extension != 'xml')
+            for file in files:
+                self._add_file_to_product(
+                    file_path=file.get_full_path(name_gen, base_dir),
+                    size_mb=0 if file.extension == 'xml' else self._size_mb // nr_binfiles,
+                    representation_path=file.representation.get_full_path(name_gen, base_dir) if file.representation else None
+                )
+
+    os.environ['CURRENT_UTC_DATETIME'] = '20210202T000000'
+    nr_products = 20
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_paths = []
+        for name, generator_class, workers in (('per file', _PerFileStripmap, 1), ('materializer', Level1Stripmap, 1),
+                                               ('4 workers', Level1Stripmap, 4)):
+            output_path = os.path.join(tmp_dir, name)
+            elapsed = 0.0
+            for i in range(nr_products):
+                start_time = data_take_start + i * constants.FRAME_GRID_SPACING
+                config = {
+                    'output_path': output_path,
+                    'baseline': 0,
+                    'type': 'S1_SCS__1S',
+                    'mission_phase': 'INTERFEROMETRIC',
+                    'data_take_id': 1,
+                    'begin_position': start_time.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                    'end_position': (start_time + constants.FRAME_GRID_SPACING).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                    'creation_date': '2021-02-02T00:00:00.000Z',
+                    'processor_name': 'benchmark',
+                    'processor_version': '01.00',
+                    'size': 11,
+                    'content': 'pattern',
+                    'content_seed': 1,
+                    'checksums': ['md5'],
+                    'output_workers': workers,
+                }
+                gen = generator_class(_Logger(), None, config, config)
+                gen.read_scenario_parameters()
+                start = time.perf_counter()
+                gen.generate_output()
+                elapsed += time.perf_counter() - start
+            print('{:12} {} products in {:.2f} s, {:.1f} products/s'.format(name, nr_products, elapsed, nr_products / elapsed))
+            output_paths.append(output_path)
+        trees = []
+        for output_path in output_paths:
+            tree = {}
+            for dir_path, _, file_names in os.walk(output_path):
+                for file_name in file_names:
+                    with open(os.path.join(dir_path, file_name), 'rb') as f:
+                        tree[os.path.relpath(os.path.join(dir_path, file_name), output_path)] = f.read()
+            trees.append(tree)
+        print('identical' if trees[0] == trees[1] == trees[2] else 'DIFFERENT')
+
+        # Parse the stripmap products as the inputs of a stack, with 1 or 4
+        # input workers. The sanity check warnings must be in input order.
+        class _RecordingLogger(_Logger):
+            def __init__(self):
+                self.warnings = []
+
+            def warning(self, *args, **kwargs):
+                self.warnings.append(args)
+
+        scs_input = JobOrderInput()
+        scs_input.file_type = 'S1_SCS__1S'
+        scs_input.file_names = sorted(os.path.join(output_paths[0], name) for name in os.listdir(output_paths[0]))
+        results = []
+        for workers in (1, 4):
+            config = {
+                'output_path': tmp_dir,
+                'baseline': 0,
+                'type': 'S1_STA__1S',
+                'metadata_source': '.*_SCS__1S_',
+                'input_workers': workers,
+            }
+            logger = _RecordingLogger()
+            gen = Level1Stack(logger, None, config, config)
+            start = time.perf_counter()
+            gen.parse_inputs([scs_input])
+            elapsed = time.perf_counter() - start
+            print('{} input workers: {} inputs in {:.3f} s'.format(workers, len(scs_input.file_names), elapsed))
+            results.append(logger.warnings)
+        print('identical' if results[0] == results[1] else 'DIFFERENT')
@@ -0,0 +1,74 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: ANX times from an orbit file with 10 second OSVs over 30 days:
+streaming, with the former parse of the complete tree, from the index and from
+the process cache.
+
+Usage: python -m benchmarks.orbit_prediction
+'''
+import datetime
+import os
+import resource
+import tempfile
+import time
+from xml.etree import ElementTree as et
+
+from procsim.core import timestamps
+from procsim.core.mph_index import MphIndex
+from procsim.core.orbit_prediction import _anx_lists, iter_anx_times, read_anx_list
+
+
+if __name__ == '__main__':
+    start = datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc)
+    osv = '''      <OSV>
+        <TAI>TAI=1</TAI>
+        <UTC>UTC={}</UTC>
+        <UT1>UT1=1</UT1>
+        <Absolute_Orbit>+00001</Absolute_Orbit>
+        <X unit="m">-1234567.890</X>
+        <Y unit="m">-1234567.890</Y>
+        <Z unit="m">+1234567.890</Z>
+        <VX unit="m/s">+1234.567890</VX>
+        <VY unit="m/s">-1234.567890</VY>
+        <VZ unit="m/s">+1234.567890</VZ>
+        <Quality>0000000000000</Quality>
+      </OSV>
+'''
+    nr_osvs = 30 * 24 * 360
+
+    def parse_tree(file_name):
+        root = et.parse(file_name).getroot()
+        ns = {'d': root.tag[1:root.tag.index('}')]}
+        return sorted(timestamps.from_iso(utc.text[4:])
+                      for utc in root.findall('d:Data_Block/d:List_of_OSVs/d:OSV/d:UTC', ns))
+
+    with tempfile.TemporaryDirectory() as dir:
+        file_name = os.path.join(dir, 'AUX_ORB.EOF')
+        with open(file_name, 'w') as f:
+            f.write('<?xml version="1.0" ?>\n<Earth_Explorer_File xmlns="http://eop-cfi.esa.int/CFI">\n'
+                    '  <Data_Block type="xml">\n    <List_of_OSVs count="{}">\n'.format(nr_osvs))
+            for i in range(nr_osvs):
+                f.write(osv.format(timestamps.to_iso(start + datetime.timedelta(seconds=10 * i))[:-1]))
+            f.write('    </List_of_OSVs>\n  </Data_Block>\n</Earth_Explorer_File>\n')
+        print('{} OSVs, {:.0f} MB'.format(nr_osvs, os.path.getsize(file_name) / 2**20))
+
+        index = MphIndex(os.path.join(dir, 'index.db'))
+        cases = [
+            ('streaming', lambda: sorted(iter_anx_times(file_name))),
+            ('tree', lambda: parse_tree(file_name)),
+            ('index store', lambda: read_anx_list(file_name, index)),
+            ('index', lambda: (_anx_lists.clear(), read_anx_list(file_name, index))[1]),
+            ('process cache', lambda: read_anx_list(file_name, index)),
+        ]
+        expected = None
+        for name, read in cases:
+            t0 = time.perf_counter()
+            result = read()
+            elapsed = time.perf_counter() - t0
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            print('{:14} {:8.1f} ms, peak RSS so far {:5.0f} MB'.format(name, elapsed * 1000, maxrss))
+            expected = expected or result
+            assert result == expected
+            del result
+        index.close()
@@ -0,0 +1,29 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: slice numbers of the slices in 10 days, one lookup at a time and in
+one batch.
+
+Usage: python -m benchmarks.orbit_timeline
+'''
+import datetime
+import time
+
+from procsim.core.orbit_timeline import OrbitTimeline
+
+
+if __name__ == '__main__':
+    orbital_period = datetime.timedelta(seconds=5940)
+    spacing = datetime.timedelta(seconds=108)
+    anx0 = datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc)
+    timeline = OrbitTimeline([anx0 + i * orbital_period for i in range(150)], orbital_period)
+    times = [anx0 + spacing / 2 + i * spacing for i in range(8000)]
+
+    start = time.perf_counter()
+    single = [(timeline.anx_orbit(t), timeline.slice_frame_nr(t, spacing)) for t in times]
+    elapsed_single = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = timeline.positions(times, spacing)
+    elapsed_batch = time.perf_counter() - start
+    assert [(anx, index, nr) for (anx, index), nr in single] == batch
+    print('{} times: single {:.2f} ms, batch {:.2f} ms'.format(len(times), elapsed_single * 1000, elapsed_batch * 1000))
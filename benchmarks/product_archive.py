@@ -0,0 +1,41 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: time to read the MPH of a zipped product, compared to unpacking the
+archive.
+
+Usage: python -m benchmarks.product_archive [size_mb]
+'''
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from procsim.core.product_archive import ProductArchive
+from procsim.core.zip_writer import ZipArchiveWriter
+
+
+if __name__ == '__main__':
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    CHUNK = os.urandom(2**20)
+    with tempfile.TemporaryDirectory(dir='.') as tmp_dir:
+        product_dir = os.path.join(tmp_dir, 'PRODUCT')
+        archive = ZipArchiveWriter(product_dir + '.zip', product_dir)
+        with archive.open(os.path.join(product_dir, 'data.dat'), size_mb * 2**20) as f:
+            for _ in range(size_mb):
+                f.write(CHUNK)
+        with archive.open(os.path.join(product_dir, 'product.xml')) as f:
+            f.write(b'<?xml version="1.0"?>\n<product/>\n')
+        archive.close()
+
+        start = time.perf_counter()
+        with ProductArchive(product_dir + '.zip') as product, product.open('product.xml') as f:
+            f.read()
+        print('{:24} {:6} MB in {:7.3f} s'.format('read MPH member', size_mb, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        shutil.unpack_archive(product_dir + '.zip', tmp_dir, 'zip')
+        with open(os.path.join(product_dir, 'product.xml'), 'rb') as f:
+            f.read()
+        print('{:24} {:6} MB in {:7.3f} s'.format('unpack archive', size_mb, time.perf_counter() - start))
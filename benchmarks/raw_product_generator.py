@@ -0,0 +1,71 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: slice a data take of one orbit into zipped products with checksums,
+written one by one and by 4 output workers. Checks that the outputs are
+identical.
+
+Usage: python -m benchmarks.raw_product_generator
+'''
+import datetime
+import filecmp
+import os
+import tempfile
+import time
+
+from procsim.biomass import constants
+from procsim.biomass.raw_product_generator import RAWSxxx_10
+
+
+if __name__ == '__main__':
+    class _Logger:
+        def debug(self, *args, **kwargs):
+            pass
+
+        info = warning = error = debug
+
+    # Fixed time stamps of the zip members.
+    os.environ['CURRENT_UTC_DATETIME'] = '20210202T000000'
+    data_take_start = datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc)
+    data_take_stop = data_take_start + constants.ORBITAL_PERIOD
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_paths = []
+        for workers in (1, 4):
+            output_path = os.path.join(tmp_dir, str(workers))
+            config = {
+                'output_path': output_path,
+                'type': 'RAWS025_10',
+                'processor_name': 'benchmark',
+                'processor_version': '01.00',
+                'baseline': 10,
+                'creation_date': '2021-02-02T00:00:00.000Z',
+                'acquisition_date': '2021-02-01T00:00:00.000Z',
+                'acquisition_station': 'benchmark',
+                'num_isp': 0,
+                'num_isp_erroneous': 0,
+                'num_isp_corrupt': 0,
+                'anx': [data_take_start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')],
+                'data_take_id': 1,
+                'size': 8,
+                'content': 'pattern',
+                'content_seed': 1,
+                'checksums': ['md5', 'sha256'],
+                'zip_output': True,
+                'zip_compression': 'deflate',
+                'output_workers': workers,
+            }
+            gen = RAWSxxx_10(_Logger(), None, config, config)
+            gen._hdr.begin_position = data_take_start
+            gen._hdr.end_position = data_take_stop
+            gen.read_scenario_parameters()
+            start = time.perf_counter()
+            gen.generate_output()
+            elapsed = time.perf_counter() - start
+            nr_products = len(os.listdir(output_path))
+            print('{} worker(s): {} products in {:.2f} s, {:.1f} products/s'.format(
+                workers, nr_products, elapsed, nr_products / elapsed))
+            output_paths.append(output_path)
+        names = sorted(os.listdir(output_paths[0]))
+        _, mismatch, errors = filecmp.cmpfiles(output_paths[0], output_paths[1], names, shallow=False)
+        identical = names == sorted(os.listdir(output_paths[1])) and not mismatch and not errors
+        print('identical' if identical else 'DIFFERENT')
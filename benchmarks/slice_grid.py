@@ -0,0 +1,54 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: slices of segments of increasing length, in the middle of a 100 day
+ANX list and before it, with the former orbit by orbit enumeration and with
+the slice grid.
+
+Usage: python -m benchmarks.slice_grid
+'''
+import bisect
+import datetime
+import time
+
+from procsim.core.slice_grid import SliceGrid
+
+
+if __name__ == '__main__':
+    orbital_period = datetime.timedelta(seconds=5940)
+    spacing = datetime.timedelta(seconds=108)
+    anx0 = datetime.datetime(2021, 2, 1, tzinfo=datetime.timezone.utc)
+    anx_list = [anx0 + i * orbital_period for i in range(1455)]
+
+    def enumerate_slices(start, end):
+        anx = anx_list.copy()
+        while start < anx[0]:
+            anx.insert(0, anx[0] - orbital_period)
+        while end > anx[-1]:
+            anx.append(anx[-1] + orbital_period)
+        idx_start = bisect.bisect_right(anx, start) - 1
+        idx_end = bisect.bisect_left(anx, end) + 1
+        slices = []
+        slices_per_orbit = int(round(orbital_period / spacing))
+        for a in anx[idx_start:idx_end - 1]:
+            slices.extend([(a + i * spacing, a + (i + 1) * spacing) for i in range(slices_per_orbit)])
+        return [s for s in slices if s[1] >= start and s[0] <= end]
+
+    grid = SliceGrid(anx_list, orbital_period, spacing)
+    cases = [(anx_list[700] - datetime.timedelta(days=days / 2) + datetime.timedelta(seconds=17), days)
+             for days in (0.01, 1, 10, 50)]
+    # Extrapolated ANX, 30 days before the first one.
+    cases.append((anx0 - datetime.timedelta(days=30, seconds=-17), 0.01))
+    for start, days in cases:
+        end = start + datetime.timedelta(days=days)
+        timings = []
+        for query in (enumerate_slices, grid.overlapping_slices):
+            count = 0
+            t0 = time.perf_counter()
+            while time.perf_counter() - t0 < 0.5:
+                result = query(start, end)
+                count += 1
+            timings.append((time.perf_counter() - t0) / count)
+        assert enumerate_slices(start, end) == grid.overlapping_slices(start, end)
+        print('{:6} days {:7} slices: enumerate {:9.3f} ms, grid {:9.3f} ms'.format(
+            days, len(result), timings[0] * 1000, timings[1] * 1000))
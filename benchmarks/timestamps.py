@@ -0,0 +1,63 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: parse 1M timestamps, unique and repeated, with strptime() and with
+procsim.core.timestamps, and MPH parse/write round trips per second.
+
+Usage: python -m benchmarks.timestamps [count]
+'''
+import datetime
+import io
+import os
+import sys
+import time as timer
+
+from procsim.biomass import main_product_header as biomass_mph
+from procsim.core.timestamps import COMPACT_FORMAT, ISO_FORMAT, _UTC, from_compact, from_iso
+from procsim.flex import main_product_header as flex_mph
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    start_time = datetime.datetime(2021, 2, 1, tzinfo=_UTC)
+    step = datetime.timedelta(seconds=1, microseconds=1)
+    unique = [(start_time + i * step).strftime(ISO_FORMAT) + 'Z' for i in range(count)]
+    repeated = [unique[i % 1000] for i in range(count)]
+    unique_compact = [(start_time + i * step).strftime(COMPACT_FORMAT) for i in range(count)]
+
+    def strptime_iso(timestr):
+        return datetime.datetime.strptime(timestr[:-1], ISO_FORMAT).replace(tzinfo=_UTC)
+
+    def strptime_compact(timestr):
+        return datetime.datetime.strptime(timestr, COMPACT_FORMAT).replace(tzinfo=_UTC)
+
+    for name, parse, timestrs in (('strptime, ISO, unique', strptime_iso, unique),
+                                  ('codec, ISO, unique', from_iso, unique),
+                                  ('strptime, ISO, repeated', strptime_iso, repeated),
+                                  ('codec, ISO, repeated', from_iso, repeated),
+                                  ('strptime, compact, unique', strptime_compact, unique_compact),
+                                  ('codec, compact, unique', from_compact, unique_compact)):
+        start = timer.perf_counter()
+        for timestr in timestrs:
+            parse(timestr)
+        elapsed = timer.perf_counter() - start
+        print('{:28} {:6.2f} s {:10.0f} timestamps/s'.format(name, elapsed, len(timestrs) / elapsed))
+
+    procsim_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'procsim')
+    samples = [
+        ('biomass', biomass_mph.MainProductHeader,
+         'biomass/test/bio_s2_scs__1s_20230101t120000_20230101t120021_i_g03_m03_c03_t131_f155_01_acz976.xml'),
+        ('flex', flex_mph.MainProductHeader,
+         'flex/test/flx_l0__obs____20170101t060301_20170101t060601_20230112t140940_0180_012_046_0180_1b01.xml'),
+    ]
+    nr_round_trips = max(count // 1000, 1)
+    for mission, header_class, path in samples:
+        with open(os.path.join(procsim_dir, path), 'rb') as f:
+            data = f.read()
+        start = timer.perf_counter()
+        for _ in range(nr_round_trips):
+            hdr = header_class()
+            hdr.parse(io.BytesIO(data))
+            hdr.write(io.BytesIO())
+        elapsed = timer.perf_counter() - start
+        print('{:28} {:10.0f} round trips/s'.format(mission + ' MPH', nr_round_trips / elapsed))
@@ -0,0 +1,30 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: full and selective (streaming) parse of the test MPHs, in MPHs per
+second.
+
+Usage: python -m benchmarks.utils [count]
+'''
+import glob
+import os
+import sys
+import time
+
+from procsim.biomass import main_product_header as biomass_mph
+from procsim.flex import main_product_header as flex_mph
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    procsim_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'procsim')
+    for mission, header_class in (('biomass', biomass_mph.MainProductHeader), ('flex', flex_mph.MainProductHeader)):
+        for path in sorted(glob.glob(os.path.join(procsim_dir, mission, 'test', '*.xml'))):
+            for name, fields in (('full', None),
+                                 ('begin/end', ['begin_position', 'end_position']),
+                                 ('product type', ['product_type'])):
+                start = time.perf_counter()
+                for _ in range(count):
+                    header_class().parse(path, fields)
+                elapsed = time.perf_counter() - start
+                print('{:8} {:13} {:8.0f} MPHs/s'.format(mission, name, count / elapsed))
@@ -0,0 +1,34 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: main product headers per second, rendered from a template and
+serialized with ElementTree.
+
+Usage: python -m benchmarks.xml_template [count]
+'''
+import io
+import os
+import sys
+import time
+
+from procsim.biomass import main_product_header as biomass_mph
+from procsim.flex import main_product_header as flex_mph
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    procsim_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'procsim')
+    samples = [
+        ('biomass', biomass_mph.MainProductHeader(),
+         'biomass/test/bio_s2_scs__1s_20230101t120000_20230101t120021_i_g03_m03_c03_t131_f155_01_acz976.xml'),
+        ('flex', flex_mph.MainProductHeader(),
+         'flex/test/flx_l0__obs____20170101t060301_20170101t060601_20230112t140940_0180_012_046_0180_1b01.xml'),
+    ]
+    for mission, hdr, path in samples:
+        hdr.parse(os.path.join(procsim_dir, path))
+        for name, write in (('element tree', hdr.write_element_tree), ('template', hdr.write)):
+            start = time.perf_counter()
+            for _ in range(count):
+                write(io.BytesIO())
+            elapsed = time.perf_counter() - start
+            print('{:8} {:13} {:8.0f} MPHs/s'.format(mission, name, count / elapsed))
@@ -0,0 +1,48 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Benchmark: wall time to create a zipped product with a random payload, per
+compression policy, compared to zipping a staged directory.
+
+Usage: python -m benchmarks.zip_writer [size_mb], e.g. 5120 for 5 GB.
+'''
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from procsim.core.zip_writer import COMPRESSION_POLICIES, ZipArchiveWriter
+
+
+if __name__ == '__main__':
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    CHUNK = os.urandom(2**20)
+
+    def write_product(product_dir, open_file):
+        with open_file(os.path.join(product_dir, 'measurement', 'data.dat'), size_mb * 2**20) as f:
+            for _ in range(size_mb):
+                f.write(CHUNK)
+        with open_file(os.path.join(product_dir, 'product.xml'), None) as f:
+            f.write(b'<?xml version="1.0"?>\n<product>' + b'<item>text</item>' * 10000 + b'</product>\n')
+
+    def open_on_disk(path, size):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, 'wb')
+
+    with tempfile.TemporaryDirectory(dir='.') as tmp_dir:
+        product_dir = os.path.join(tmp_dir, 'PRODUCT')
+        start = time.perf_counter()
+        write_product(product_dir, open_on_disk)
+        shutil.make_archive(product_dir, 'zip', tmp_dir, 'PRODUCT')
+        shutil.rmtree(product_dir)
+        print('{:24} {:6} MB in {:7.3f} s'.format('staged + make_archive', size_mb, time.perf_counter() - start))
+        os.remove(product_dir + '.zip')
+
+        for compression in COMPRESSION_POLICIES:
+            start = time.perf_counter()
+            archive = ZipArchiveWriter(product_dir + '.zip', product_dir, compression)
+            write_product(product_dir, archive.open)
+            archive.close()
+            print('{:24} {:6} MB in {:7.3f} s'.format('streamed, ' + compression, size_mb, time.perf_counter() - start))
+            os.remove(product_dir + '.zip')
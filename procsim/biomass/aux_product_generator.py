@@ -177,4 +177,4 @@ class Aux(product_generator.ProductGeneratorBase):
             self._add_file_to_product(file.get_full_path(name_gen, dir_name), self._size_mb // len(self._generated_files), representation_path)
 
         file_name = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_name)
+        self._write_mph(file_name)
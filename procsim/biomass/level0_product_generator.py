@@ -12,7 +12,7 @@ from procsim.biomass import constants
 from procsim.core.exceptions import ScenarioError
 from procsim.core.job_order import JobOrderInput
 
-from . import main_product_header, product_generator, product_name
+from . import main_product_header, product_generator
 
 _HDR_PARAMS = [
     # Level 0 only
@@ -111,14 +111,10 @@ class Sx_RAW__0x(product_generator.ProductGeneratorBase):
             if input.file_type in hv_products:
                 for file in input.file_names:
                     # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
+                    if not self._is_input_product(file):
                         continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName(self._compact_creation_date_epoch)
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
                     hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
+                    mph_file_name = self._parse_input_mph(file, hdr, ('begin_position', 'end_position'))
                     if hdr.begin_position is None or hdr.end_position is None:
                         raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
                     start = min(start, hdr.begin_position)
@@ -204,7 +200,7 @@ class Sx_RAW__0x(product_generator.ProductGeneratorBase):
         self._add_file_to_product(file_path, 0)
 
         file_path = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_path)
+        self._write_mph(file_path)
 
     def generate_output(self):
         super().generate_output()
@@ -300,14 +296,10 @@ class Sx_RAW__0M(product_generator.ProductGeneratorBase):
         for input in input_products:
             for file in input.file_names:
                 # Skip non-directory products. These have already been parsed in the superclass.
-                if not os.path.isdir(file):
+                if not self._is_input_product(file):
                     continue
-                gen = product_name.ProductName(self._compact_creation_date_epoch)
-                gen.parse_path(file)
-                # Derive mph file name from product name, parse header
                 hdr = self._hdr
-                mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-                hdr.parse(mph_file_name)
+                mph_file_name = self._parse_input_mph(file, hdr)
                 if hdr.begin_position is None or hdr.end_position is None:
                     raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
                 input_id = hdr.acquisitions[0].data_take_id
@@ -375,7 +367,7 @@ class Sx_RAW__0M(product_generator.ProductGeneratorBase):
         self._add_file_to_product(file_name, 0)
 
         file_name = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_name)
+        self._write_mph(file_name)
 
 
 class AC_RAW__0A(product_generator.ProductGeneratorBase):
@@ -474,4 +466,4 @@ class AC_RAW__0A(product_generator.ProductGeneratorBase):
         file_path = os.path.join(dir_name, name_gen.generate_binary_file_name())
         self._add_file_to_product(file_path, self._size_mb)
         file_path = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_path)
+        self._write_mph(file_path)
@@ -4,19 +4,19 @@ Copyright (C) 2021 S[&]T, The Netherlands.
 Biomass Level 1 product generators,
 format according to BIO-ESA-EOPG-EEGS-TN-0044
 '''
+import copy
 import datetime
 import os
-import xml.dom.minidom as md
 from enum import Enum
 from typing import Iterable, List, Optional, Tuple
 from xml.etree import ElementTree as et
 
 import re
-from procsim.core import utils
+from procsim.core import timestamps, utils
 from procsim.core.exceptions import ScenarioError
 from procsim.core.job_order import JobOrderInput
 
-from . import constants, main_product_header, product_generator, product_name, product_types
+from . import constants, product_generator, product_name, product_types
 from .product_generator import GeneratedFile
 
 _L1_SCS_PRODUCTS = ['S1_SCS__1S', 'S2_SCS__1S', 'S3_SCS__1S']
@@ -217,14 +217,7 @@ class Level1PreProcessor(product_generator.ProductGeneratorBase):
         frames = self._generate_frames(slice_start, acq_start, acq_end, first_frame_nr)
 
         # Generate the virtual frame products.
-        for frame in frames:
-            # These are the only relevant fields for the virtual frame file.
-            self._hdr.acquisitions[0].slice_frame_nr = frame.id
-            self._hdr.set_phenomenon_times(frame.sensing_start, frame.sensing_stop)
-            self._hdr.set_validity_times(frame.sensing_start, frame.sensing_stop)  # Virtual frames only contain sensing time.
-            self._frame_status = frame.status
-
-            self._generate_product()
+        self._write_frame_products(frames)
 
     def _align_slice_times(self, start: datetime.datetime, stop: datetime.datetime) -> Tuple[datetime.datetime, datetime.datetime]:
         '''
@@ -284,16 +277,19 @@ class Level1PreProcessor(product_generator.ProductGeneratorBase):
         else:
             frame_range_end = acq_end
 
-        # Create list of frames that covers the entire acquisition range.
-        frames: List[Frame] = []
-        frame_start = slice_start + (frame_range_start - slice_start) // self._frame_grid_spacing * self._frame_grid_spacing
-        while frame_start < frame_range_end - constants.FRAME_OVERLAP:
-            id = first_frame_nr + (frame_start - slice_start) // self._frame_grid_spacing
-            frames.append(Frame(id=id,
-                                sensing_start=frame_start,
-                                sensing_stop=frame_start + self._frame_grid_spacing + constants.FRAME_OVERLAP,
-                                status=FrameStatus.NOMINAL))
-            frame_start += self._frame_grid_spacing
+        # Create list of frames that covers the entire acquisition range. The
+        # frames on the grid are counted from the slice start: the first one
+        # contains the range start, the last one starts before the range end
+        # minus the overlap.
+        spacing = self._frame_grid_spacing
+        first_index = (frame_range_start - slice_start) // spacing
+        end_index = -((slice_start - frame_range_end + constants.FRAME_OVERLAP) // spacing)
+        frame_length = spacing + constants.FRAME_OVERLAP
+        frames = [Frame(id=first_frame_nr + index,
+                        sensing_start=slice_start + index * spacing,
+                        sensing_stop=slice_start + index * spacing + frame_length,
+                        status=FrameStatus.NOMINAL)
+                  for index in range(first_index, end_index)]
 
         # Check first and last frames for partiality.
         if frames and frames[0].sensing_start < frame_range_start:
@@ -327,31 +323,72 @@ class Level1PreProcessor(product_generator.ProductGeneratorBase):
         '''
         Construct and write an output file given the variables set in this class.
         '''
-        # Create a name generator, give it the right values and generate the product name.
-        name_gen = self._create_name_generator(self._hdr)
+        name_gen = self._prepare_frame_products()
+        self._write_frame_product(*self._frame_product(name_gen))
+
+    def _write_frame_products(self, frames: List[Frame]) -> None:
+        '''
+        Write a virtual frame product per frame. Only the frame fields differ
+        between the products; the header of the generator is not modified, so
+        the products do not depend on the order in which they are written.
+        '''
+        name_gen = self._prepare_frame_products()
+        for frame in frames:
+            self._write_frame_product(*self._frame_product(name_gen, frame))
+
+    def _prepare_frame_products(self) -> product_name.ProductName:
+        # Create the output directory, return the name generator of the
+        # products, set up from the header.
         if self._creation_date is None:
             self._creation_date = utils.get_current_utc_datetime()
+        name_gen = self._create_name_generator(self._hdr)
         name_gen.set_creation_date(self._creation_date)
         name_gen.file_class = self._file_class
         name_gen.baseline_identifier = self._hdr.product_baseline
-        file_name = name_gen.generate_path_name()
         os.makedirs(self._output_path, exist_ok=True)
-        full_file_name = os.path.join(self._output_path, file_name)
-
-        # Construct the contents of the XML file.
-        xml_string = self._generate_xml(file_name)
+        return name_gen
 
-        # Write to file.
+    def _frame_product(self, name_gen: product_name.ProductName, frame: Optional[Frame] = None) -> Tuple[str, str, Frame]:
+        '''
+        Return file name and contents of the virtual frame product of a frame,
+        or of the frame described by the header, and the frame.
+        '''
+        if frame is None:
+            file_name = name_gen.generate_path_name()
+            frame = self._header_frame()
+        else:
+            name_gen = copy.copy(name_gen)
+            name_gen.start_time = frame.sensing_start
+            name_gen.stop_time = frame.sensing_stop
+            name_gen.frame_slice_nr = frame.id
+            file_name = name_gen.generate_path_name()
+        return file_name, self._generate_xml(file_name, frame), frame
+
+    def _write_frame_product(self, file_name: str, xml_string: str, frame: Frame) -> None:
         self._logger.info(f'Create {file_name}')
+        full_file_name = os.path.join(self._output_path, file_name)
         with open(full_file_name, 'w') as file:
             file.write(xml_string)
+        self._register_file(full_file_name, frame.sensing_start, frame.sensing_stop, frame.id)
 
-    def _generate_xml(self, file_name: str) -> str:
-        # Ensure the presence of vital variables.
+    def _header_frame(self) -> Frame:
+        # The frame described by the header. Virtual frames only contain
+        # sensing time, the validity times are equal to it.
         if self._hdr.validity_start is None or self._hdr.validity_stop is None:
             raise ScenarioError('Validity start/stop times must be known here.')
         if self._hdr.acquisitions[0].slice_frame_nr is None:
             raise ScenarioError('Frame number must be known here.')
+        return Frame(self._hdr.acquisitions[0].slice_frame_nr, self._hdr.validity_start, self._hdr.validity_stop,
+                     self._frame_status)
+
+    def _generate_xml(self, file_name: str, frame: Optional[Frame] = None) -> str:
+        # Serialize with indentation, in the layout of Earth Explorer files.
+        return utils.pretty_xml(self._create_xml_tree(file_name, frame))
+
+    def _create_xml_tree(self, file_name: str, frame: Optional[Frame] = None) -> et.Element:
+        # The frame defaults to the one described by the header.
+        if frame is None:
+            frame = self._header_frame()
         if self._source_L0S is None or self._source_L0M is None or self._source_AUX_ORB is None:
             raise ScenarioError('Input products must be known here.')
 
@@ -368,13 +405,14 @@ class Level1PreProcessor(product_generator.ProductGeneratorBase):
         et.SubElement(fixed_header_node, 'File_Version').text = '01'
         source_node = et.SubElement(fixed_header_node, 'Source')
 
-        et.SubElement(validity_period_node, 'Validity_Start').text = self._hdr.validity_start.strftime(FIELD_DATETIME_FORMAT)
-        et.SubElement(validity_period_node, 'Validity_Stop').text = self._hdr.validity_stop.strftime(FIELD_DATETIME_FORMAT)
+        et.SubElement(validity_period_node, 'Validity_Start').text = timestamps.format_time(frame.sensing_start, FIELD_DATETIME_FORMAT)
+        et.SubElement(validity_period_node, 'Validity_Stop').text = timestamps.format_time(frame.sensing_stop, FIELD_DATETIME_FORMAT)
 
         et.SubElement(source_node, 'System').text = 'PDGS'
         et.SubElement(source_node, 'Creator').text = 'L1_F'
         et.SubElement(source_node, 'Creator_Version').text = '1'
-        et.SubElement(source_node, 'Creation_Date').text = self._creation_date.strftime(FIELD_DATETIME_FORMAT) if self._creation_date else ''
+        et.SubElement(source_node, 'Creation_Date').text = \
+            timestamps.format_time(self._creation_date, FIELD_DATETIME_FORMAT) if self._creation_date else ''
 
         et.SubElement(earth_explorer_header_node, 'Variable_Header')
 
@@ -382,19 +420,13 @@ class Level1PreProcessor(product_generator.ProductGeneratorBase):
         et.SubElement(data_block_node, 'source_L0S').text = self._source_L0S
         et.SubElement(data_block_node, 'source_L0M').text = self._source_L0M
         et.SubElement(data_block_node, 'source_AUX_ORB').text = self._source_AUX_ORB
-        et.SubElement(data_block_node, 'frame_id').text = str(self._hdr.acquisitions[0].slice_frame_nr)
-        et.SubElement(data_block_node, 'frame_start_time').text = self._hdr.validity_start.strftime(FIELD_DATETIME_FORMAT_MICROSECONDS)
-        et.SubElement(data_block_node, 'frame_stop_time').text = self._hdr.validity_stop.strftime(FIELD_DATETIME_FORMAT_MICROSECONDS)
-        et.SubElement(data_block_node, 'frame_status').text = self._frame_status
-        et.SubElement(data_block_node, 'ops_angle_start', {'unit': 'deg'}).text =\
-            str(self._ops_angle_from_frame_nr(self._hdr.acquisitions[0].slice_frame_nr))
-        et.SubElement(data_block_node, 'ops_angle_stop', {'unit': 'deg'}).text =\
-            str(self._ops_angle_from_frame_nr(self._hdr.acquisitions[0].slice_frame_nr + 1))
-
-        # Insert some indentation.
-        dom = md.parseString(et.tostring(root, encoding='unicode'))
-        xml_string = dom.toprettyxml(indent='    ')
-        return xml_string
+        et.SubElement(data_block_node, 'frame_id').text = str(frame.id)
+        et.SubElement(data_block_node, 'frame_start_time').text = timestamps.format_time(frame.sensing_start, FIELD_DATETIME_FORMAT_MICROSECONDS)
+        et.SubElement(data_block_node, 'frame_stop_time').text = timestamps.format_time(frame.sensing_stop, FIELD_DATETIME_FORMAT_MICROSECONDS)
+        et.SubElement(data_block_node, 'frame_status').text = frame.status
+        et.SubElement(data_block_node, 'ops_angle_start', {'unit': 'deg'}).text = str(self._ops_angle_from_frame_nr(frame.id))
+        et.SubElement(data_block_node, 'ops_angle_stop', {'unit': 'deg'}).text = str(self._ops_angle_from_frame_nr(frame.id + 1))
+        return root
 
     def _ops_angle_from_frame_nr(self, frame_nr: int) -> float:
         '''
@@ -460,7 +492,7 @@ class Level1Stripmap(product_generator.ProductGeneratorBase):
 
     def _parse_virtual_frame_file(self, file_name: str) -> None:
         '''Get frame information from virtual frame file.'''
-        root = et.parse(file_name).getroot()
+        root = self._parse_input_xml(file_name)
 
         # Find all OSV elements containing frame ID, start/stop time and status. No XML namespaces are expected.
         frame_id_node = root.find('Data_Block/frame_id')
@@ -537,17 +569,11 @@ class Level1Stripmap(product_generator.ProductGeneratorBase):
         os.makedirs(base_path, exist_ok=True)
 
         # Create product files
-        nr_binfiles = sum(1 for file in files if file.extension != 'xml')
-        for file in files:
-            self._add_file_to_product(
-                file_path=file.get_full_path(name_gen, base_path),
-                size_mb=0 if file.extension == 'xml' else self._size_mb // nr_binfiles,
-                representation_path=file.representation.get_full_path(name_gen, base_path) if file.representation else None
-            )
+        self._add_files_to_product(files, name_gen, base_path)
 
         # Create MPH
         file_name = os.path.join(base_path, name_gen.generate_mph_file_name())
-        self._hdr.write(file_name)
+        self._write_mph(file_name)
 
     def generate_output(self):
         super().generate_output()
@@ -670,26 +696,20 @@ class Level1Stack(product_generator.ProductGeneratorBase):
         # Here we store the meta data for every output product. Start with the
         # 'metadata source' (the first Sx_SCS product)
 
-        # Go again over the list with input products. For every other SCS
-        # product, do a sanity check and store meta data if ok.
-        for input in inputs:
-            for file in input.file_names:
-                # Skip non-directory products. These have already been parsed in the superclass.
-                if not os.path.isdir(file):
-                    continue
-                file, _ = os.path.splitext(file)    # Remove possible extension
-                # Skip the our metadata source reference
-                if self._meta_data_source_file == file:
-                    continue
-                gen = product_name.ProductName(self._compact_creation_date_epoch)
-                gen.parse_path(file)
-                mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-                hdr = main_product_header.MainProductHeader()
-                hdr.parse(mph_file_name)
-                if hdr.product_type not in _L1_SCS_PRODUCTS:
-                    continue
-                if self._check_sanity(file, hdr):
-                    self._hdrs.append(hdr)
+        # Go again over the list with input products. Skip non-directory
+        # products (these have already been parsed in the superclass) and our
+        # metadata source reference.
+        files = [file for input in inputs for file in input.file_names
+                 if self._is_input_product(file) and self._meta_data_source_file != os.path.splitext(file)[0]]
+
+        # For every other SCS product, do a sanity check and store meta data if
+        # ok. The headers are parsed up front, the checks are done in order.
+        for file, (_, hdr) in zip(files, self._parse_input_mphs(files)):
+            file, _ = os.path.splitext(file)    # Remove possible extension
+            if hdr.product_type not in _L1_SCS_PRODUCTS:
+                continue
+            if self._check_sanity(file, hdr):
+                self._hdrs.append(hdr)
         phase = self._hdr.acquisitions[0].mission_phase
         count = len(self._hdrs)
         if count < 2:
@@ -778,14 +798,8 @@ class Level1Stack(product_generator.ProductGeneratorBase):
         os.makedirs(base_path, exist_ok=True)
 
         # Create product files
-        nr_binfiles = sum(1 for file in files if file.extension != 'xml')
-        for file in files:
-            self._add_file_to_product(
-                file_path=file.get_full_path(name_gen, base_path),
-                size_mb=0 if file.extension == 'xml' else self._size_mb // nr_binfiles,
-                representation_path=file.representation.get_full_path(name_gen, base_path) if file.representation else None
-            )
+        self._add_files_to_product(files, name_gen, base_path)
 
         # Create MPH
         file_name = os.path.join(base_path, name_gen.generate_mph_file_name())
-        self._hdr.write(file_name)
+        self._write_mph(file_name)
@@ -72,7 +72,7 @@ class Level2a(product_generator.ProductGeneratorBase):
         file_path = os.path.join(base_path, name_gen.generate_binary_file_name())
         self._add_file_to_product(file_path, self._size_mb)
         file_path = os.path.join(base_path, name_gen.generate_mph_file_name())
-        self._hdr.write(file_path)
+        self._write_mph(file_path)
 
 
 class Level2b(product_generator.ProductGeneratorBase):
@@ -12,10 +12,10 @@ TODO:
 '''
 
 import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 from xml.etree import ElementTree as et
 
-from procsim.core import utils
+from procsim.core import timestamps, utils, xml_template
 from procsim.core.exceptions import ParseError, ScenarioError
 
 from . import product_types
@@ -45,31 +45,28 @@ ows = "{%s}" % mph_namespaces['ows']
 xlink = "{%s}" % mph_namespaces['xlink']
 
 
-ISO_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
-ISO_TIME_FORMAT_SHORT = '%Y-%m-%dT%H:%M:%S'
+# Compiled MPH templates, per product type
+_templates = xml_template.TemplateCache()
 
 
 def _time_as_iso(tim: datetime.datetime) -> str:
-    s = tim.strftime(ISO_TIME_FORMAT)
-    return s[:-3] + 'Z'
+    return timestamps.to_iso_ms(tim)
 
 
 def _time_from_iso(timestr: Optional[str]) -> Optional[datetime.datetime]:
     if timestr is None:
         return None
-    timestr = timestr[:-1]  # strip 'Z'
-    return datetime.datetime.strptime(timestr, ISO_TIME_FORMAT).replace(tzinfo=datetime.timezone.utc)
+    return timestamps.from_iso(timestr)
 
 
 def _time_as_iso_short(tim: datetime.datetime) -> str:
-    return tim.strftime(ISO_TIME_FORMAT_SHORT) + 'Z'
+    return timestamps.to_iso_short(tim)
 
 
 def _time_from_iso_short(timestr: Optional[str]) -> Optional[datetime.datetime]:
     if timestr is None:
         return None
-    timestr = timestr[:-1]  # strip 'Z'
-    return datetime.datetime.strptime(timestr, ISO_TIME_FORMAT_SHORT).replace(tzinfo=datetime.timezone.utc)
+    return timestamps.from_iso_short(timestr)
 
 
 def _to_int(val: Optional[str]) -> Optional[int]:
@@ -255,16 +252,14 @@ class MainProductHeader:
         self.processor_name = name
         self.processor_version = version
 
-    def _insert_time_period(self, parent, start: datetime.datetime, stop: datetime.datetime, id):
+    def _insert_time_period(self, parent, start: Optional[str], stop: Optional[str], id: str):
         # Insert TimePeriod element
         time_period = et.SubElement(parent, gml + 'TimePeriod')
-        if self.eop_identifier is None:
-            raise ParseError(self.eop_identifier)
-        time_period.set(gml + 'id', self.eop_identifier + '_' + str(id))
+        time_period.set(gml + 'id', id)
         begin_position = et.SubElement(time_period, gml + 'beginPosition')
-        begin_position.text = _time_as_iso(start)    # Start date and time of the product
+        begin_position.text = start    # Start date and time of the product
         end_position = et.SubElement(time_period, gml + 'endPosition')
-        end_position.text = _time_as_iso(stop)       # Stop date and time of the product
+        end_position.text = stop       # Stop date and time of the product
 
     def _parse_time_period(self, parent, id):
         # Parse TimePeriod element, retrieve start/stop
@@ -290,23 +285,26 @@ class MainProductHeader:
         # et.SubElement(service_reference, ows + 'RequestMessage')  # download request (empty)
         return file_name
 
-    def append_file(self, product_path: str, size_mb: Optional[int] = None, representation_path: Optional[str] = None) -> None:
-        self.products.append({
+    def append_file(self, product_path: str, size_mb: Optional[int] = None, representation_path: Optional[str] = None,
+                    checksums: Optional[Dict[str, str]] = None) -> None:
+        product = {
             'file_name': product_path,
             'size': None if size_mb is None else size_mb * 2**20,
             'representation': representation_path
-        })
-
-    def write(self, file_name):
-        # Create MPH and write to file (TODO: split in generate and write methods?)
+        }
+        if checksums:
+            product['checksums'] = checksums    # Algorithm -> hex digest
+        self.products.append(product)
+
+    def _write_values(self, checksums: bool = False) -> Dict[str, Optional[str]]:
+        # Check that all mandatory parameters are set, and return the text
+        # of all variable fields of the MPH. The checksums of the files are
+        # only included if requested.
         if self._product_type_info is None:
             raise ParseError(self._product_type_info)
         level = self._product_type_info.level
-
-        mph = et.Element(bio + 'EarthObservation')
         if self.eop_identifier is None:
             raise ParseError(self.eop_identifier)
-        mph.set(gml + 'id', self.eop_identifier + '_1')
 
         # Some parameters have no default and MUST be set prior to generation
         if self.begin_position is None or self.end_position is None:
@@ -315,88 +313,193 @@ class MainProductHeader:
             raise ScenarioError('Validity start/stop must be set before creating MPH')
         if not self.eop_identifier:
             raise ScenarioError('The eop_identifier (file name) must be set before creating MPH')
+        if level in ['raw']:
+            if self.acquisition_date is None:
+                raise ScenarioError('Acquisition time must be set prior to generating MPH')
+            if self.acquisition_station is None:
+                raise ScenarioError('Acquisition station must be set prior to generating MPH')
+        if self.processing_date is None or self.processor_name is None or \
+                self.processor_version is None or self._processing_level is None:
+            raise ScenarioError('Processing parameters must be set prior to generating MPH')
 
         # By convention, time_position is equal to end_position
         self.time_position = self.end_position
 
+        values: Dict[str, Optional[str]] = {
+            'eop_identifier': self.eop_identifier,
+            'begin_position': _time_as_iso(self.begin_position),
+            'end_position': _time_as_iso(self.end_position),
+            'time_position': _time_as_iso(self.time_position),
+            'validity_start': _time_as_iso(self.validity_start),
+            'validity_stop': _time_as_iso(self.validity_stop),
+            'platform_shortname': self._platform_shortname,
+            'sensor_name': self._sensor_name,
+            'sensor_type': self._sensor_type,
+            'sensor_mode': self.sensor_mode,
+            'sensor_swath': self.sensor_swath,
+        }
+        for i, acq in enumerate(self.acquisitions):
+            values.update({
+                'acq{}.orbit_number'.format(i): str(acq.orbit_number),
+                'acq{}.last_orbit_number'.format(i): str(acq.last_orbit_number),
+                'acq{}.orbit_direction'.format(i): acq.orbit_direction,
+                'acq{}.track_nr'.format(i): acq.track_nr,
+                'acq{}.slice_frame_nr'.format(i): str(acq.slice_frame_nr) if acq.slice_frame_nr is not None else '___',
+                'acq{}.anx_date'.format(i): _time_as_iso(acq.anx_date) if level in ['l0', 'l1'] else None,
+                'acq{}.start_time'.format(i): str(acq.start_time),
+                'acq{}.completion_time'.format(i): str(acq.completion_time),
+                'acq{}.polarisation_mode'.format(i): acq._polarisation_mode,
+                'acq{}.polarisation_channels'.format(i): acq._polarisation_channels,
+                'acq{}.antenna_direction'.format(i): acq._antenna_direction,
+                'acq{}.mission_phase'.format(i): acq.mission_phase,
+                'acq{}.instrument_config_id'.format(i): str(acq.instrument_config_id),
+                'acq{}.data_take_id'.format(i): str(acq.data_take_id),
+                'acq{}.orbit_drift_flag'.format(i): str(acq.orbit_drift_flag).lower(),
+                'acq{}.global_coverage_id'.format(i): acq.global_coverage_id,
+                'acq{}.major_cycle_id'.format(i): acq.major_cycle_id,
+                'acq{}.repeat_cycle_id'.format(i): acq.repeat_cycle_id,
+            })
+        values.update({
+            'footprint_polygon': self.footprint_polygon,
+            'center_points': self.center_points,
+            'browse_type': self._browse_type,
+            'browse_ref_id': self.browse_ref_id,
+            'browse_image_filename': self.browse_image_filename,
+            'product_baseline': None if self.product_baseline is None else '{:02}'.format(self.product_baseline),
+        })
+        for i, prod in enumerate(self.products):
+            values['product{}.file_name'.format(i)] = prod['file_name']
+            values['product{}.size'.format(i)] = None if prod.get('size') is None else str(prod['size'])
+            values['product{}.representation'.format(i)] = prod.get('representation')
+            for j, (algorithm, checksum) in enumerate(prod.get('checksums', {}).items() if checksums else []):
+                values['product{}.algorithm{}'.format(i, j)] = algorithm
+                values['product{}.checksum{}'.format(i, j)] = checksum
+        values.update({
+            'doi': self.doi,
+            'acquisition_type': self.acquisition_type,
+            'product_type': self.product_type,
+            'product_status': self.product_status,
+            'acquisition_station': self.acquisition_station,
+            'acquisition_date': _time_as_iso(self.acquisition_date) if level in ['raw'] else None,
+            'processing_centre_code': self.processing_centre_code,
+            'processing_date': _time_as_iso_short(self.processing_date),
+            'processor_name': self.processor_name,
+            'processor_version': self.processor_version,
+            'processing_level': self._processing_level,
+            'processing_mode': self.processing_mode,
+        })
+        for i, name in enumerate(self.auxiliary_ds_file_names):
+            values['auxiliary_ds_file_name{}'.format(i)] = name
+        for i, id in enumerate(self.biomass_source_product_ids):
+            values['source_product{}'.format(i)] = id
+        values.update({
+            'tai_utc_diff': str(self.tai_utc_diff),
+            'nr_transfer_frames': str(self.nr_transfer_frames or 0),
+            'nr_transfer_frames_erroneous': str(self.nr_transfer_frames_erroneous or 0),
+            'nr_transfer_frames_corrupt': str(self.nr_transfer_frames_corrupt or 0),
+            'nr_instrument_source_packets': str(self.nr_instrument_source_packets or 0),
+            'nr_instrument_source_packets_erroneous': str(self.nr_instrument_source_packets_erroneous or 0),
+            'nr_instrument_source_packets_corrupt': str(self.nr_instrument_source_packets_corrupt or 0),
+            'nr_l0_lines': self.nr_l0_lines,
+            'nr_l0_lines_missing': self.nr_l0_lines_missing,
+            'nr_l0_lines_corrupt': self.nr_l0_lines_corrupt,
+            'l1_frames_in_l0': self.l1_frames_in_l0,
+            'is_incomplete': str(self.is_incomplete).lower(),
+            'is_partial': str(self.is_partial).lower(),
+            'is_merged': str(self.is_merged).lower(),
+        })
+        for i, doc in enumerate(self.reference_documents):
+            values['reference_document{}'.format(i)] = doc
+        return values
+
+    def _create_element_tree(self, values: Dict[str, Optional[str]]) -> et.Element:
+        # Create the MPH element tree from the field values. The structure
+        # depends only on the product type, the lengths of the lists and on
+        # which values are empty (see _write_values and xml_template).
+        assert self._product_type_info is not None
+        level = self._product_type_info.level
+        id = values['eop_identifier']
+
+        mph = et.Element(bio + 'EarthObservation')
+        mph.set(gml + 'id', id + '_1')
+
         phenomenon_time = et.SubElement(mph, om + 'phenomenonTime')
-        self._insert_time_period(phenomenon_time, self.begin_position, self.end_position, 2)
+        self._insert_time_period(phenomenon_time, values['begin_position'], values['end_position'], id + '_2')
 
         result_time = et.SubElement(mph, om + 'resultTime')
         time_instant = et.SubElement(result_time, gml + 'TimeInstant')
-        time_instant.set(gml + 'id', self.eop_identifier + '_3')
+        time_instant.set(gml + 'id', id + '_3')
         time_position = et.SubElement(time_instant, gml + 'timePosition')
-        time_position.text = _time_as_iso(self.time_position)
+        time_position.text = values['time_position']
 
         valid_time = et.SubElement(mph, om + 'validTime')
-        self._insert_time_period(valid_time, self.validity_start, self.validity_stop, 4)
+        self._insert_time_period(valid_time, values['validity_start'], values['validity_stop'], id + '_4')
 
         procedure = et.SubElement(mph, om + 'procedure')  # Procedure used to sense the data
         earth_observation_equipment = et.SubElement(procedure, eop + 'EarthObservationEquipment')  # Equipment used to sense the data
-        earth_observation_equipment.set(gml + 'id', self.eop_identifier + '_5')
+        earth_observation_equipment.set(gml + 'id', id + '_5')
         platform = et.SubElement(earth_observation_equipment, eop + 'platform')  # Platform description
         Platform = et.SubElement(platform, eop + 'Platform')  # Nested element for platform description
         short_name = et.SubElement(Platform, eop + 'shortName')
-        short_name.text = self._platform_shortname
+        short_name.text = values['platform_shortname']
 
         instrument = et.SubElement(earth_observation_equipment, eop + 'instrument')  # Instrument description
         Instrument = et.SubElement(instrument, eop + 'Instrument')  # Nested element for instrument description
         short_name = et.SubElement(Instrument, eop + 'shortName')
-        short_name.text = self._sensor_name
+        short_name.text = values['sensor_name']
 
         # Mandatory for L0, L1, L2A products
-        sensors = [{'type': self._sensor_type, 'mode': self.sensor_mode, 'swath_id': self.sensor_swath}]
         if (level == 'l0' or level == 'l1' or level == 'l2a'):
             sensor = et.SubElement(earth_observation_equipment, eop + 'sensor')  # Sensor description
             Sensor = et.SubElement(sensor, eop + 'Sensor')  # Nested element for sensor description
-            for s in sensors:
-                sensor_type = et.SubElement(Sensor, eop + 'sensorType')
-                sensor_type.text = s['type']
-                sensor_mode = et.SubElement(Sensor, eop + 'operationalMode')
-                sensor_mode.set('codeSpace', 'urn:esa:eop:Biomass:PSAR:operationalMode')
-                sensor_mode.text = s['mode']
-                swath_id = et.SubElement(Sensor, eop + 'swathIdentifier')
-                swath_id.set('codeSpace', 'urn:esa:eop:Biomass:PSAR:swathIdentifier')
-                swath_id.text = s['swath_id']
+            sensor_type = et.SubElement(Sensor, eop + 'sensorType')
+            sensor_type.text = values['sensor_type']
+            sensor_mode = et.SubElement(Sensor, eop + 'operationalMode')
+            sensor_mode.set('codeSpace', 'urn:esa:eop:Biomass:PSAR:operationalMode')
+            sensor_mode.text = values['sensor_mode']
+            swath_id = et.SubElement(Sensor, eop + 'swathIdentifier')
+            swath_id.set('codeSpace', 'urn:esa:eop:Biomass:PSAR:swathIdentifier')
+            swath_id.text = values['sensor_swath']
 
         if level in ['l0', 'l1', 'l2a'] or self.product_type in ['AUX_ATT___', 'AUX_ORB___'] or \
                 self.product_type in product_types.RAWS_PRODUCT_TYPES:
             acquisition_params = et.SubElement(earth_observation_equipment, eop + 'acquisitionParameters')
             acquisition = et.SubElement(acquisition_params, bio + 'Acquisition')
-            for acq in self.acquisitions:
+            for i in range(len(self.acquisitions)):
+                acq = 'acq{}.'.format(i)
                 if level in ['l0', 'l1']:
-                    et.SubElement(acquisition, eop + 'orbitNumber').text = str(acq.orbit_number)  # orbit start
-                    et.SubElement(acquisition, eop + 'lastOrbitNumber').text = str(acq.last_orbit_number)   # orbit stop
+                    et.SubElement(acquisition, eop + 'orbitNumber').text = values[acq + 'orbit_number']  # orbit start
+                    et.SubElement(acquisition, eop + 'lastOrbitNumber').text = values[acq + 'last_orbit_number']   # orbit stop
                 if level in ['l0', 'l1', 'l2a']:
-                    et.SubElement(acquisition, eop + 'orbitDirection').text = acq.orbit_direction
+                    et.SubElement(acquisition, eop + 'orbitDirection').text = values[acq + 'orbit_direction']
                     tracknr = et.SubElement(acquisition, eop + 'wrsLongitudeGrid')
-                    tracknr.text = acq.track_nr
+                    tracknr.text = values[acq + 'track_nr']
                     tracknr.set('codeSpace', 'urn:esa:eop:Biomass:relativeOrbits')
                 if level in ['l0', 'l1', 'l2a'] or self.product_type in product_types.RAWS_PRODUCT_TYPES:
                     framenr = et.SubElement(acquisition, eop + 'wrsLatitudeGrid')
-                    framenr.text = str(acq.slice_frame_nr) if acq.slice_frame_nr is not None else '___'
+                    framenr.text = values[acq + 'slice_frame_nr']
                     framenr.set('codeSpace', 'urn:esa:eop:Biomass:frames')
                 if level in ['l0', 'l1']:
-                    et.SubElement(acquisition, eop + 'ascendingNodeDate').text = _time_as_iso(acq.anx_date)
-                    et.SubElement(acquisition, eop + 'startTimeFromAscendingNode', attrib={'uom': 'ms'}).text = str(acq.start_time)
-                    et.SubElement(acquisition, eop + 'completionTimeFromAscendingNode', attrib={'uom': 'ms'}).text = str(acq.completion_time)
-                    et.SubElement(acquisition, sar + 'polarisationMode').text = acq._polarisation_mode
-                    et.SubElement(acquisition, sar + 'polarisationChannels').text = acq._polarisation_channels
+                    et.SubElement(acquisition, eop + 'ascendingNodeDate').text = values[acq + 'anx_date']
+                    et.SubElement(acquisition, eop + 'startTimeFromAscendingNode', attrib={'uom': 'ms'}).text = values[acq + 'start_time']
+                    et.SubElement(acquisition, eop + 'completionTimeFromAscendingNode', attrib={'uom': 'ms'}).text = values[acq + 'completion_time']
+                    et.SubElement(acquisition, sar + 'polarisationMode').text = values[acq + 'polarisation_mode']
+                    et.SubElement(acquisition, sar + 'polarisationChannels').text = values[acq + 'polarisation_channels']
                 if level in ['l0', 'l1', 'l2a']:
-                    et.SubElement(acquisition, sar + 'antennaLookDirection').text = acq._antenna_direction
-                    et.SubElement(acquisition, bio + 'missionPhase').text = acq.mission_phase
+                    et.SubElement(acquisition, sar + 'antennaLookDirection').text = values[acq + 'antenna_direction']
+                    et.SubElement(acquisition, bio + 'missionPhase').text = values[acq + 'mission_phase']
                 if level in ['l0', 'l1']:
-                    et.SubElement(acquisition, bio + 'instrumentConfID').text = str(acq.instrument_config_id)
+                    et.SubElement(acquisition, bio + 'instrumentConfID').text = values[acq + 'instrument_config_id']
                 if level in ['l0', 'l1'] or self.product_type in ['AUX_ATT___', 'AUX_ORB___'] or \
                         self.product_type in product_types.RAWS_PRODUCT_TYPES:
-                    et.SubElement(acquisition, bio + 'dataTakeID').text = str(acq.data_take_id)
+                    et.SubElement(acquisition, bio + 'dataTakeID').text = values[acq + 'data_take_id']
                 if level in ['l0', 'l1']:
-                    et.SubElement(acquisition, bio + 'orbitDriftFlag').text = str(acq.orbit_drift_flag).lower()
+                    et.SubElement(acquisition, bio + 'orbitDriftFlag').text = values[acq + 'orbit_drift_flag']
                 if level in ['l0', 'l1', 'l2a']:
-                    et.SubElement(acquisition, bio + 'globalCoverageID').text = acq.global_coverage_id
-                    et.SubElement(acquisition, bio + 'majorCycleID').text = acq.major_cycle_id
+                    et.SubElement(acquisition, bio + 'globalCoverageID').text = values[acq + 'global_coverage_id']
+                    et.SubElement(acquisition, bio + 'majorCycleID').text = values[acq + 'major_cycle_id']
                 if level in ['l0', 'l1']:
-                    et.SubElement(acquisition, bio + 'repeatCycleID').text = acq.repeat_cycle_id
+                    et.SubElement(acquisition, bio + 'repeatCycleID').text = values[acq + 'repeat_cycle_id']
 
         observed_property = et.SubElement(mph, om + 'observedProperty')  # Observed property (Mandatory but empty)
         observed_property.set(xsi + 'nil', 'true')
@@ -405,17 +508,17 @@ class MainProductHeader:
 
         if level in ['l1', 'l2a']:
             footprint = et.SubElement(feature_of_interest, eop + 'Footprint')
-            footprint.set(gml + 'id', self.eop_identifier + '_6')
+            footprint.set(gml + 'id', id + '_6')
             multi_extent_of = et.SubElement(footprint, eop + 'multiExtentOf')  # Footprint representation structure, coordinates in posList
             multi_surface = et.SubElement(multi_extent_of, gml + 'MultiSurface')
-            multi_surface.set(gml + 'id', self.eop_identifier + '_7')
+            multi_surface.set(gml + 'id', id + '_7')
             surface_member = et.SubElement(multi_surface, gml + 'surfaceMember')
             polygon = et.SubElement(surface_member, gml + 'Polygon')
-            polygon.set(gml + 'id', self.eop_identifier + '_8')
+            polygon.set(gml + 'id', id + '_8')
             exterior = et.SubElement(polygon, gml + 'exterior')
             linear_ring = et.SubElement(exterior, gml + 'LinearRing')
             pos_list = et.SubElement(linear_ring, gml + 'posList')  # Footprint points
-            pos_list.text = self.footprint_polygon
+            pos_list.text = values['footprint_polygon']
 
             #
             # TODO! This is a discrepancy between spec and example!!
@@ -424,115 +527,178 @@ class MainProductHeader:
             center_of = et.SubElement(footprint, eop + 'centerOf')  # Acquisition centre representation structure
 
             point = et.SubElement(center_of, gml + 'Point')
-            point.set(gml + 'id', self.eop_identifier + '_9')
+            point.set(gml + 'id', id + '_9')
             pos = et.SubElement(point, gml + 'pos')  # Coordinates of the centre of the acquisition
-            pos.text = self.center_points
+            pos.text = values['center_points']
 
         result = et.SubElement(mph, om + 'result')  # Observation result
         earth_observation_result = et.SubElement(result, eop + 'EarthObservationResult')
-        earth_observation_result.set(gml + 'id', self.eop_identifier + '_10')
+        earth_observation_result.set(gml + 'id', id + '_10')
 
-        if level in ['l1'] and self.browse_image_filename != '':
+        if level in ['l1'] and values['browse_image_filename'] != '':
             browse = et.SubElement(earth_observation_result, eop + 'browse')
             browse_info = et.SubElement(browse, eop + 'BrowseInformation')
-            et.SubElement(browse_info, eop + 'type').text = self._browse_type
+            et.SubElement(browse_info, eop + 'type').text = values['browse_type']
             browse_ref_id = et.SubElement(browse_info, eop + 'referenceSystemIdentifier')  # Coordinate reference system name
             browse_ref_id.set('codeSpace', 'urn:esa:eop:crs')
-            browse_ref_id.text = self.browse_ref_id
-            self._insert_file_name(browse_info, self.browse_image_filename)
+            browse_ref_id.text = values['browse_ref_id']
+            self._insert_file_name(browse_info, values['browse_image_filename'])
 
-        for prod in self.products:
+        for i, prod in enumerate(self.products):
             product = et.SubElement(earth_observation_result, eop + 'product')
             product_information = et.SubElement(product, bio + 'ProductInformation')
-            self._insert_file_name(product_information, prod['file_name'])
-            if prod.get('size') is not None:
-                et.SubElement(product_information, eop + 'size', attrib={'uom': 'bytes'}).text = str(prod['size'])
-                if prod.get('representation') is not None:    # Mandatory for if type is XML
-                    et.SubElement(product_information, bio + 'rds').text = prod['representation']
+            self._insert_file_name(product_information, values['product{}.file_name'.format(i)])
+            if values['product{}.size'.format(i)] is not None:
+                et.SubElement(product_information, eop + 'size', attrib={'uom': 'bytes'}).text = values['product{}.size'.format(i)]
+                if values['product{}.representation'.format(i)] is not None:    # Mandatory for if type is XML
+                    et.SubElement(product_information, bio + 'rds').text = values['product{}.representation'.format(i)]
+                j = 0
+                while 'product{}.checksum{}'.format(i, j) in values:
+                    algorithm = values['product{}.algorithm{}'.format(i, j)]
+                    et.SubElement(product_information, eop + 'checksum',
+                                  attrib={'algorithm': algorithm}).text = values['product{}.checksum{}'.format(i, j)]
+                    j += 1
             else:
-                et.SubElement(product_information, eop + 'version').text = '{:02}'.format(self.product_baseline)
+                et.SubElement(product_information, eop + 'version').text = values['product_baseline']
 
         meta_data_property = et.SubElement(mph, eop + 'metaDataProperty')  # Observation metadata
         earth_observation_meta_data = et.SubElement(meta_data_property, bio + 'EarthObservationMetaData')
-        et.SubElement(earth_observation_meta_data, eop + 'identifier').text = self.eop_identifier
-        et.SubElement(earth_observation_meta_data, eop + 'doi').text = self.doi  # Digital Object Identifier'
-        et.SubElement(earth_observation_meta_data, eop + 'acquisitionType').text = self.acquisition_type
+        et.SubElement(earth_observation_meta_data, eop + 'identifier').text = id
+        et.SubElement(earth_observation_meta_data, eop + 'doi').text = values['doi']  # Digital Object Identifier'
+        et.SubElement(earth_observation_meta_data, eop + 'acquisitionType').text = values['acquisition_type']
         # TODO: Write product type here? Ref says: "Describes product type in case that mixed types
         # are available within a single collection, this is ground segment specific definition"
-        et.SubElement(earth_observation_meta_data, eop + 'productType').text = self.product_type
-        et.SubElement(earth_observation_meta_data, eop + 'status').text = self.product_status
+        et.SubElement(earth_observation_meta_data, eop + 'productType').text = values['product_type']
+        et.SubElement(earth_observation_meta_data, eop + 'status').text = values['product_status']
 
         if level in ['raw']:
-            if self.acquisition_date is None:
-                raise ScenarioError('Acquisition time must be set prior to generating MPH')
-            if self.acquisition_station is None:
-                raise ScenarioError('Acquisition station must be set prior to generating MPH')
             downlinked_to = et.SubElement(earth_observation_meta_data, eop + 'downlinkedTo')
             downlink_info = et.SubElement(downlinked_to, eop + 'DownlinkInformation')
-            et.SubElement(downlink_info, eop + 'acquisitionStation').text = self.acquisition_station
-            et.SubElement(downlink_info, eop + 'acquisitionDate').text = _time_as_iso(self.acquisition_date)
+            et.SubElement(downlink_info, eop + 'acquisitionStation').text = values['acquisition_station']
+            et.SubElement(downlink_info, eop + 'acquisitionDate').text = values['acquisition_date']
 
         processing = et.SubElement(earth_observation_meta_data, eop + 'processing')  # Data processing information
         processing_info = et.SubElement(processing, bio + 'ProcessingInformation')
         proc_center = et.SubElement(processing_info, eop + 'processingCenter')
-        proc_center.text = self.processing_centre_code
+        proc_center.text = values['processing_centre_code']
         proc_center.set('codeSpace', 'urn:esa:eop:Biomass:facility')
-        if self.processing_date is None or self.processor_name is None or \
-                self.processor_version is None or self._processing_level is None:
-            raise ScenarioError('Processing parameters must be set prior to generating MPH')
-        et.SubElement(processing_info, eop + 'processingDate').text = _time_as_iso_short(self.processing_date)
-        et.SubElement(processing_info, eop + 'processorName').text = self.processor_name
-        et.SubElement(processing_info, eop + 'processorVersion').text = self.processor_version
-        et.SubElement(processing_info, eop + 'processingLevel').text = self._processing_level
+        et.SubElement(processing_info, eop + 'processingDate').text = values['processing_date']
+        et.SubElement(processing_info, eop + 'processorName').text = values['processor_name']
+        et.SubElement(processing_info, eop + 'processorVersion').text = values['processor_version']
+        et.SubElement(processing_info, eop + 'processingLevel').text = values['processing_level']
 
         if level not in ['aux']:
-            for name in self.auxiliary_ds_file_names:
-                et.SubElement(processing_info, eop + 'auxiliaryDataSetFileName').text = name
+            for i in range(len(self.auxiliary_ds_file_names)):
+                et.SubElement(processing_info, eop + 'auxiliaryDataSetFileName').text = values['auxiliary_ds_file_name{}'.format(i)]
 
-        et.SubElement(processing_info, eop + 'processingMode', attrib={'codeSpace': 'urn:esa:eop:Biomass:class'}).text = self.processing_mode
+        et.SubElement(processing_info, eop + 'processingMode', attrib={'codeSpace': 'urn:esa:eop:Biomass:class'}).text = values['processing_mode']
 
         if level in ['l0', 'l1', 'l2a']:
-            for id in self.biomass_source_product_ids:
-                et.SubElement(processing_info, bio + 'sourceProduct').text = id
+            for i in range(len(self.biomass_source_product_ids)):
+                et.SubElement(processing_info, bio + 'sourceProduct').text = values['source_product{}'.format(i)]
 
         if level in ['l0', 'l1']:
-            et.SubElement(earth_observation_meta_data, bio + 'TAI-UTC').text = str(self.tai_utc_diff)
+            et.SubElement(earth_observation_meta_data, bio + 'TAI-UTC').text = values['tai_utc_diff']
 
         if level in ['raw']:
             # Set transfer frames or instrument source packets to 0 if not present.
             if self.product_type == 'RAW___HKTM':
-                et.SubElement(earth_observation_meta_data, bio + 'numOfTFs').text = str(self.nr_transfer_frames or 0)
-                et.SubElement(earth_observation_meta_data, bio + 'numOfTFsWithErrors').text = str(self.nr_transfer_frames_erroneous or 0)
-                et.SubElement(earth_observation_meta_data, bio + 'numOfCorruptedTFs').text = str(self.nr_transfer_frames_corrupt or 0)
+                et.SubElement(earth_observation_meta_data, bio + 'numOfTFs').text = values['nr_transfer_frames']
+                et.SubElement(earth_observation_meta_data, bio + 'numOfTFsWithErrors').text = values['nr_transfer_frames_erroneous']
+                et.SubElement(earth_observation_meta_data, bio + 'numOfCorruptedTFs').text = values['nr_transfer_frames_corrupt']
             else:
-                et.SubElement(earth_observation_meta_data, bio + 'numOfISPs').text = str(self.nr_instrument_source_packets or 0)
-                et.SubElement(earth_observation_meta_data, bio + 'numOfISPsWithErrors').text = str(self.nr_instrument_source_packets_erroneous or 0)
-                et.SubElement(earth_observation_meta_data, bio + 'numOfCorruptedISPs').text = str(self.nr_instrument_source_packets_corrupt or 0)
+                et.SubElement(earth_observation_meta_data, bio + 'numOfISPs').text = values['nr_instrument_source_packets']
+                et.SubElement(earth_observation_meta_data, bio + 'numOfISPsWithErrors').text = values['nr_instrument_source_packets_erroneous']
+                et.SubElement(earth_observation_meta_data, bio + 'numOfCorruptedISPs').text = values['nr_instrument_source_packets_corrupt']
 
         if level in ['l0']:
-            et.SubElement(earth_observation_meta_data, bio + 'numOfLines').text = self.nr_l0_lines
-            et.SubElement(earth_observation_meta_data, bio + 'numOfMissingLines').text = self.nr_l0_lines_missing
-            et.SubElement(earth_observation_meta_data, bio + 'numOfCorruptedLines').text = self.nr_l0_lines_corrupt
-            et.SubElement(earth_observation_meta_data, bio + 'framesList').text = self.l1_frames_in_l0
+            et.SubElement(earth_observation_meta_data, bio + 'numOfLines').text = values['nr_l0_lines']
+            et.SubElement(earth_observation_meta_data, bio + 'numOfMissingLines').text = values['nr_l0_lines_missing']
+            et.SubElement(earth_observation_meta_data, bio + 'numOfCorruptedLines').text = values['nr_l0_lines_corrupt']
+            et.SubElement(earth_observation_meta_data, bio + 'framesList').text = values['l1_frames_in_l0']
 
         if level in ['l0', 'l1']:
-            et.SubElement(earth_observation_meta_data, bio + 'isIncomplete').text = str(self.is_incomplete).lower()
-            et.SubElement(earth_observation_meta_data, bio + 'isPartial').text = str(self.is_partial).lower()
-            et.SubElement(earth_observation_meta_data, bio + 'isMerged').text = str(self.is_merged).lower()
-
-        for doc in self.reference_documents:
-            et.SubElement(earth_observation_meta_data, bio + 'refDoc').text = doc
-
-        # Create XML
-        tree = et.ElementTree(mph)
-        utils.indent_xml(tree.getroot())
-        tree.write(file_name, xml_declaration=True, encoding='utf-8')
-
-    def parse(self, file_name):
-        '''Open MPH file and parse contents. Does not check for ID's.'''
-        tree = et.parse(file_name)
-        root = tree.getroot()
-        phenomenon_time = root.find(om + 'phenomenonTime')
+            et.SubElement(earth_observation_meta_data, bio + 'isIncomplete').text = values['is_incomplete']
+            et.SubElement(earth_observation_meta_data, bio + 'isPartial').text = values['is_partial']
+            et.SubElement(earth_observation_meta_data, bio + 'isMerged').text = values['is_merged']
+
+        for i in range(len(self.reference_documents)):
+            et.SubElement(earth_observation_meta_data, bio + 'refDoc').text = values['reference_document{}'.format(i)]
+
+        return mph
+
+    def render(self, checksums: bool = False) -> bytes:
+        '''
+        Create MPH and return it as UTF-8 encoded XML file contents. The MPH
+        is rendered from a precompiled template, see xml_template. If
+        checksums is set, the checksums of the files are listed as
+        eop:checksum elements. These are not part of the MPH schema.
+        '''
+        values = self._write_values(checksums)
+        return _templates.render(self.product_type, values, self._create_element_tree)
+
+    def write(self, file_name, checksums: bool = False):
+        '''
+        Create MPH and write to file (a path or a binary file object), see
+        render().
+        '''
+        xml_template.write_file(file_name, self.render(checksums))
+
+    def write_element_tree(self, file_name, checksums: bool = False):
+        '''
+        Create MPH and write to file, by serializing the element tree.
+        Slower than write(), with identical output. Used as reference.
+        '''
+        values = self._write_values(checksums)
+        xml_template.write_file(file_name, xml_template.serialize(self._create_element_tree(values)))
+
+    # Parsers of the top level elements of the MPH, in document order, and
+    # the fields they set.
+    _SECTIONS = [
+        (om + 'phenomenonTime', '_parse_phenomenon_time', {'begin_position', 'end_position'}),
+        (om + 'resultTime', '_parse_result_time', {'time_position'}),
+        (om + 'validTime', '_parse_valid_time', {'validity_start', 'validity_stop'}),
+        (om + 'procedure', '_parse_procedure', {'sensor_swath', 'sensor_mode', 'acquisitions'}),
+        (om + 'featureOfInterest', '_parse_feature_of_interest', {'footprint_polygon', 'center_points'}),
+        (om + 'result', '_parse_result', {'browse_ref_id', 'browse_image_filename', 'products', 'product_baseline'}),
+        (eop + 'metaDataProperty', '_parse_meta_data_property', {
+            'eop_identifier', 'doi', 'acquisition_type', 'product_type', 'product_status', 'acquisition_station',
+            'acquisition_date', 'processing_centre_code', 'processing_date', 'processor_name', 'processor_version',
+            'auxiliary_ds_file_names', 'biomass_source_product_ids', 'tai_utc_diff', 'nr_transfer_frames',
+            'nr_transfer_frames_erroneous', 'nr_transfer_frames_corrupt', 'nr_instrument_source_packets',
+            'nr_instrument_source_packets_erroneous', 'nr_instrument_source_packets_corrupt', 'nr_l0_lines',
+            'nr_l0_lines_missing', 'nr_l0_lines_corrupt', 'l1_frames_in_l0', 'is_incomplete', 'is_partial',
+            'is_merged', 'reference_documents'}),
+    ]
+
+    def parse(self, file_name, fields: Optional[Iterable[str]] = None):
+        '''
+        Open MPH file (a path or a binary file object) and parse contents.
+        Does not check for ID's.
+
+        If fields is set, only the top level elements containing these
+        fields (MainProductHeader attribute names) are parsed. The file is
+        then streamed and reading stops once all fields are collected. The
+        values are the same as with a full parse.
+        '''
+        if fields is None:
+            root = et.parse(file_name).getroot()
+            for tag, parse_section, _ in self._SECTIONS:
+                getattr(self, parse_section)(root.find(tag))
+            return
+        sections = {}
+        for field in fields:
+            tags = [tag for tag, _, section_fields in self._SECTIONS if field in section_fields]
+            if not tags:
+                raise ValueError('Cannot parse MPH field {}'.format(field))
+            sections.update((tag, None) for tag in tags)
+        for element in utils.iter_top_level_elements(file_name, sections):
+            sections[element.tag] = element
+        for tag, parse_section, _ in self._SECTIONS:
+            if tag in sections:
+                getattr(self, parse_section)(sections[tag])
+
+    def _parse_phenomenon_time(self, phenomenon_time):
         begin_position, end_position = self._parse_time_period(phenomenon_time, 2)
         if begin_position is None:
             raise ParseError(begin_position)
@@ -540,7 +706,7 @@ class MainProductHeader:
             raise ParseError(end_position)
         self.begin_position, self.end_position = begin_position, end_position
 
-        result_time = root.find(om + 'resultTime')
+    def _parse_result_time(self, result_time):
         if result_time is None:
             raise ParseError(result_time)
         time_instant = result_time.find(gml + 'TimeInstant')
@@ -552,7 +718,7 @@ class MainProductHeader:
             raise ParseError(time_position)
         self.time_position = time_position
 
-        valid_time = root.find(om + 'validTime')
+    def _parse_valid_time(self, valid_time):
         validity_start, validity_stop = self._parse_time_period(valid_time, 4)
         if validity_start is None:
             raise ParseError(validity_start)
@@ -560,7 +726,8 @@ class MainProductHeader:
             raise ParseError(validity_stop)
         self.validity_start, self.validity_stop = validity_start, validity_stop
 
-        procedure = root.find(om + 'procedure')  # Procedure used to sense the data
+    def _parse_procedure(self, procedure):
+        # Procedure used to sense the data
         if procedure is None:
             raise ParseError(procedure)
         earth_observation_equipment = procedure.find(eop + 'EarthObservationEquipment')  # Equipment used to sense the data
@@ -650,10 +817,11 @@ class MainProductHeader:
                 acq.repeat_cycle_id = acquisition.findtext(bio + 'repeatCycleID') or acq.repeat_cycle_id
                 self.acquisitions.append(acq)
 
+    def _parse_feature_of_interest(self, feature_of_interest):
+        # Observed area
         # observed_property = root.find(om + 'observedProperty')  # Observed property (Mandatory but empty)
         # observed_property.set(xsi + 'nil', 'true')
         # observed_property.set('nilReason', 'inapplicable')
-        feature_of_interest = root.find(om + 'featureOfInterest')  # Observed area
         if feature_of_interest is None:
             raise ParseError(feature_of_interest)
 
@@ -698,7 +866,8 @@ class MainProductHeader:
             # point.set(gml + 'id', self.eop_identifier + '_9')
             self.center_points = point.findtext(gml + 'pos')  # Coordinates of the centre of the acquisition
 
-        result = root.find(om + 'result')  # Observation result
+    def _parse_result(self, result):
+        # Observation result
         if result is None:
             raise ParseError(result)
         earth_observation_result = result.find(eop + 'EarthObservationResult')
@@ -734,9 +903,14 @@ class MainProductHeader:
             else:
                 size = int(product_information.findtext(eop + 'size', '0'))  # attrib={'uom': 'bytes'}
                 representation = product_information.findtext(bio + 'rds')
-                self.products.append({'file_name': file_name, 'size': size, 'representation': representation})
-
-        meta_data_property = root.find(eop + 'metaDataProperty')  # Observation metadata
+                product = {'file_name': file_name, 'size': size, 'representation': representation}
+                checksums = {el.get('algorithm'): el.text for el in product_information.findall(eop + 'checksum')}
+                if checksums:
+                    product['checksums'] = checksums
+                self.products.append(product)
+
+    def _parse_meta_data_property(self, meta_data_property):
+        # Observation metadata
         if meta_data_property is None:
             raise ParseError(meta_data_property)
         earth_observation_meta_data = meta_data_property.find(bio + 'EarthObservationMetaData')
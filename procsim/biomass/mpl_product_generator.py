@@ -5,8 +5,9 @@ Biomass Mission Planning File (MPL) product generators,
 format according to BIO-IC-ESC-FS-6005.
 '''
 import os
-import zipfile
-from typing import List
+
+from procsim.core import timestamps
+from procsim.core.zip_writer import ZipArchiveWriter
 
 from . import constants, product_generator
 
@@ -38,11 +39,10 @@ class Mpl(product_generator.ProductGeneratorBase):
     PRODUCTS = [
         'MPL_ORBREF', 'MPL_REFAUX', 'MPL_ORBPRE'
     ]
-    DATETIME_FORMAT = '%Y%m%dT%H%M%S'
 
     @classmethod
     def time_to_str(cls, t):
-        return t.strftime(cls.DATETIME_FORMAT)
+        return timestamps.to_compact(t)
 
     def __init__(self, logger, job_config, scenario_config: dict, output_config: dict):
         super().__init__(logger, job_config, scenario_config, output_config)
@@ -65,15 +65,6 @@ class Mpl(product_generator.ProductGeneratorBase):
             self._hdr.product_baseline,
             self._version_nr)
 
-    def _zip_files(self, dir_name: str, filenames: List[str]):
-        # Note: Deletes input file(s) afterwards
-        self._logger.debug(f'Archive to zip, extension {self._zip_extension}')
-        with zipfile.ZipFile(dir_name + self._zip_extension, 'w', compression=zipfile.ZIP_DEFLATED) as zipped:
-            for filename in filenames:
-                zipped.write(filename, os.path.basename(filename))
-                os.remove(filename)
-            zipped.close()
-
     def generate_output(self):
         super().generate_output()
 
@@ -81,8 +72,14 @@ class Mpl(product_generator.ProductGeneratorBase):
         self._logger.info(f'Create {file_name}')
         os.makedirs(self._output_path, exist_ok=True)
         full_file_name = os.path.join(self._output_path, file_name)
-        self._generate_bin_file(full_file_name, self._size_mb)
-
         if self._zip_output:
+            # Write the file directly into the archive, without directory
             base = os.path.splitext(full_file_name)[0]
-            self._zip_files(base, [full_file_name])
+            self._logger.debug(f'Archive to zip, extension {self._zip_extension}')
+            self._archive = ZipArchiveWriter(base + self._zip_extension, self._output_path, self._zip_compression,
+                                             include_dir_name=False)
+        self._generate_bin_file(full_file_name, self._size_mb)
+        self._close_zip_archive()
+        if self._zip_output:
+            full_file_name = os.path.splitext(full_file_name)[0] + self._zip_extension
+        self._register_file(full_file_name, self._hdr.begin_position, self._hdr.end_position)
@@ -1,21 +1,31 @@
 '''
 Copyright (C) 2021 S[&]T, The Netherlands.
 '''
-import bisect
+import collections
+import concurrent.futures
 import datetime
 import os
 import re
 import shutil
-from typing import Dict, Iterable, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
 from xml.etree import ElementTree as et
 
 from procsim.biomass.constants import ORBITAL_PERIOD
 from procsim.biomass.product_types import ORBPRE_PRODUCT_TYPES
-from procsim.core import utils
+from procsim.core import orbit_prediction, timestamps, utils
 from procsim.core.exceptions import GeneratorError, ScenarioError
+from procsim.core.file_content import Checksum, ContentGenerator, preallocate
+from procsim.core.input_catalogue import InputCatalogue
+from procsim.core.interval_index import IntervalIndex
+from procsim.core.inventory import ProductInventory
 from procsim.core.iproduct_generator import IProductGenerator
 from procsim.core.job_order import JobOrderInput, JobOrderOutput
 from procsim.core.logger import Logger
+from procsim.core.mph_index import MphIndex
+from procsim.core.orbit_timeline import OrbitTimeline, OrbitTimelineMixin
+from procsim.core.product_emitter import ProductEmissionMixin, ProductEmitter
+from procsim.core.product_io import ProductIOMixin
+from procsim.core.zip_writer import ZipArchiveWriter, zip_directory
 
 from . import main_product_header, product_name
 
@@ -46,23 +56,29 @@ class GeneratedFile():
         return os.path.join(base_dir, *self.path, self._name)
 
 
-class ProductGeneratorBase(IProductGenerator):
+class ProductGeneratorBase(ProductEmissionMixin, ProductIOMixin, OrbitTimelineMixin, IProductGenerator):
     '''
     Biomass product generator (abstract) base class. This class is responsible
     for creating Biomass products.
     This base class handles parsing input products to retrieve metadata.
     '''
-    ISO_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
-
     # These parameters are common for ALL product generators
     _COMMON_GENERATOR_PARAMS: List[tuple] = [
         ('output_path', '_output_path', 'str'),
         ('compact_creation_date_epoch', '_compact_creation_date_epoch', 'date'),
         ('creation_date', '_creation_date', 'date'),
         ('zip_extension', '_zip_extension', 'str'),
+        ('zip_compression', '_zip_compression', 'str'),
         ('begin_end_position_from_toi', '_begin_end_position_from_toi', 'bool'),
         ('toi_start_offset', '_toi_start_offset', 'float'),
-        ('toi_stop_offset', '_toi_stop_offset', 'float')
+        ('toi_stop_offset', '_toi_stop_offset', 'float'),
+        ('content', '_content', 'str'),
+        ('content_seed', '_content_seed', 'int'),
+        ('checksums', '_checksums', 'array of str'),
+        ('checksum_manifest', '_checksum_manifest', 'bool'),
+        ('checksums_in_mph', '_checksums_in_mph', 'bool'),
+        ('output_workers', '_output_workers', 'int'),
+        ('input_workers', '_input_workers', 'int')
     ]
 
     _COMMON_HDR_PARAMS: List[tuple] = [
@@ -84,19 +100,38 @@ class ProductGeneratorBase(IProductGenerator):
         self._hdr = main_product_header.MainProductHeader()
         self._meta_data_source_file: Optional[str] = None
         # Get anx list from config. Can be located at either scenario or product level
-        self._anx_list = []
         scenario_anx_list = output_config.get('anx', []) or scenario_config.get('anx', [])
-        self._anx_list.extend([self._time_from_iso(anx) for anx in scenario_anx_list])
-        self._anx_list.sort()
+        self._orbit_timeline = OrbitTimeline([self._time_from_iso(anx) for anx in scenario_anx_list], ORBITAL_PERIOD)
 
         # Parameters that can be set in scenario
         self._output_path: str = '.' if job_config is None else job_config.dir
         self._compact_creation_date_epoch = product_name.ProductName.DEFAULT_COMPACT_DATE_EPOCH
         self._creation_date: Optional[datetime.datetime] = None
         self._zip_extension = '.zip'
+        self._zip_compression = 'store'
         self._begin_end_position_from_toi = False
         self._toi_start_offset = 0.0
         self._toi_stop_offset = 0.0
+        self._content = 'urandom'
+        self._content_seed: Optional[int] = None
+        self._content_generator: Optional[ContentGenerator] = None
+        self._checksums: List[str] = []
+        self._checksum_manifest = False
+        self._checksums_in_mph = False
+        self._output_workers = 1
+        self._input_workers = 1
+        self._emitter: Optional[ProductEmitter] = None
+        self._registrations: Optional[List[tuple]] = None
+        self._archive: Optional[ZipArchiveWriter] = None
+        self._input_catalogue: Optional[InputCatalogue] = None
+        self._output_listener: Optional[Callable[[str, str, Optional[bytes]], None]] = None
+        self._mph_index: Optional[MphIndex] = None
+        self._inventory: Optional[ProductInventory] = None
+        self._event_indices: Dict[str, IntervalIndex] = {}
+        self._data_takes_without_id: Optional[bool] = None
+
+        # The inputs are parsed before the other parameters are read.
+        self._read_generator_param('input_workers')
 
     def get_params(self) -> Tuple[List[tuple], List[tuple], List[tuple]]:
         '''
@@ -152,54 +187,105 @@ class ProductGeneratorBase(IProductGenerator):
         return self._time_from_iso(timestr)
 
     def _time_from_iso(self, timestr):
-        if timestr[-1] == 'Z':
-            timestr = timestr[:-1]
-        return datetime.datetime.strptime(timestr, self.ISO_TIME_FORMAT).replace(tzinfo=datetime.timezone.utc)
+        return timestamps.from_iso(timestr)
 
     def _time_as_iso(self, time):
-        return time.strftime(self.ISO_TIME_FORMAT) + 'Z'
+        return timestamps.to_iso(time)
 
     def _add_file_to_product(self, file_path: str, size_mb: Optional[int] = None, representation_path: Optional[str] = None) -> None:
         '''Append a file to the MPH product list and generate it. Also generate a representation (i.e. schema) if indicated.'''
+        mph_path = self._mph_directory()
+        if representation_path is not None:
+            self._generate_bin_file(representation_path, 0)
+        checksums = self._generate_bin_file(file_path, size_mb)
+        self._append_file(mph_path, file_path, size_mb, representation_path, checksums)
+
+    def _add_files_to_product(self, files: List[GeneratedFile], name_gen: product_name.ProductName, base_dir: str) -> None:
+        '''
+        Generate the files of a multi-file product in directory base_dir and
+        append them to the MPH product list, in list order. The product size
+        is divided over the binary (non-XML) files. The MPH is not written, it
+        must be written after this call.
+
+        The directory tree is created once and the files are preallocated
+        (except for sparse content). With more than one output worker, the
+        files are written concurrently; pseudo random content is then drawn
+        per file, from generators seeded in list order. Products written to a
+        zip archive are written file by file.
+        '''
+        mph_path = self._mph_directory()
+        nr_binfiles = sum(1 for file in files if file.extension != 'xml')
+        entries = [(file.get_full_path(name_gen, base_dir),
+                    0 if file.extension == 'xml' else self._size_mb // nr_binfiles,
+                    None if file.representation is None else file.representation.get_full_path(name_gen, base_dir))
+                   for file in files]
+        if self._archive is not None:
+            for file_path, size_mb, representation_path in entries:
+                self._add_file_to_product(file_path, size_mb, representation_path)
+            return
+
+        # Representations (schemas) are shared by files, write each once.
+        sizes: Dict[str, int] = {}
+        for file_path, size_mb, representation_path in entries:
+            if representation_path is not None:
+                sizes.setdefault(representation_path, 0)
+            sizes[file_path] = size_mb * 2**20
+        for directory in sorted({os.path.dirname(path) for path in sizes}):
+            os.makedirs(directory, exist_ok=True)
+
+        content_generator = self._get_content_generator()
+        workers = min(self._output_workers, len(sizes))
+        if workers <= 1:
+            checksums = [self._write_bin_file(path, size, content_generator) for path, size in sizes.items()]
+        else:
+            generators = [content_generator.fork() for _ in sizes]
+            with concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='procsim-files') as executor:
+                checksums = list(executor.map(self._write_bin_file, sizes.keys(), sizes.values(), generators))
+        checksums_per_path = dict(zip(sizes.keys(), checksums))
+        for file_path, size_mb, representation_path in entries:
+            self._append_file(mph_path, file_path, size_mb, representation_path, checksums_per_path[file_path])
+
+    def _mph_directory(self) -> str:
         try:
-            mph_path = os.path.join(self._output_path, self._hdr.products[0]['file_name'])
+            return os.path.join(self._output_path, self._hdr.products[0]['file_name'])
         except (IndexError, KeyError) as e:
             self._logger.error("No MPH directory found. Set the product name via 'MainProductHeader.set_product_filename(filename)'.")
             raise e
 
+    def _append_file(self, mph_path: str, file_path: str, size_mb: Optional[int],
+                     representation_path: Optional[str], checksums: Dict[str, str]) -> None:
+        # Append a generated file to the MPH product list.
         relative_file_path = './' + os.path.relpath(file_path, mph_path)
         relative_representation_path = None if representation_path is None else './' + os.path.relpath(representation_path, mph_path)
-        self._hdr.append_file(relative_file_path, size_mb, relative_representation_path)
+        self._hdr.append_file(relative_file_path, size_mb, relative_representation_path, checksums)
         # If this file is in the preview folder and has the png extension, set it as the browse file.
         if self._hdr.browse_image_filename == '' and relative_file_path.startswith('./preview/') and relative_file_path.endswith('.png'):
             self._hdr.browse_image_filename = relative_file_path
 
-        if representation_path is not None:
-            self._generate_bin_file(representation_path, 0)
-        self._generate_bin_file(file_path, size_mb)
-
-    def _generate_bin_file(self, file_path: str, size_mb: Optional[int]) -> None:
-        '''Generate binary file starting with a short ASCII header, followed by
-        size (in MB) random data bytes.'''
-        # Make sure encompassing folder exists.
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-        CHUNK_SIZE = 2**20
+    def _generate_bin_file(self, file_path: str, size_mb: Optional[int]) -> Dict[str, str]:
+        '''Generate binary file of size (in MB) data bytes. The kind of data
+        (random, zeros, etc.) is specified by the 'content' parameter.
+        Return the configured checksums of the file, computed while writing.'''
+        checksums = [Checksum(algorithm) for algorithm in self._checksums]
         size = size_mb * 2**20 if size_mb is not None else 0
-        file = open(file_path, 'wb')
-        while size > 0:
-            amount = min(size, CHUNK_SIZE)
-            file.write(os.urandom(max(amount, 0)))
-            size -= amount
-        file.close()
+        with self._open_output_file(file_path, size) as file:
+            self._get_content_generator().write(file, size, checksums)
+        return {checksum.algorithm: checksum.hexdigest() for checksum in checksums}
+
+    def _write_bin_file(self, file_path: str, size: int, content_generator: ContentGenerator) -> Dict[str, str]:
+        # As _generate_bin_file, for a file on disk in an existing directory.
+        # Size is in bytes. Called by worker threads.
+        checksums = [Checksum(algorithm) for algorithm in self._checksums]
+        with open(file_path, 'wb') as file:
+            if content_generator.content != 'sparse':
+                preallocate(file, size)
+            content_generator.write(file, size, checksums)
+        return {checksum.algorithm: checksum.hexdigest() for checksum in checksums}
 
     @staticmethod
-    def zip_folder(full_dir_name: str, extension: Optional[str] = None) -> None:
-        root_dir, base_dir = os.path.split(os.path.normpath(full_dir_name))
-        old_name = shutil.make_archive(full_dir_name, 'zip', root_dir or None, base_dir)
-        if extension is not None:
-            new_name = os.path.splitext(old_name)[0] + extension
-            os.rename(old_name, new_name)
+    def zip_folder(full_dir_name: str, extension: Optional[str] = None, compression: str = 'store') -> None:
+        full_dir_name = os.path.normpath(full_dir_name)
+        zip_directory(full_dir_name, full_dir_name + (extension or '.zip'), compression)
         shutil.rmtree(full_dir_name)
 
     @staticmethod
@@ -213,42 +299,82 @@ class ProductGeneratorBase(IProductGenerator):
         if not keep_zip:
             os.remove(archive_path)
 
+    def _mph_file_name(self, product_path: str) -> str:
+        gen = product_name.ProductName(self._compact_creation_date_epoch)
+        gen.parse_path(product_path)
+        return gen.generate_mph_file_name()
+
+    def _create_header(self) -> main_product_header.MainProductHeader:
+        return main_product_header.MainProductHeader()
+
+    def _header_slice_frame_nr(self, hdr: main_product_header.MainProductHeader) -> Optional[int]:
+        return hdr.acquisitions[0].slice_frame_nr
+
+    def _header_data_take_id(self, hdr: main_product_header.MainProductHeader) -> Optional[int]:
+        return hdr.acquisitions[0].data_take_id
+
+    def _register_file(self, path: str, begin_position: Optional[datetime.datetime],
+                       end_position: Optional[datetime.datetime], slice_frame_nr: Optional[int] = None) -> None:
+        # Add a generated product without main product header, such as a VFRA
+        # or MPL file, to the inventory, if enabled, and pass it on to the
+        # output listener, if set. Its validity times are equal to its
+        # phenomenon times.
+        inventory = self._get_inventory()
+        if inventory is not None:
+            inventory.add(path, self._output_type, begin_position, end_position, begin_position, end_position,
+                          slice_frame_nr, self._hdr.acquisitions[0].data_take_id, self._hdr.product_baseline)
+        if self._output_listener is not None:
+            self._output_listener(self._output_type, path, None)
+
+    def _parse_input_xml(self, file_name: str) -> et.Element:
+        '''Return the root element of an XML input file, such as a VFRA file.'''
+        if self._input_catalogue is None:
+            return et.parse(file_name).getroot()
+        return self._input_catalogue.get(('xml', file_name), lambda: et.parse(file_name).getroot())
+
     def parse_inputs(self, input_products: Iterable[JobOrderInput]) -> bool:
         '''
         For all files:
             - check if it is a (zipped) directory (all biomass products except MPL and VFRA are directories)
-            - unzip product if it's a zip archive
             - extract metadata if this product matches self.meta_data_source
+        Zip archives are not extracted, the MPH is read from the archive,
+        unless 'extract_inputs' is set.
         '''
-        gen = product_name.ProductName(self._compact_creation_date_epoch)
         pattern = self._meta_data_source
         mph_is_parsed = False
+        extract = self._output_config.get('extract_inputs') or self._scenario_config.get('extract_inputs', False)
         for input in input_products:
             for file in input.file_names:
                 root, ext = os.path.splitext(file)
-                if os.path.isfile(file) and ext.lower() == self._zip_extension:
+                product = self._input_product(file)
+                if product is not None:
+                    zipped = product.is_archive
+                else:
+                    zipped = os.path.isfile(file) and ext.lower() == self._zip_extension
+                if zipped:
                     # Sanity check: only raw products should be zipped
                     name_gen = product_name.ProductName(self._compact_creation_date_epoch)
                     name_gen.parse_path(file)
                     if name_gen.level != 'raw':
                         self._logger.warning('{} should not be a zip!'.format(os.path.basename(file)))
-                    keep_zip = self._output_config.get('keep_zip') or self._scenario_config.get('keep_zip', False)
-                    self.unzip(file, keep_zip, logger=self._logger)
-                if not os.path.isdir(root):
+                    if extract:
+                        keep_zip = self._output_config.get('keep_zip') or self._scenario_config.get('keep_zip', False)
+                        if product is not None:
+                            self._logger.debug('Extract {}{}'.format('(keep zip) ' if keep_zip else '', os.path.basename(file)))
+                            self._input_catalogue.extract(product, keep_zip)
+                        else:
+                            self.unzip(file, keep_zip, logger=self._logger)
+                        zipped = False
+                if not zipped and not os.path.isdir(root):
                     # Handle single file products.
                     if input.file_type in ORBPRE_PRODUCT_TYPES and not self._anx_list:
                         # Only parse orbit prediction files if no ANX information was present in the scenario.
                         self._parse_orbit_prediction_file(file)
-                file = root
-                if not mph_is_parsed and pattern is not None and re.match(pattern, file):
-                    self._logger.debug('Parse {} for {}'.format(os.path.basename(file), self._output_type))
-                    gen.parse_path(file)
-                    # Derive mph file name from product name, parse header
-                    hdr = self._hdr
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-                    hdr.parse(mph_file_name)
+                if not mph_is_parsed and pattern is not None and re.match(pattern, root):
+                    self._logger.debug('Parse {} for {}'.format(os.path.basename(root), self._output_type))
+                    self._parse_input_mph(file if zipped else root, self._hdr)
                     mph_is_parsed = True
-                    self._meta_data_source_file = file
+                    self._meta_data_source_file = root
 
         # The baseline ID is not copied from any source, but read from job order
         # (if available) or set in scenario config.
@@ -261,60 +387,39 @@ class ProductGeneratorBase(IProductGenerator):
 
     def _parse_orbit_prediction_file(self, file_name: str) -> List[datetime.datetime]:
         '''Get ANX timestamp information from orbit prediction file.'''
-        root = et.parse(file_name).getroot()
-
-        # Get the default namespace, if any.
-        ns = {}
-        if root.tag[0] == '{':
-            uri = root.tag[1:root.tag.index('}')]
-            ns['d'] = uri
-
-        # Find all OSV elements containing ANX timestamps.
-        self._anx_list = []
-        for utc_timestamp in root.findall('d:Data_Block/d:List_of_OSVs/d:OSV/d:UTC', ns):
-            if utc_timestamp.text is not None:
-                # Trim 'UTC=' off the start of the timestamp and convert to datetime.
-                self._anx_list.append(self._time_from_iso(utc_timestamp.text[4:]))
-
-        self._anx_list.sort()
-
+        self._anx_list = orbit_prediction.read_anx_list(file_name, self._get_mph_index())
         return self._anx_list
 
     def _get_anx(self, t: datetime.datetime) -> Optional[datetime.datetime]:
-        # Check whether a previous ANX can possibly be found.
-        if not self._anx_list or t < self._anx_list[0]:
-            self._logger.warning(f'No previous ANX found for {t} in ANX list {self._anx_list}.')
-            return None
         # Returns the latest ANX before the given time
-        idx = bisect.bisect(self._anx_list, t) - 1
-        return self._anx_list[min(max(idx, 0), len(self._anx_list) - 1)]
-
-    def _get_slice_frame_nr(self, start: datetime.datetime, spacing: datetime.timedelta) -> Optional[int]:
-        previous_anx = self._get_anx(start)
-        if previous_anx is None:
-            return None
-        slice_frame_per_orbit = round(ORBITAL_PERIOD / spacing)
-        absolute_slice_frame_nr = (start - previous_anx) // spacing
-        return (absolute_slice_frame_nr % slice_frame_per_orbit) + 1
-
-    def _get_slice_frame_interval(self,
-                                  start: datetime.datetime,
-                                  spacing: datetime.timedelta) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
-        previous_anx = self._get_anx(start)
-        slice_frame_nr = self._get_slice_frame_nr(start, spacing)
-        if previous_anx is None or slice_frame_nr is None:
-            return None
-        slice_frame_start = previous_anx + (slice_frame_nr - 1) * spacing
-        slice_frame_end = previous_anx + slice_frame_nr * spacing
-        return slice_frame_start, slice_frame_end
+        anx = self._orbit_timeline.anx(t)
+        if anx is None:
+            self._logger.warning(f'No previous ANX found for {t} in ANX list {self._anx_list}.')
+        return anx
 
-    def _get_data_takes_with_bounds(self) -> List[Tuple[Dict, datetime.datetime, datetime.datetime]]:
+    def _get_event_index(self, key: str) -> IntervalIndex:
+        '''
+        Return an index over the events (e.g. 'data_takes') in the scenario,
+        by start/stop time. The values are the event configurations. The
+        index is built on first use.
+        '''
+        index = self._event_indices.get(key)
+        if index is None:
+            index = IntervalIndex((self._time_from_iso(event['start']), self._time_from_iso(event['stop']), event)
+                                  for event in self._scenario_config.get(key) or [])
+            self._event_indices[key] = index
+        return index
+
+    def _get_data_takes_with_bounds(self) -> List[Tuple[Mapping, datetime.datetime, datetime.datetime]]:
         '''
         Find data take(s) in the current sensing time bounds. Returns a list of
         tuples  containing the start and end time of a data take, as well as the
         data take itself. The start/end times are clamped within the sensing
         time as set in the header (begin/end position).
 
+        The data take configurations are views of the general config, amended
+        with the data take config, without copying either.
+
         If no data takes are found, return the general configuration parameters.
         It is assumed that these contain data take parameters at the top level.
         '''
@@ -323,46 +428,38 @@ class ProductGeneratorBase(IProductGenerator):
         if sensing_start is None or sensing_stop is None:
             raise ScenarioError('Sensing start and stop time are not set.')
 
-        data_takes = self._scenario_config.get('data_takes')
-        if data_takes:
-            # Create copies of general config and amend with data take config.
-            data_takes = [{**self._scenario_config, **dt, 'begin_position': dt.get('start'), 'end_position': dt.get('stop')} for dt in data_takes]
+        index = self._get_event_index('data_takes')
+        if len(index) > 0:
+            if self._data_takes_without_id is None:
+                self._data_takes_without_id = self._scenario_config.get('data_take_id') is None and \
+                    any(dt.get('data_take_id') is None for _, _, dt in index)
+            data_takes_without_id = self._data_takes_without_id
+            # Select the data takes that fall within the begin and end position.
+            data_takes = [(collections.ChainMap({'begin_position': dt.get('start'), 'end_position': dt.get('stop')},
+                                                dt, self._scenario_config), start, stop)
+                          for start, stop, dt in index.overlapping(sensing_start, sensing_stop)]
         else:
             # No explicit data takes found, use general config.
             self._logger.info('No data takes found, using general config.')
-            data_takes = [{
-                **self._scenario_config,
+            general_config = collections.ChainMap({
                 'begin_position': self._time_as_iso(sensing_start),
                 'end_position': self._time_as_iso(sensing_stop)
-            }]
+            }, self._scenario_config)
+            data_takes_without_id = general_config.get('data_take_id') is None
+            data_takes = [(general_config, sensing_start, sensing_stop)]
 
         # Check for mandatory parameters.
-        if self._hdr.acquisitions[0].data_take_id is None and any([dt.get('data_take_id') is None for dt in data_takes]):
+        if self._hdr.acquisitions[0].data_take_id is None and data_takes_without_id:
             raise ScenarioError('Data take ID must be read either from input product or in scenario.')
-        if self._hdr.begin_position is None and any([dt.get('begin_position') is None for dt in data_takes]):
-            raise ScenarioError('Sensing start must be specified either in input product or in scenario.')
-        if self._hdr.end_position is None and any([dt.get('end_position') is None for dt in data_takes]):
-            raise ScenarioError('Sensing stop must be specified either in input product or in scenario.')
-        data_takes.sort(key=lambda dt: self._time_from_iso(dt['begin_position']))
-
-        # Select the data takes that fall within the begin and end position.
-        data_takes = [dt for dt in data_takes if self._time_from_iso(dt['begin_position']) <= sensing_stop
-                      and self._time_from_iso(dt['end_position']) >= sensing_start]
 
         # Warn that sensing start/end times fall outside of data takes, if necessary.
-        if data_takes and sensing_start < self._time_from_iso(data_takes[0]['begin_position']):
+        if data_takes and sensing_start < data_takes[0][1]:
             self._logger.warning(f'Sensing start {sensing_start} outside of data take. Using data take start time.')
-        if data_takes and sensing_stop > self._time_from_iso(data_takes[-1]['end_position']):
+        if data_takes and sensing_stop > data_takes[-1][2]:
             self._logger.warning(f'Sensing stop {sensing_stop} outside of data take. Using data take stop time.')
 
-        # Create resulting list of tuples.
-        data_takes_with_bounds: List[Tuple[Dict, datetime.datetime, datetime.datetime]] = []
-        for data_take in data_takes:
-            data_take_start = max(sensing_start, self._time_from_iso(data_take['begin_position']))
-            data_take_stop = min(sensing_stop, self._time_from_iso(data_take['end_position']))
-            data_takes_with_bounds.append((data_take, data_take_start, data_take_stop))
-
-        return data_takes_with_bounds
+        # Create resulting list of tuples, with the start/end times clamped.
+        return [(data_take, max(sensing_start, start), min(sensing_stop, stop)) for data_take, start, stop in data_takes]
 
     def _read_config_param(self, config: dict, param_name: str, obj: object, hdr_field: str, ptype):
         '''
@@ -409,6 +506,17 @@ class ProductGeneratorBase(IProductGenerator):
         self._hdr.begin_position = self._job_toi_start - datetime.timedelta(seconds=self._toi_start_offset)
         self._hdr.end_position = self._job_toi_stop + datetime.timedelta(seconds=self._toi_stop_offset)
 
+    def _read_generator_param(self, param_name: str) -> None:
+        '''
+        Read a single generator parameter from the scenario and output configs.
+        This is for parameters that are used before read_scenario_parameters
+        is called, i.e. while parsing the inputs.
+        '''
+        for param, self_field, type in self.get_params()[0]:
+            if param == param_name:
+                for config in (self._scenario_config, self._output_config):
+                    self._read_config_param(config, param, self, self_field, type)
+
     def read_scenario_parameters(self, config: Optional[Dict] = None) -> None:
         '''
         Parse metadata parameters from a scenario configuration. If specified,
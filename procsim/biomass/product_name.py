@@ -9,7 +9,7 @@ import os
 import re
 from typing import Optional
 
-from procsim.core import utils
+from procsim.core import timestamps, utils
 from procsim.core.exceptions import GeneratorError, ScenarioError
 
 from . import constants, product_types
@@ -44,7 +44,6 @@ class ProductName:
     This class is responsible for creating and parsing directory/file names.
     '''
     DEFAULT_COMPACT_DATE_EPOCH = datetime.datetime(2000, 1, 1, 0, 0, 0, tzinfo=datetime.timezone.utc)
-    DATETIME_FORMAT = '%Y%m%dT%H%M%S'
     MISSION_PHASES = [('Commissioning'), ('Interferometric'), ('Tomographic')]
     GLOBAL_COVERAGE_IDS = ['__', '01', '02', '03', '04', '05', '06']
     MAJOR_CYCLE_IDS = ['01', '02', '03', '04', '05', '06', '07']
@@ -52,7 +51,7 @@ class ProductName:
 
     @classmethod
     def str_to_time(cls, s):
-        return datetime.datetime.strptime(s, cls.DATETIME_FORMAT).replace(tzinfo=datetime.timezone.utc) if s else None
+        return timestamps.from_compact(s) if s else None
 
     @classmethod
     def str_to_int(cls, s):
@@ -60,7 +59,7 @@ class ProductName:
 
     @classmethod
     def time_to_str(cls, t):
-        return t.strftime(cls.DATETIME_FORMAT)
+        return timestamps.to_compact(t)
 
     def __init__(self, compact_create_date_epoch: Optional[datetime.datetime] = None):
         # Common
@@ -3,12 +3,12 @@ Copyright (C) 2021 S[&]T, The Netherlands.
 
 Biomass raw output product generators, according to BIO-ESA-EOPG-EEGS-TN-0073
 '''
-import bisect
 import datetime
 import os
 from typing import List, Tuple
 
 from procsim.core.exceptions import ScenarioError
+from procsim.core.slice_grid import SliceGrid
 
 from . import constants, product_generator, product_name
 
@@ -39,7 +39,10 @@ class RawProductGeneratorBase(product_generator.ProductGeneratorBase):
     def _create_raw_product(self, dir_name, name_gen):
         self._logger.info('Create {}'.format(dir_name))
         full_dir_name = os.path.join(self._output_path, dir_name)
-        os.makedirs(full_dir_name, exist_ok=True)
+        if self._zip_output:
+            self._start_zip_archive(full_dir_name)
+        else:
+            os.makedirs(full_dir_name, exist_ok=True)
 
         bin_file_name = name_gen.generate_binary_file_name()
         full_bin_file_name = os.path.join(full_dir_name, bin_file_name)
@@ -47,10 +50,7 @@ class RawProductGeneratorBase(product_generator.ProductGeneratorBase):
 
         mph_file_name = name_gen.generate_mph_file_name()
         full_mph_file_name = os.path.join(full_dir_name, mph_file_name)
-        self._hdr.write(full_mph_file_name)
-
-        if self._zip_output:
-            self.zip_folder(full_dir_name, self._zip_extension)
+        self._write_mph(full_mph_file_name)
 
 
 class UnslicedRawGeneratorBase(RawProductGeneratorBase):
@@ -216,12 +216,13 @@ class RAWSxxx_10(RawProductGeneratorBase):
         super(RAWSxxx_10, self).generate_output()
 
         data_takes_with_bounds = self._get_data_takes_with_bounds()
-        for data_take_config, data_take_start, data_take_stop in data_takes_with_bounds:
-            self.read_scenario_parameters(data_take_config)
-            if self._enable_slicing:
-                self._generate_sliced_output(data_take_start, data_take_stop)
-            else:
-                self._create_product(data_take_start, data_take_stop)
+        with self._product_emission():
+            for data_take_config, data_take_start, data_take_stop in data_takes_with_bounds:
+                self.read_scenario_parameters(data_take_config)
+                if self._enable_slicing:
+                    self._generate_sliced_output(data_take_start, data_take_stop)
+                else:
+                    self._emit_product(self._create_product, data_take_start, data_take_stop)
 
     def _create_product(self, acq_start: datetime.datetime, acq_stop: datetime.datetime):
         # Construct product name and set metadata fields
@@ -241,36 +242,9 @@ class RAWSxxx_10(RawProductGeneratorBase):
         self._create_raw_product(dir_name, name_gen)
 
     def _get_slice_edges(self, segment_start: datetime.datetime, segment_end: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
-        # If insufficient ANX are specified, infer the others.
-        anx_list = self._anx_list.copy()
-        while segment_start < anx_list[0]:
-            anx_list.insert(0, anx_list[0] - self._orbital_period)
-        while segment_end > anx_list[-1]:
-            anx_list.append(anx_list[-1] + self._orbital_period)
-
-        # Find ANX list that covers the segment duration.
-        anx_idx_start = bisect.bisect_right(anx_list, segment_start) - 1
-        anx_idx_end = bisect.bisect_left(anx_list, segment_end) + 1
-
-        # Determine the slices that make up the space between ANX.
-        slice_edges = []
-        slices_per_orbit = int(round(self._orbital_period / self._slice_grid_spacing))
-        for anx in anx_list[anx_idx_start:anx_idx_end - 1]:
-            new_slice_edges = [(anx + i * self._slice_grid_spacing, anx + (i + 1) * self._slice_grid_spacing) for i in range(slices_per_orbit)]
-            slice_edges.extend(new_slice_edges)
-
-        # Only keep the slices that overlap the segment.
-        slice_edges = [slice for slice in slice_edges if slice[1] >= segment_start and slice[0] <= segment_end]
-
-        # Merge the first and last slice with their neighbour if they are going to be too short.
-        if slice_edges[0][1] - segment_start < self._slice_minimum_duration:
-            slice_edges[1] = (slice_edges[0][0], slice_edges[1][1])
-            del slice_edges[0]
-        if segment_end - slice_edges[-1][0] < self._slice_minimum_duration:
-            slice_edges[-2] = (slice_edges[-2][0], slice_edges[-1][1])
-            del slice_edges[-1]
-
-        return slice_edges
+        # ANX before the first and after the last known ANX are inferred.
+        grid = SliceGrid(self._anx_list, self._orbital_period, self._slice_grid_spacing)
+        return grid.slice_edges(segment_start, segment_end, self._slice_minimum_duration)
 
     def _generate_sliced_output(self, segment_start: datetime.datetime, segment_end: datetime.datetime) -> None:
         if segment_start is None or segment_end is None:
@@ -281,13 +255,7 @@ class RAWSxxx_10(RawProductGeneratorBase):
 
         slice_edges = self._get_slice_edges(segment_start, segment_end)
 
-        for slice_start, slice_end in slice_edges:
-            # Get the ANX and slice number from the middle of the slice to treat merged slices accurately.
-            slice_middle = slice_start + (slice_end - slice_start) / 2
-            anx = self._get_anx(slice_middle)
-            slice_nr = self._get_slice_frame_nr(slice_middle, self._slice_grid_spacing)
-            if anx is None or slice_nr is None:
-                continue
+        for slice_start, slice_end, anx, slice_nr in self._get_slice_positions(slice_edges, self._slice_grid_spacing):
             validity_start = slice_start - self._slice_overlap_start
             validity_end = slice_end + self._slice_overlap_end
             acq_start = max(validity_start, segment_start)
@@ -298,4 +266,4 @@ class RAWSxxx_10(RawProductGeneratorBase):
             self._logger.debug(f'  acq {acq_start}  -  {acq_end}')
             self._logger.debug(f'  validity {validity_start}  -  {validity_end}')
             self._logger.debug(f'  anx {anx}')
-            self._create_product(acq_start, acq_end)
+            self._emit_product(self._create_product, acq_start, acq_end)
@@ -10,7 +10,7 @@ import unittest
 from xml.etree import ElementTree as et
 
 from procsim.biomass import constants
-from procsim.biomass.level1_product_generator import Level1PreProcessor, Level1Stripmap
+from procsim.biomass.level1_product_generator import Level1PreProcessor, Level1Stack, Level1Stripmap
 from procsim.biomass.product_name import _REGEX_VFRA_FILE_NAME, ProductName
 from procsim.core.exceptions import ScenarioError
 from procsim.core.job_order import JobOrderInput
@@ -128,6 +128,47 @@ VFRA_DATA = '''<?xml version="1.0" ?>
 </Earth_Explorer_File>'''
 
 
+# Output of the former serializer (ElementTree, re-parsed and indented by
+# xml.dom.minidom), for the frame in FrameGeneratorTest.test_product_xml.
+VFRA_GOLDEN = '''<?xml version="1.0" ?>
+<Earth_Explorer_File>
+    <Earth_Explorer_Header>
+        <Fixed_Header>
+            <File_Name>BIO_TEST_CPF_L1VFRA_20200101T000000_20200101T000021_00_BIGOLD</File_Name>
+            <File_Description>L1 Virtual Frame</File_Description>
+            <Notes/>
+            <Mission>BIOMASS</Mission>
+            <File_Class>TEST</File_Class>
+            <File_Type>CPF_L1VFRA</File_Type>
+            <Validity_Period>
+                <Validity_Start>UTC=2020-01-01T00:00:00</Validity_Start>
+                <Validity_Stop>UTC=2020-01-01T00:00:21</Validity_Stop>
+            </Validity_Period>
+            <File_Version>01</File_Version>
+            <Source>
+                <System>PDGS</System>
+                <Creator>L1_F</Creator>
+                <Creator_Version>1</Creator_Version>
+                <Creation_Date>UTC=2020-01-01T00:00:21</Creation_Date>
+            </Source>
+        </Fixed_Header>
+        <Variable_Header/>
+    </Earth_Explorer_Header>
+    <Data_Block type="xml">
+        <source_L0S>L0S &lt;input&gt; &amp; &quot;file&quot;</source_L0S>
+        <source_L0M>L0M input file</source_L0M>
+        <source_AUX_ORB>AUX_ORB input file</source_AUX_ORB>
+        <frame_id>2</frame_id>
+        <frame_start_time>UTC=2020-01-01T00:00:00.000000</frame_start_time>
+        <frame_stop_time>UTC=2020-01-01T00:00:21.003162</frame_stop_time>
+        <frame_status>PARTIAL</frame_status>
+        <ops_angle_start unit="deg">1.1612903225806452</ops_angle_start>
+        <ops_angle_stop unit="deg">2.3225806451612905</ops_angle_stop>
+    </Data_Block>
+</Earth_Explorer_File>
+'''
+
+
 class FrameGeneratorTest(unittest.TestCase):
     gen = Level1PreProcessor(_Logger(), None, STANDARD_CONFIG, STANDARD_CONFIG)
     gen.read_scenario_parameters()
@@ -467,6 +508,63 @@ class VirtualFrameProductTest(unittest.TestCase):
             self.assertIsNotNone(node)
             self.assertEqual(node.text if node is not None else None, str(expected_value))
 
+    def test_product_xml(self) -> None:
+        gen = Level1PreProcessor(_Logger(), None, STANDARD_CONFIG, STANDARD_CONFIG)
+        gen.read_scenario_parameters()
+
+        start = ANX1
+        end = ANX1 + constants.FRAME_GRID_SPACING + constants.FRAME_OVERLAP
+        gen._hdr.acquisitions[0].slice_frame_nr = 2
+        gen._hdr.set_phenomenon_times(start, end)
+        gen._hdr.set_validity_times(start, end)
+        gen._frame_status = 'PARTIAL'
+        gen._creation_date = end
+        gen._source_L0S = 'L0S <input> & "file"'
+        gen._source_L0M = 'L0M input file'
+        gen._source_AUX_ORB = 'AUX_ORB input file'
+
+        xml_string = gen._generate_xml('BIO_TEST_CPF_L1VFRA_20200101T000000_20200101T000021_00_BIGOLD.EOF')
+        self.assertEqual(xml_string, VFRA_GOLDEN)
+
+    def test_frame_products(self) -> None:
+        '''The frame products are the same as those generated from the header, which is left unchanged.'''
+        db_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(db_dir.cleanup)
+        config = {**STANDARD_CONFIG, 'inventory': os.path.join(db_dir.name, 'inventory.db')}
+        gen = Level1PreProcessor(_Logger(), None, config, config)
+        self.addCleanup(gen.close)
+        gen.read_scenario_parameters()
+        gen._creation_date = ANX1
+        gen._source_L0S = gen._source_L0M = gen._source_AUX_ORB = 'input file'
+        frames = gen._generate_frames(ANX1, ANX1 + datetime.timedelta(seconds=1), ANX1 + constants.SLICE_GRID_SPACING, 1)
+        gen._write_frame_products(frames)
+        self.assertEqual(gen._hdr.acquisitions[0].slice_frame_nr, 1)
+        self.assertEqual(gen._hdr.begin_position, ANX1 - constants.SLICE_OVERLAP_START)
+        self.assertIsNone(gen._frame_status)
+
+        products = {}
+        for filename in os.listdir(TEST_DIR.name):
+            with open(os.path.join(TEST_DIR.name, filename)) as f:
+                products[filename] = f.read()
+        self.assertEqual(len(products), len(frames))
+        names = []
+        for frame in frames:
+            gen._hdr.acquisitions[0].slice_frame_nr = frame.id
+            gen._hdr.set_phenomenon_times(frame.sensing_start, frame.sensing_stop)
+            gen._hdr.set_validity_times(frame.sensing_start, frame.sensing_stop)
+            gen._frame_status = frame.status
+            name_gen = gen._create_name_generator(gen._hdr)
+            name_gen.set_creation_date(gen._creation_date)
+            name_gen.file_class = gen._file_class
+            file_name = name_gen.generate_path_name()
+            self.assertEqual(products[file_name], gen._generate_xml(file_name))
+            names.append(file_name)
+
+        # The products are in the inventory.
+        rows = gen._get_inventory().query(gen._output_type)
+        self.assertEqual([(os.path.basename(row['path']), row['slice_frame_nr']) for row in rows],
+                         [(name, frame.id) for name, frame in zip(names, frames)])
+
     def test_parse_inputs(self) -> None:
         L0S_input = JobOrderInput()
         L0S_input.id = '1'
@@ -711,5 +809,78 @@ class VirtualFrameParsingTest(unittest.TestCase):
             gen.generate_output()
 
 
+class StripmapProductTest(unittest.TestCase):
+    '''Test generation of multi-file Level-1 products.'''
+    def test_output_workers(self) -> None:
+        '''Files written by worker threads equal those written one by one, the MPH lists them in order.'''
+        results = []
+        for workers in (1, 4):
+            output_path = os.path.join(TEST_DIR.name, str(workers))
+            config = {**STANDARD_CONFIG, 'output_path': output_path, 'type': 'S1_SCS__1S', 'size': 15,
+                      'mission_phase': 'INTERFEROMETRIC',
+                      'content': 'pattern', 'content_seed': 1, 'checksums': ['md5'],
+                      'creation_date': '2021-02-02T00:00:00.000Z', 'output_workers': workers}
+            gen = Level1Stripmap(_Logger(), None, config, config)
+            gen.read_scenario_parameters()
+            gen.generate_output()
+
+            # Data files and schemas, the MPH has a creation time.
+            files = {}
+            for dir_path, _, file_names in os.walk(output_path):
+                for file_name in file_names:
+                    path = os.path.relpath(os.path.join(dir_path, file_name), output_path)
+                    if path.count(os.sep) > 1:
+                        with open(os.path.join(dir_path, file_name), 'rb') as f:
+                            files[path] = f.read()
+            product_list = gen._hdr.products[1:]
+            self.assertEqual([product['file_name'].split('/')[1] for product in product_list[:4]], ['annotation'] * 4)
+            self.assertTrue(product_list[-1]['file_name'].endswith('_i_vv.tiff'))
+            results.append((files, product_list))
+            shutil.rmtree(output_path)
+        self.assertEqual(results[0], results[1])
+        # 15 files and 3 schemas. The size is divided over the 11 binary files.
+        files = results[0][0]
+        self.assertEqual(len(files), 18)
+        sizes = [len(data) for name, data in files.items() if os.path.splitext(name)[1] not in ('.xml', '.xsd')]
+        self.assertEqual(sizes, [2**20] * 11)
+
+
+class StackProductTest(unittest.TestCase):
+    '''Test parsing of the inputs of stacked Level-1 products.'''
+    def test_input_workers(self) -> None:
+        '''Inputs parsed by worker threads are checked and stored in input order.'''
+        output_path = os.path.join(TEST_DIR.name, 'stack')
+        config = {**STANDARD_CONFIG, 'output_path': output_path, 'type': 'S1_SCS__1S', 'size': 0,
+                  'mission_phase': 'INTERFEROMETRIC', 'swath': 'S1', 'track_nr': '10', 'major_cycle_id': '1',
+                  'global_coverage_id': '2', 'slice_frame_nr': 3,
+                  'begin_position': '2021-02-01T00:24:32.000Z', 'end_position': '2021-02-01T00:25:32.000Z'}
+        # The third product has another frame number.
+        for repeat_cycle_id, slice_frame_nr in (('1', 3), ('2', 3), ('3', 4), ('4', 3)):
+            scs_config = {**config, 'repeat_cycle_id': repeat_cycle_id, 'slice_frame_nr': slice_frame_nr}
+            gen = Level1Stripmap(_Logger(), None, scs_config, scs_config)
+            gen.read_scenario_parameters()
+            gen.generate_output()
+
+        scs_input = JobOrderInput()
+        scs_input.file_type = 'S1_SCS__1S'
+        scs_input.file_names = sorted(os.path.join(output_path, name) for name in os.listdir(output_path))
+        results = []
+        for workers in (1, 3):
+            logger = _Logger()
+            warnings = []
+            logger.warning = lambda *args, **kwargs: warnings.append(args[0])
+            stack_config = {**STANDARD_CONFIG, 'output_path': output_path, 'type': 'S1_STA__1S',
+                            'metadata_source': '.*_C01_', 'input_workers': workers}
+            gen = Level1Stack(logger, None, stack_config, stack_config)
+            self.assertEqual(gen._input_workers, workers)
+            self.assertTrue(gen.parse_inputs([scs_input]))
+            results.append(([hdr.acquisitions[0].repeat_cycle_id for hdr in gen._hdrs], warnings))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0][0], ['1', '2', '4'])
+        self.assertEqual(len(results[0][1]), 1)
+        self.assertTrue(results[0][1][0].startswith('Framenr 4 of '))
+        shutil.rmtree(output_path)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,13 +3,19 @@ Copyright (C) 2021 S[&]T, The Netherlands.
 '''
 import datetime
 import glob
+import hashlib
+import io
 import os
 import shutil
 import unittest
+import zipfile
 
 from procsim.biomass import constants, main_product_header
 from procsim.biomass.raw_product_generator import RAWSxxx_10
 from procsim.core.exceptions import ScenarioError
+from procsim.core.input_catalogue import InputCatalogue
+from procsim.core.job_order import JobOrderInput
+from procsim.core.mph_index import MphIndex
 
 TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tmp')
 
@@ -45,7 +51,7 @@ class RAWSxxx_10Test(unittest.TestCase):
     def calc_nr_products_in_dir():
         return len([name for name in os.listdir(TEST_DIR) if os.path.isdir(os.path.join(TEST_DIR, name))])
 
-    def create_class_under_test(self):
+    def create_class_under_test(self, **extra_config):
         logger = _Logger()
         job_config = None
         config = {
@@ -73,6 +79,7 @@ class RAWSxxx_10Test(unittest.TestCase):
             'slice_minimum_duration': 15.0,
             'data_take_id': 1
         }
+        config.update(extra_config)
         self.anx1 = datetime.datetime(2021, 1, 31, 22, 47, 21, 765000, tzinfo=datetime.timezone.utc)
         self.anx2 = datetime.datetime(2021, 2, 1, 0, 25, 33, 745000, tzinfo=datetime.timezone.utc)
 
@@ -301,6 +308,138 @@ class RAWSxxx_10Test(unittest.TestCase):
         self.assertEqual(hdr.begin_position, data_take_times[3])
         self.assertEqual(hdr.end_position, data_take_times[4])
 
+    def testChecksums(self):
+        gen = self.create_class_under_test(size=1, checksums=['md5', 'crc32'], checksum_manifest=True,
+                                           checksums_in_mph=True)
+        begin = datetime.datetime(2021, 2, 1, 0, 26, 0, 0, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime(2021, 2, 1, 0, 27, 0, 0, tzinfo=datetime.timezone.utc)
+        gen._hdr.validity_start = gen._hdr.begin_position = begin
+        gen._hdr.validity_stop = gen._hdr.end_position = end
+
+        gen.read_scenario_parameters()
+        gen.generate_output()
+
+        product_dir = glob.glob(os.path.join(TEST_DIR, 'BIO_RAWS025_10_*'))
+        product_dir = [dir for dir in product_dir if os.path.isdir(dir)][0]
+        hdr = self.parse_product(os.path.basename(product_dir))
+        product = hdr.products[1]
+        with open(os.path.join(product_dir, product['file_name']), 'rb') as f:
+            md5 = hashlib.md5(f.read()).hexdigest()
+        self.assertEqual(product['checksums']['md5'], md5)
+        self.assertEqual(len(product['checksums']['crc32']), 8)
+        # By default, the checksums are not part of the MPH.
+        mph_file = io.BytesIO()
+        hdr.write(mph_file)
+        self.assertNotIn(b'checksum', mph_file.getvalue())
+
+        with open(product_dir + '.md5') as f:
+            self.assertEqual(f.read(), '{}  {}\n'.format(
+                md5, os.path.normpath(os.path.join(os.path.basename(product_dir), product['file_name']))))
+
+    def testParseZippedInput(self):
+        gen = self.create_class_under_test(zip_output=True)
+        begin = datetime.datetime(2021, 2, 1, 0, 26, 0, 0, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime(2021, 2, 1, 0, 27, 0, 0, tzinfo=datetime.timezone.utc)
+        gen._hdr.validity_start = gen._hdr.begin_position = begin
+        gen._hdr.validity_stop = gen._hdr.end_position = end
+        gen.read_scenario_parameters()
+        gen.generate_output()
+
+        # The MPH is read from the archive, which is not extracted.
+        archive = glob.glob(os.path.join(TEST_DIR, 'BIO_RAWS025_10_*.zip'))[0]
+        input = JobOrderInput()
+        input.file_type = 'RAWS025_10'
+        input.file_names = [archive]
+        gen = self.create_class_under_test(metadata_source='.*RAWS025_10')
+        self.assertTrue(gen.parse_inputs([input]))
+        self.assertEqual(gen._hdr.begin_position, begin)
+        self.assertEqual(gen._hdr.end_position, end)
+        self.assertTrue(os.path.isfile(archive))
+        self.assertEqual(self.calc_nr_products_in_dir(), 0)
+
+        # With a shared catalogue, the archive is extracted and the header is read once.
+        catalogue = InputCatalogue([input])
+        for _ in range(2):
+            gen = self.create_class_under_test(metadata_source='.*RAWS025_10', extract_inputs=True)
+            gen.set_input_catalogue(catalogue)
+            self.assertTrue(gen.parse_inputs([input]))
+            self.assertEqual(gen._hdr.begin_position, begin)
+        self.assertFalse(os.path.exists(archive))
+        self.assertEqual(self.calc_nr_products_in_dir(), 1)
+        product = catalogue.product(archive)
+        self.assertIsNot(product.header, gen._hdr)
+        self.assertEqual(product.header.begin_position, begin)
+
+        # As parse(), fields that are not in the MPH are left as they are, so
+        # that a header can be built from several inputs.
+        hdr = main_product_header.MainProductHeader()
+        hdr.footprint_polygon = 'polygon'
+        gen._parse_input_mph(product.path, hdr)
+        self.assertEqual(hdr.footprint_polygon, 'polygon')
+        self.assertEqual(hdr.begin_position, begin)
+
+    def testMphIndex(self):
+        index_path = os.path.join(TEST_DIR, 'index.db')
+        gen = self.create_class_under_test(zip_output=True, mph_index=index_path)
+        begin = datetime.datetime(2021, 2, 1, 0, 26, 0, 0, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime(2021, 2, 1, 0, 27, 0, 0, tzinfo=datetime.timezone.utc)
+        gen._hdr.validity_start = gen._hdr.begin_position = begin
+        gen._hdr.validity_stop = gen._hdr.end_position = end
+        gen.read_scenario_parameters()
+        gen.generate_output()
+        gen.close()
+        self.assertIsNone(gen._mph_index)
+
+        # Products are indexed on creation
+        archive = glob.glob(os.path.join(TEST_DIR, 'BIO_RAWS025_10_*.zip'))[0]
+        # The index holds the MPH as written, not the header in memory.
+        with MphIndex(index_path) as index, zipfile.ZipFile(archive) as product:
+            document = index.lookup(archive, archive)
+            self.assertEqual(document, product.read([name for name in product.namelist() if name.endswith('.xml')][0]))
+        hdr = main_product_header.MainProductHeader()
+        hdr.parse(io.BytesIO(document))
+        self.assertEqual(hdr.begin_position, begin)
+
+        input = JobOrderInput()
+        input.file_type = 'RAWS025_10'
+        input.file_names = [archive]
+        gen = self.create_class_under_test(metadata_source='.*RAWS025_10', mph_index=index_path)
+        self.assertTrue(gen.parse_inputs([input]))
+        self.assertEqual(gen._hdr.begin_position, begin)
+        self.assertEqual(gen._hdr.end_position, end)
+
+    def testOutputWorkers(self):
+        # Products written by worker threads equal those written one by one.
+        begin = datetime.datetime(2021, 2, 1, 0, 24, 32, 0, tzinfo=datetime.timezone.utc)
+        end = datetime.datetime(2021, 2, 1, 0, 29, 32, 0, tzinfo=datetime.timezone.utc)
+        results = []
+        for workers in (1, 3):
+            os.makedirs(TEST_DIR)
+            index_path = os.path.join(TEST_DIR, 'index.db')
+            gen = self.create_class_under_test(size=1, content='pattern', content_seed=1, checksums=['md5'],
+                                               creation_date='2021-02-02T00:00:00.000Z',
+                                               output_workers=workers, mph_index=index_path)
+            messages = []
+            gen._logger.debug = gen._logger.info = lambda *args, **kwargs: messages.append(args)
+            gen._hdr.validity_start = gen._hdr.begin_position = begin
+            gen._hdr.validity_stop = gen._hdr.end_position = end
+            gen.read_scenario_parameters()
+            gen.generate_output()
+
+            products = {}
+            for path in sorted(glob.glob(os.path.join(TEST_DIR, 'BIO_RAWS025_10_*', '*'))):
+                with open(path, 'rb') as f:
+                    products[os.path.relpath(path, TEST_DIR)] = f.read()
+            index = MphIndex(index_path)
+            indexed = [index.lookup(os.path.join(TEST_DIR, os.path.dirname(path)), os.path.join(TEST_DIR, path))
+                       for path in products if path.endswith('.xml')]
+            index.close()
+            self.assertEqual(indexed, [products[path] for path in products if path.endswith('.xml')])
+            results.append((products, [args for args in messages if 'output_workers' not in args[0]]))
+            shutil.rmtree(TEST_DIR)
+        self.assertEqual(len(results[0][0]), 8)
+        self.assertEqual(results[0], results[1])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -4,6 +4,7 @@ Copyright (C) 2022 S[&]T, The Netherlands.
 import datetime
 import unittest
 
+from procsim.biomass.constants import ORBITAL_PERIOD
 from procsim.biomass.product_generator import ProductGeneratorBase
 
 
@@ -35,10 +36,11 @@ class SliceFrameUtilitiesTest(unittest.TestCase):
     spacing = datetime.timedelta(minutes=5)
 
     def test_get_anx(self) -> None:
-        # Attempt to get an ANX before any known ANX.
-        self.assertIsNone(self.gen._get_anx(self.anx1 - datetime.timedelta(seconds=1)))
-        self.assertIsNone(self.gen._get_anx(self.anx1 - datetime.timedelta(days=1)))
-        self.assertIsNone(self.gen._get_anx(self.anx1 - datetime.timedelta(days=1000)))
+        # Before the first ANX, ANX are extrapolated with the orbital period.
+        self.assertEqual(self.gen._get_anx(self.anx1 - datetime.timedelta(seconds=1)), self.anx1 - ORBITAL_PERIOD)
+        self.assertEqual(self.gen._get_anx(self.anx1 - ORBITAL_PERIOD), self.anx1 - ORBITAL_PERIOD)
+        self.assertEqual(self.gen._get_anx(self.anx1 - datetime.timedelta(days=1)), self.anx1 - 15 * ORBITAL_PERIOD)
+        self.assertEqual(self.gen._get_anx(self.anx1 - datetime.timedelta(days=1000)), self.anx1 - 14667 * ORBITAL_PERIOD)
 
         # Get the first ANX across the entire first orbit.
         self.assertEqual(self.gen._get_anx(self.anx1), self.anx1)
@@ -48,12 +50,17 @@ class SliceFrameUtilitiesTest(unittest.TestCase):
 
         # Get the second ANX.
         self.assertEqual(self.gen._get_anx(self.anx2), self.anx2)
-        self.assertEqual(self.gen._get_anx(self.anx2 + datetime.timedelta(days=1)), self.anx2)
-        self.assertEqual(self.gen._get_anx(self.anx2 + datetime.timedelta(days=10000)), self.anx2)
+        self.assertEqual(self.gen._get_anx(self.anx2 + ORBITAL_PERIOD - datetime.timedelta(seconds=1)), self.anx2)
+
+        # After the last ANX, ANX are extrapolated with the orbital period.
+        self.assertEqual(self.gen._get_anx(self.anx2 + ORBITAL_PERIOD), self.anx2 + ORBITAL_PERIOD)
+        self.assertEqual(self.gen._get_anx(self.anx2 + datetime.timedelta(days=1)), self.anx2 + 14 * ORBITAL_PERIOD)
+        self.assertEqual(self.gen._get_anx(self.anx2 + datetime.timedelta(days=10000)), self.anx2 + 146664 * ORBITAL_PERIOD)
 
     def test_get_slice_frame_nr(self) -> None:
-        # Get a slice/frame number before the first ANX.
-        self.assertIsNone(self.gen._get_slice_frame_nr(self.anx1 - datetime.timedelta(seconds=1), self.spacing))
+        # Get a slice/frame number before the first ANX, in an extrapolated orbit.
+        self.assertEqual(self.gen._get_slice_frame_nr(self.anx1 - datetime.timedelta(seconds=1), self.spacing), 20)
+        self.assertEqual(self.gen._get_slice_frame_nr(self.anx1 - ORBITAL_PERIOD + self.spacing, self.spacing), 2)
 
         # Get slices/frame numbers within the first orbit.
         self.assertEqual(self.gen._get_slice_frame_nr(self.anx1, self.spacing), 1)
@@ -64,11 +71,24 @@ class SliceFrameUtilitiesTest(unittest.TestCase):
 
         # Get slices/frame numbers within and after the second orbit.
         self.assertEqual(self.gen._get_slice_frame_nr(self.anx2, self.spacing), 1)
-        self.assertEqual(self.gen._get_slice_frame_nr(self.anx2 + self.spacing * 1000, self.spacing), 1)
+        self.assertEqual(self.gen._get_slice_frame_nr(self.anx2 + self.spacing * 1000, self.spacing), 19)
+        self.assertEqual(self.gen._get_slice_frame_nr(self.anx2 + 50 * ORBITAL_PERIOD + 2.5 * self.spacing, self.spacing), 3)
+
+    def test_orbital_period(self) -> None:
+        # The orbital period can be configured, e.g. in the scenario.
+        gen = ProductGeneratorBase(_Logger(), None, {'type': 'test'}, {'type': 'test'})
+        gen._anx_list = [self.anx1]
+        gen._orbital_period = datetime.timedelta(hours=1)
+        self.assertEqual(gen._anx_list, [self.anx1])
+        self.assertEqual(gen._get_anx(self.anx1 + datetime.timedelta(hours=2.5)), self.anx1 + datetime.timedelta(hours=2))
+        self.assertEqual(gen._get_anx(self.anx1 - datetime.timedelta(hours=2.5)), self.anx1 - datetime.timedelta(hours=3))
+        self.assertEqual(gen._get_slice_frame_nr(self.anx1 + datetime.timedelta(hours=1, minutes=7), self.spacing), 2)
 
     def test_get_slice_frame_interval(self) -> None:
-        # Get an interval before the first ANX.
-        self.assertIsNone(self.gen._get_slice_frame_interval(self.anx1 - datetime.timedelta(seconds=1), self.spacing))
+        # Get an interval before the first ANX, in an extrapolated orbit.
+        anx = self.anx1 - ORBITAL_PERIOD
+        self.assertEqual(self.gen._get_slice_frame_interval(self.anx1 - datetime.timedelta(seconds=1), self.spacing),
+                         (anx + 19 * self.spacing, anx + 20 * self.spacing))
 
         # Get intervals within the first orbit.
         self.assertEqual(self.gen._get_slice_frame_interval(self.anx1, self.spacing), (self.anx1, self.anx1 + self.spacing))
@@ -83,7 +103,9 @@ class SliceFrameUtilitiesTest(unittest.TestCase):
 
         # Get intervals within and after the second orbit.
         self.assertEqual(self.gen._get_slice_frame_interval(self.anx2, self.spacing), (self.anx2, self.anx2 + self.spacing))
-        self.assertEqual(self.gen._get_slice_frame_interval(self.anx2 + 1000.5 * self.spacing, self.spacing), (self.anx2, self.anx2 + self.spacing))
+        anx = self.anx2 + 50 * ORBITAL_PERIOD
+        self.assertEqual(self.gen._get_slice_frame_interval(self.anx2 + 1000.5 * self.spacing, self.spacing),
+                         (anx + 18 * self.spacing, anx + 19 * self.spacing))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,265 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Campaign mode: generate the products of a chain of tasks in one run.
+'''
+import argparse
+import concurrent.futures
+import copy
+import glob
+import json
+import os
+import random
+import re
+import signal
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from . import main as procsim_main
+from . import utils
+from .exceptions import ProcsimException, ScenarioError, TerminateError
+from .job_order import JobOrderInput, JobOrderTask
+from .logger import Logger
+from .version import __version__
+
+# Generated product: type, path and MPH document (None for products without
+# main product header, such as virtual frames).
+Product = Tuple[str, str, Optional[bytes]]
+
+
+class CampaignStep:
+    '''
+    Task of a campaign: the scenario to simulate, the steps it depends on,
+    and the inputs it takes from the products of these steps.
+    '''
+    def __init__(self, config: dict, previous: Optional['CampaignStep']):
+        if 'name' not in config or 'scenario' not in config:
+            raise ScenarioError('Campaign step must have a name and a scenario')
+        self.name: str = config['name']
+        self.scenario_name: str = config['scenario']
+        # By default, a step depends on the step before it.
+        self.after: List[str] = list(config.get('after', [] if previous is None else [previous.name]))
+        self.inputs: List[dict] = [{'type': input} if isinstance(input, str) else input
+                                   for input in config.get('inputs', [])]
+        self.parameters: dict = config.get('parameters', {})
+
+
+def _read_campaign(filename: str) -> dict:
+    with open(filename) as f:
+        try:
+            campaign = json.loads(utils.remove_trailing_commas(utils.json_remove_comments(f.read())))
+        except json.JSONDecodeError as e:
+            raise ScenarioError('Error in campaign file on line {}, column {}'.format(e.lineno, e.colno))
+    if 'config' not in campaign or 'steps' not in campaign:
+        raise ScenarioError('Campaign file incomplete')
+    return campaign
+
+
+def _select_inputs(step: CampaignStep, products: List[Product]) -> List[JobOrderInput]:
+    # Inputs of the step: the generated products of every input type, in the
+    # order in which they were generated, and the existing files, if any. As
+    # in job orders, the type can be a regular expression, e.g. S._RAW__0M.
+    inputs = []
+    for input_config in step.inputs:
+        input = JobOrderInput()
+        input.file_type = input_config['type']
+        pattern = input_config.get('pattern')
+        input.file_names = [path for file_type, path, _ in products if re.fullmatch(input.file_type, file_type) and
+                            (pattern is None or re.match(pattern, os.path.basename(path)))]
+        for file_pattern in input_config.get('files', []):
+            input.file_names.extend(sorted(glob.glob(file_pattern)))
+        inputs.append(input)
+    return inputs
+
+
+def _init_worker() -> None:
+    # Steps running in parallel write whole log lines.
+    sys.stdout.reconfigure(line_buffering=True)  # type: ignore
+
+
+def _run_step(mission: str, scenario: dict, log_level: Optional[str], job_task: JobOrderTask,
+              documents: Dict[str, bytes], default_log_level: Optional[str] = None) -> Tuple[int, List[Product]]:
+    '''
+    Simulate the task of a step, as procsim does for a scenario without job
+    order, and return the exit code and the generated products. Runs in a
+    worker process if steps run in parallel. As in procsim, log_level (from
+    the command line or campaign) takes precedence over the log level of the
+    scenario, which takes precedence over default_log_level (from the
+    configuration file).
+    '''
+    # As in every procsim run, for reproducibility.
+    random.seed(0)
+    logger = procsim_main._create_logger('N/A', scenario['processor_name'], scenario['processor_version'],
+                                         ['INFO', 'PROGRESS', 'WARNING', 'ERROR'], [],
+                                         log_level or scenario.get('log_level') or default_log_level)
+    logger.set_task_name(scenario['task_name'])
+    logger.info('Procsim v{} processor stub simulator'.format(__version__))
+    logger.info('Simulate scenario {}'.format(scenario['name']))
+    products: List[Product] = []
+    exit_code = scenario.get('exit_code', 0)
+    try:
+        procsim_main._run_task(logger, mission, scenario, job_task, documents,
+                               lambda file_type, path, document: products.append((file_type, path, document)))
+        logger.info('Task done, exit with code {}'.format(exit_code))
+    except TerminateError:
+        raise
+    except Exception as e:
+        exit_code = procsim_main.EXIT_CODE_ERROR
+        logger.error(str(e).strip('\n\r'))
+        logger.info('Terminate with code {}'.format(exit_code))
+    sys.stdout.flush()
+    return exit_code, products
+
+
+class Campaign:
+    '''
+    This class is responsible for running the steps of a campaign, such as
+    RAW, sliced RAW, L0, virtual frames, L1 and L2, in one process.
+
+    Every step simulates a scenario of the configuration file, as 'procsim
+    -s' does, without job order. The parameters of the timeline (data takes,
+    calibration events, ANX, etc.) replace those of every scenario, and the
+    parameters of a step replace both. The inputs of a step are the products
+    of the steps it depends on (directly or indirectly), selected by type.
+    Their main product headers are passed on in memory, they are not read
+    from disk again.
+
+    Steps only depend on steps before them. A step runs once the steps it
+    depends on are done; with more than one worker, steps that do not depend
+    on each other run in parallel, in worker processes. Steps that depend on
+    a failed step are skipped. The inputs of a step, and so the products, do
+    not depend on the number of workers.
+    '''
+    def __init__(self, logger: Logger, config: dict, campaign: dict, log_level: Optional[str] = None):
+        self._logger = logger
+        self._mission = config['mission']
+        self._scenarios: Dict[str, dict] = {}
+        for scenario in config['scenarios']:
+            self._scenarios.setdefault(scenario['name'], scenario)
+        self._timeline = campaign.get('timeline', {})
+        self._log_level = log_level or campaign.get('log_level')
+        self._default_log_level = config.get('log_level')
+        self.workers = campaign.get('workers', 1)
+        self._steps: List[CampaignStep] = []
+        self._ancestors: Dict[str, List[str]] = {}
+        for step_config in campaign['steps']:
+            step = CampaignStep(step_config, self._steps[-1] if self._steps else None)
+            if step.name in self._ancestors:
+                raise ScenarioError('Campaign step {} is defined twice'.format(step.name))
+            if step.scenario_name not in self._scenarios:
+                raise ScenarioError('No scenario "{}" found for campaign step {}'.format(step.scenario_name, step.name))
+            ancestors = set()
+            for name in step.after:
+                if name not in self._ancestors:
+                    raise ScenarioError('Campaign step {} must follow step {}'.format(step.name, name))
+                ancestors.add(name)
+                ancestors.update(self._ancestors[name])
+            # In campaign order, so that the inputs are in a fixed order.
+            self._ancestors[step.name] = [other.name for other in self._steps if other.name in ancestors]
+            self._steps.append(step)
+
+    def _scenario(self, step: CampaignStep) -> dict:
+        scenario = copy.deepcopy(self._scenarios[step.scenario_name])
+        scenario.update(copy.deepcopy(self._timeline))
+        scenario.update(copy.deepcopy(step.parameters))
+        return scenario
+
+    def _step_args(self, step: CampaignStep, products: Dict[str, List[Product]]) -> tuple:
+        # Arguments of _run_step
+        available = [product for name in self._ancestors[step.name] for product in products[name]]
+        job_task = JobOrderTask()
+        job_task.name = self._scenarios[step.scenario_name]['task_name']
+        job_task.inputs = _select_inputs(step, available)
+        selected = {path for input in job_task.inputs for path in input.file_names}
+        documents = {path: document for _, path, document in available if document is not None and path in selected}
+        return self._mission, self._scenario(step), self._log_level, job_task, documents, self._default_log_level
+
+    def run(self, workers: Optional[int] = None) -> int:
+        '''
+        Run all steps. Return 0 if all steps succeeded, else the exit code of
+        the first step (in campaign order) that failed.
+        '''
+        workers = max(1, workers or self.workers)
+        products: Dict[str, List[Product]] = {}
+        exit_codes: Dict[str, Optional[int]] = {}   # None for skipped steps
+        pending = list(self._steps)
+
+        def ready(step: CampaignStep) -> bool:
+            return all(name in exit_codes for name in step.after)
+
+        def complete(step: CampaignStep, exit_code: int, step_products: List[Product]) -> None:
+            exit_codes[step.name] = exit_code
+            products[step.name] = step_products
+            if exit_code == 0:
+                self._logger.info('Step {} done, {} products'.format(step.name, len(step_products)))
+            else:
+                self._logger.error('Step {} failed with code {}'.format(step.name, exit_code))
+
+        def start_ready(submit) -> None:
+            # Skipping a step makes the steps after it ready, so repeat until
+            # no step is ready.
+            ready_steps = [step for step in pending if ready(step)]
+            while ready_steps:
+                for step in ready_steps:
+                    pending.remove(step)
+                    failed = [name for name in step.after if exit_codes[name] != 0]
+                    if failed:
+                        self._logger.warning('Skip step {}, step {} did not succeed'.format(step.name, failed[0]))
+                        exit_codes[step.name] = None
+                        products[step.name] = []
+                        continue
+                    self._logger.info('Start step {}, scenario {}'.format(step.name, step.scenario_name))
+                    submit(step)
+                ready_steps = [step for step in pending if ready(step)]
+
+        if workers == 1:
+            while pending:
+                start_ready(lambda step: complete(step, *_run_step(*self._step_args(step, products))))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+                running: Dict[concurrent.futures.Future, CampaignStep] = {}
+                start_ready(lambda step: running.update({executor.submit(_run_step, *self._step_args(step, products)): step}))
+                while running:
+                    done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    # Complete in campaign order, for a reproducible log.
+                    for future in sorted(done, key=lambda future: self._steps.index(running[future])):
+                        complete(running.pop(future), *future.result())
+                    start_ready(lambda step: running.update({executor.submit(_run_step, *self._step_args(step, products)): step}))
+
+        for step in self._steps:
+            if exit_codes[step.name] is None:
+                return procsim_main.EXIT_CODE_ERROR
+            if exit_codes[step.name] != 0:
+                return exit_codes[step.name]
+        return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''Entry point of 'procsim campaign'.'''
+    parser = argparse.ArgumentParser(prog='procsim campaign',
+                                     description='Generate the products of a chain of tasks in one run.')
+    parser.add_argument('campaign_filename', help='campaign file: configuration file, timeline and steps')
+    parser.add_argument('-w', '--workers', type=int, help='number of steps that can run in parallel')
+    parser.add_argument('-l', '--log-level', dest='log_level',
+                        choices=['debug', 'info', 'progress', 'warning', 'error'],
+                        help='force log level')
+    args = parser.parse_args(argv)
+
+    logger = procsim_main._create_logger('N/A', 'procsim', __version__, ['INFO', 'PROGRESS', 'WARNING', 'ERROR'], [],
+                                         args.log_level)
+    logger.set_task_name('campaign')
+    signal.signal(signal.SIGTERM, procsim_main.signal_term_handler)
+    signal.signal(signal.SIGINT, procsim_main.signal_int_handler)
+    try:
+        campaign_config = _read_campaign(args.campaign_filename)
+        config = procsim_main._read_config(logger, campaign_config['config'])
+        campaign = Campaign(logger, config, campaign_config, args.log_level)
+        logger.info('Run campaign {}, {} steps'.format(args.campaign_filename, len(campaign_config['steps'])))
+        exit_code = campaign.run(args.workers)
+    except KeyboardInterrupt:
+        return 130
+    except (OSError, ProcsimException) as e:
+        logger.error(str(e))
+        return procsim_main.EXIT_CODE_ERROR
+    logger.info('Campaign done, exit with code {}'.format(exit_code))
+    return exit_code
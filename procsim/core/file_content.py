@@ -0,0 +1,156 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Content generator for the 'data' files in generated products.
+'''
+import hashlib
+import io
+import os
+import random
+import zlib
+from typing import Iterable, Optional
+
+from procsim.core.exceptions import ScenarioError
+
+_MB = 2**20
+CHUNK_SIZE = 1 * _MB
+
+# Supported content types:
+# - urandom: random bytes from the OS (slowest)
+# - random: pseudo random bytes, reproducible using a seed
+# - pattern: one block of pseudo random bytes, repeated
+# - zeros: zero bytes
+# - sparse: zero bytes, but the file is extended without writing (a 'hole'),
+#   if the file system supports it
+CONTENT_TYPES = ['urandom', 'random', 'pattern', 'zeros', 'sparse']
+
+CHECKSUM_TYPES = ['md5', 'sha256', 'crc32']
+
+
+class Checksum:
+    '''
+    Incrementally computed checksum, one of CHECKSUM_TYPES.
+    '''
+    def __init__(self, algorithm: str):
+        if algorithm not in CHECKSUM_TYPES:
+            raise ScenarioError('Checksum {} not supported, use one of {}'.format(algorithm, CHECKSUM_TYPES))
+        self.algorithm = algorithm
+        self._crc = 0
+        self._hash = None if algorithm == 'crc32' else hashlib.new(algorithm)
+
+    def update(self, data) -> None:
+        if self._hash is None:
+            self._crc = zlib.crc32(data, self._crc)
+        else:
+            self._hash.update(data)
+
+    def hexdigest(self) -> str:
+        if self._hash is None:
+            return '{:08x}'.format(self._crc)
+        return self._hash.hexdigest()
+
+
+def preallocate(file, size: int) -> bool:
+    '''
+    Reserve size bytes on disk for a real file that is about to be written, so
+    that the file system allocates its blocks at once. Return False if not
+    possible, such as for in-memory streams or unsupported file systems.
+    '''
+    if size <= 0 or not hasattr(os, 'posix_fallocate'):
+        return False
+    try:
+        os.posix_fallocate(file.fileno(), 0, size)
+    except (AttributeError, io.UnsupportedOperation, OSError):
+        return False
+    return True
+
+
+class ContentGenerator:
+    '''
+    This class is responsible for writing (dummy) content to files.
+    '''
+    def __init__(self, content: str = 'urandom', seed: Optional[int] = None):
+        if content not in CONTENT_TYPES:
+            raise ScenarioError('Content {} not supported, use one of {}'.format(content, CONTENT_TYPES))
+        self._content = content
+        # Without seed, use the global generator (seeded by procsim at startup).
+        self._rng = random.Random(seed) if seed is not None else random
+        self._block: Optional[bytes] = None
+
+    @property
+    def content(self):
+        return self._content
+
+    def fork(self) -> 'ContentGenerator':
+        '''
+        Return a generator for a file or product that is written in another
+        thread.
+        Pseudo random content is drawn from a generator of its own, seeded by
+        this one, so that the content does not depend on the order in which
+        threads write.
+        '''
+        if self._content == 'random':
+            return ContentGenerator(self._content, self._rng.getrandbits(64))
+        if self._content == 'pattern':
+            self._get_block()
+        return self
+
+    def _randbytes(self, amount: int) -> bytes:
+        # randbytes is available from Python 3.9 on; this is its equivalent.
+        if hasattr(self._rng, 'randbytes'):
+            return self._rng.randbytes(amount)
+        return self._rng.getrandbits(8 * amount).to_bytes(amount, 'little') if amount > 0 else b''
+
+    def _get_block(self) -> memoryview:
+        # Pre-generated block, re-used for every chunk.
+        if self._block is None:
+            if self._content == 'pattern':
+                self._block = self._randbytes(CHUNK_SIZE)
+            else:
+                self._block = bytes(CHUNK_SIZE)
+        return memoryview(self._block)
+
+    def _chunk(self, amount: int):
+        if self._content == 'urandom':
+            return os.urandom(amount)
+        if self._content == 'random':
+            return self._randbytes(amount)
+        return self._get_block()[:amount]
+
+    @staticmethod
+    def _extend(file, size: int) -> bool:
+        # Extend a real file without writing data. Return False if not possible,
+        # such as for in-memory or compressed streams.
+        try:
+            fd = file.fileno()
+            if not file.seekable():
+                return False
+        except (AttributeError, io.UnsupportedOperation):
+            return False
+        file.flush()
+        end = file.tell() + size
+        os.ftruncate(fd, end)
+        file.seek(end)
+        return True
+
+    def write(self, file, size: int, checksums: Iterable[Checksum] = ()) -> None:
+        '''
+        Write size bytes to the (binary) file object, at the current position.
+        The checksums are updated with the data while writing.
+        '''
+        if self._content == 'sparse' and self._extend(file, size):
+            zeros = memoryview(bytes(min(size, CHUNK_SIZE)))
+            for checksum in checksums:
+                remaining = size
+                while remaining > 0:
+                    amount = min(remaining, CHUNK_SIZE)
+                    checksum.update(zeros[:amount])
+                    remaining -= amount
+            return
+        while size > 0:
+            amount = min(size, CHUNK_SIZE)
+            chunk = self._chunk(amount)
+            file.write(chunk)
+            for checksum in checksums:
+                checksum.update(chunk)
+            size -= amount
@@ -0,0 +1,113 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Catalogue of the input products of a task, shared by all product generators.
+'''
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from procsim.core.job_order import JobOrderInput
+from procsim.core.product_archive import ProductArchive, is_archive
+
+
+class InputProduct:
+    '''
+    Input product of a task. The metadata (MPH document and header) is filled
+    in by the header reader of the mission, on first use.
+    '''
+    def __init__(self, file_type: str, path: str, zip_extension: str = '.zip'):
+        self.file_type = file_type
+        self.path = path
+        self.is_archive = is_archive(path, zip_extension)
+        self.root = os.path.splitext(path)[0] if self.is_archive else path
+        self.is_dir = not self.is_archive and os.path.isdir(path)
+        self.document: Optional[bytes] = None
+        self.header: Any = None
+        self._is_read = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_product(self) -> bool:
+        '''True for (zipped) product directories, which have a main product header.'''
+        return self.is_archive or self.is_dir
+
+
+class InputCatalogue:
+    '''
+    This class is responsible for preparing the inputs of a task once, and
+    giving all product generators of the task access to them.
+
+    Every input is inspected once. Archives are extracted at most once, and
+    everything that is read from the inputs (main product headers, orbit
+    files, etc.) is cached, so that the product generators do not repeat
+    the work. The generators must not modify the cached objects.
+
+    Parsing is mission specific, so the mission sets a header reader. It
+    reads the main product header of an InputProduct and sets the document
+    (the MPH file contents) and header fields.
+    '''
+    def __init__(self, inputs: Iterable[JobOrderInput], zip_extension: str = '.zip'):
+        self._by_path: Dict[str, InputProduct] = {}
+        self._cache: Dict[Any, Any] = {}
+        self._header_reader: Optional[Callable[[InputProduct], None]] = None
+        for input in inputs:
+            for path in input.file_names:
+                product = InputProduct(input.file_type, path, zip_extension)
+                self._by_path.setdefault(path, product)
+
+    def set_header_reader(self, reader: Callable[[InputProduct], None]) -> None:
+        if self._header_reader is None:
+            self._header_reader = reader
+
+    def product(self, path: str, zip_extension: str = '.zip') -> Optional[InputProduct]:
+        '''
+        Return the input at path. The zip extension can be configured per
+        output, so an archive with another extension than the one of the
+        catalogue is recognized here.
+        '''
+        product = self._by_path.get(path)
+        if product is not None and not product.is_product and is_archive(path, zip_extension):
+            product.is_archive = True
+            product.root = os.path.splitext(path)[0]
+        return product
+
+    def get(self, key, loader: Callable[[], Any]) -> Any:
+        '''Return the cached result of loader, call it on first use.'''
+        if key not in self._cache:
+            self._cache[key] = loader()
+        return self._cache[key]
+
+    def set_document(self, path: str, document: bytes) -> None:
+        '''
+        Set the MPH document of the input product at path, if it is known
+        already, e.g. because the product was generated in the same process.
+        The header reader then parses it, instead of reading the product.
+        '''
+        product = self._by_path.get(path)
+        if product is not None and not product._is_read:
+            product.document = document
+
+    def read_header(self, product: InputProduct) -> Any:
+        '''
+        Return the header of product, read it on first use. Headers can be
+        read by several threads; every product is read once.
+        '''
+        if not product._is_read:
+            with product._lock:
+                if not product._is_read:
+                    if self._header_reader is None:
+                        raise ValueError('No header reader set')
+                    self._header_reader(product)
+                    product._is_read = True
+        return product.header
+
+    def extract(self, product: InputProduct, keep_zip: bool = False) -> None:
+        '''Extract a zipped product, once. Afterwards, the product is a directory.'''
+        if not product.is_archive:
+            return
+        ProductArchive(product.path).extract(keep_zip)
+        product.is_archive = False
+        product.is_dir = True
+        product.path = product.root
+        self._by_path.setdefault(product.root, product)
@@ -0,0 +1,52 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Overlap queries on time intervals, such as data takes and calibration events.
+'''
+import bisect
+import datetime
+import itertools
+from typing import Generic, Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar('T')
+
+Interval = Tuple[datetime.datetime, datetime.datetime, T]
+
+
+class IntervalIndex(Generic[T]):
+    '''
+    This class is responsible for finding the intervals that overlap a period.
+    An interval is a tuple of start, stop and a value, e.g. the configuration
+    of a data take.
+
+    The intervals are sorted by start (intervals with the same start keep
+    their order). Next to the start times, the running maximum of the stop
+    times is kept. Both are sorted, so the candidate intervals of a query are
+    found by bisection. Queries cost O(log n + k) for k results, provided that
+    the intervals do not nest: intervals that lie within a preceding, longer
+    interval are visited and skipped.
+    '''
+    def __init__(self, intervals: Iterable[Interval]):
+        self._intervals: List[Interval] = sorted(intervals, key=lambda interval: interval[0])
+        self._starts = [start for start, _, _ in self._intervals]
+        self._max_stops = list(itertools.accumulate((stop for _, stop, _ in self._intervals), max))
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def __iter__(self) -> Iterator[Interval]:
+        return iter(self._intervals)
+
+    def overlapping(self, start: datetime.datetime, end: datetime.datetime,
+                    closed: bool = True) -> List[Interval]:
+        '''
+        Return the intervals that overlap [start, end], ordered by start. If
+        closed is false, intervals that only touch the period are excluded.
+        '''
+        if closed:
+            lo = bisect.bisect_left(self._max_stops, start)
+            hi = bisect.bisect_right(self._starts, end)
+            return [interval for interval in self._intervals[lo:hi] if interval[1] >= start]
+        lo = bisect.bisect_right(self._max_stops, start)
+        hi = bisect.bisect_left(self._starts, end)
+        return [interval for interval in self._intervals[lo:hi] if interval[1] > start]
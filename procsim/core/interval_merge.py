@@ -0,0 +1,69 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Merging of time intervals per key, such as the periods of partial products.
+'''
+import datetime
+from typing import Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+T = TypeVar('T')
+
+Span = Tuple[datetime.datetime, datetime.datetime]
+
+
+class Coverage(Generic[T]):
+    '''
+    Coverage of the intervals of one key: the spans that are covered without
+    interruption, ordered by start, and the gaps between them.
+
+    first is the value of the interval that starts first, last the value of
+    the interval that ends last (of the intervals ending last, the one that
+    comes last in start order).
+    '''
+    def __init__(self):
+        self.spans: List[Span] = []
+        self.gaps: List[Span] = []
+        self.count = 0
+        self.first: Optional[T] = None
+        self.last: Optional[T] = None
+
+    @property
+    def is_contiguous(self) -> bool:
+        '''True if the intervals cover a single span, without gaps.'''
+        return self.count > 0 and not self.gaps
+
+
+def merge_intervals(intervals: Iterable[Tuple[K, datetime.datetime, datetime.datetime, T]]) -> Dict[K, Coverage[T]]:
+    '''
+    Merge intervals, given as tuples of key, start, stop and a value, per key.
+    Return the coverage of every key, in the order in which the keys first
+    occur.
+
+    The intervals of a key are sorted by start and stop once (intervals that
+    are equal keep their order), and swept while keeping the latest stop so
+    far. Intervals that touch or overlap are merged, also if they lie within
+    a preceding, longer interval. Merging n intervals costs O(n log n).
+    '''
+    groups: Dict[K, List[Tuple[datetime.datetime, datetime.datetime, T]]] = {}
+    for key, start, stop, value in intervals:
+        groups.setdefault(key, []).append((start, stop, value))
+
+    result: Dict[K, Coverage[T]] = {}
+    for key, group in groups.items():
+        group.sort(key=lambda interval: (interval[0], interval[1]))
+        coverage: Coverage[T] = Coverage()
+        coverage.count = len(group)
+        coverage.first = group[0][2]
+        span_start, span_stop, coverage.last = group[0]
+        for start, stop, value in group[1:]:
+            if start > span_stop:
+                coverage.spans.append((span_start, span_stop))
+                coverage.gaps.append((span_stop, start))
+                span_start = start
+            if stop >= span_stop:
+                span_stop = stop
+                coverage.last = value
+        coverage.spans.append((span_start, span_stop))
+        result[key] = coverage
+    return result
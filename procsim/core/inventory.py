@@ -0,0 +1,239 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Inventory of generated products, stored in an SQLite database, and the
+'procsim inventory' command line tool to query it and to resolve JobOrder
+templates.
+'''
+import argparse
+import datetime
+import glob
+import os
+import sqlite3
+import sys
+from typing import Dict, List, Optional
+from xml.etree import ElementTree as et
+
+from procsim.core import timestamps
+
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    product_type TEXT,
+    begin_position TEXT,
+    end_position TEXT,
+    validity_start TEXT,
+    validity_stop TEXT,
+    slice_frame_nr INTEGER,
+    data_take_id INTEGER,
+    baseline TEXT
+);
+CREATE INDEX IF NOT EXISTS products_by_begin ON products (product_type, begin_position);
+CREATE INDEX IF NOT EXISTS products_by_validity ON products (product_type, validity_start);
+CREATE INDEX IF NOT EXISTS products_by_name ON products (dir, name);
+CREATE TABLE IF NOT EXISTS durations (
+    product_type TEXT PRIMARY KEY,
+    max_phenomenon REAL NOT NULL,
+    max_validity REAL NOT NULL
+);
+'''
+
+_COLUMNS = ['path', 'product_type', 'begin_position', 'end_position', 'validity_start', 'validity_stop',
+            'slice_frame_nr', 'data_take_id', 'baseline']
+
+
+def _time_as_str(time: Optional[datetime.datetime]) -> Optional[str]:
+    # Fixed width UTC times, so that they can be compared as strings.
+    if time is None:
+        return None
+    if time.tzinfo is not None:
+        time = time.astimezone(datetime.timezone.utc)
+    return timestamps.format_time(time, _TIME_FORMAT)
+
+
+def _duration(start: Optional[datetime.datetime], stop: Optional[datetime.datetime]) -> float:
+    if start is None or stop is None:
+        return 0.0
+    return max((stop - start).total_seconds(), 0.0)
+
+
+def time_from_iso(timestr: str) -> datetime.datetime:
+    '''Parse a UTC time in ISO format, with or without fraction and 'Z' suffix.'''
+    if '.' in timestr:
+        return timestamps.from_iso(timestr)
+    return timestamps.from_iso_short(timestr)
+
+
+class ProductInventory:
+    '''
+    This class is responsible for keeping an inventory of products: path,
+    type, phenomenon and validity times, slice/frame number, data take and
+    baseline.
+
+    Time interval queries use an index on (type, start time). To bound the
+    index range, the maximum product duration per type is kept as well.
+
+    The database uses write-ahead logging, so it can be shared by procsim
+    instances running in parallel.
+    '''
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def add(self, path: str, product_type: Optional[str],
+            begin_position: Optional[datetime.datetime], end_position: Optional[datetime.datetime],
+            validity_start: Optional[datetime.datetime] = None, validity_stop: Optional[datetime.datetime] = None,
+            slice_frame_nr: Optional[int] = None, data_take_id: Optional[int] = None,
+            baseline: Optional[str] = None) -> None:
+        '''Add a product, or replace it if the path is already present.'''
+        path = os.path.abspath(path)
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.execute('INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                path, os.path.dirname(path), os.path.basename(path), product_type,
+                _time_as_str(begin_position), _time_as_str(end_position),
+                _time_as_str(validity_start), _time_as_str(validity_stop),
+                slice_frame_nr, data_take_id, None if baseline is None else str(baseline)))
+            self._db.execute(
+                'INSERT INTO durations VALUES (?, ?, ?) ON CONFLICT (product_type) DO UPDATE SET '
+                'max_phenomenon = max(max_phenomenon, excluded.max_phenomenon), '
+                'max_validity = max(max_validity, excluded.max_validity)',
+                (product_type, _duration(begin_position, end_position), _duration(validity_start, validity_stop)))
+
+    def remove(self, path: str) -> None:
+        self._db.execute('DELETE FROM products WHERE path = ?', (os.path.abspath(path),))
+
+    def query(self, product_type: Optional[str] = None,
+              overlaps: Optional[tuple] = None, validity: bool = False,
+              slice_frame_nr: Optional[int] = None, data_take_id: Optional[int] = None,
+              baseline: Optional[str] = None) -> List[Dict]:
+        '''
+        Return the products matching all given criteria, ordered by start
+        time. overlaps is a (start, stop) tuple, compared with the phenomenon
+        times (begin/end position), or with the validity times if validity is
+        set.
+        '''
+        start_col, stop_col = ('validity_start', 'validity_stop') if validity else ('begin_position', 'end_position')
+        conditions = []
+        params: list = []
+        if product_type is not None:
+            conditions.append('product_type = ?')
+            params.append(product_type)
+        if overlaps is not None:
+            start, stop = overlaps
+            conditions.append('{} <= ? AND {} >= ?'.format(start_col, stop_col))
+            params.extend([_time_as_str(stop), _time_as_str(start)])
+            if product_type is not None:
+                # Products start at most 'max duration' before the start of the interval.
+                row = self._db.execute('SELECT max_phenomenon, max_validity FROM durations WHERE product_type = ?',
+                                       (product_type,)).fetchone()
+                if row is not None:
+                    max_duration = row['max_validity'] if validity else row['max_phenomenon']
+                    conditions.append('{} >= ?'.format(start_col))
+                    params.append(_time_as_str(start - datetime.timedelta(seconds=max_duration)))
+        for column, value in (('slice_frame_nr', slice_frame_nr), ('data_take_id', data_take_id), ('baseline', baseline)):
+            if value is not None:
+                conditions.append('{} = ?'.format(column))
+                params.append(value)
+        sql = 'SELECT {} FROM products'.format(', '.join(_COLUMNS))
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY {}, path'.format(start_col)
+        return [dict(row) for row in self._db.execute(sql, params)]
+
+    def find(self, pattern: str) -> List[str]:
+        '''
+        Return the paths of the products matching pattern, a path with shell
+        style wildcards in the file name part.
+        '''
+        dir, name = os.path.split(os.path.abspath(pattern))
+        rows = self._db.execute('SELECT path FROM products WHERE dir = ? AND name GLOB ? ORDER BY path', (dir, name))
+        return [row['path'] for row in rows]
+
+
+def _has_wildcards(name: str) -> bool:
+    return any(c in name for c in '*?[')
+
+
+def resolve_job_order(inventory: ProductInventory, src: str, dest: str) -> List[str]:
+    '''
+    Read JobOrder (template) src, replace file names containing wildcards by
+    the name of the single matching product in the inventory, and write the
+    result to dest. Patterns without matches in the inventory, such as those
+    of products that were not generated with the inventory enabled, are
+    matched with the files on disk instead. As in
+    examples/resolve_wildcards.py, names that cannot be resolved are replaced
+    by 'dummy'. Return the list of unresolved patterns.
+    '''
+    tree = et.parse(src)
+    unresolved = []
+    for el in tree.findall('List_of_Tasks/Task/List_of_Inputs/Input/List_of_Selected_Inputs/Selected_Input/List_of_File_Names/File_Name'):
+        if el.text is None or not _has_wildcards(el.text):
+            continue
+        paths = inventory.find(el.text) or glob.glob(el.text)
+        if len(paths) != 1:
+            unresolved.append(el.text)
+            el.text = 'dummy'
+        else:
+            # Keep the directory as specified in the template.
+            el.text = os.path.join(os.path.dirname(el.text), os.path.basename(paths[0]))
+    tree.write(dest)
+    return unresolved
+
+
+def _print_products(products: List[Dict], long: bool) -> None:
+    for product in products:
+        if long:
+            print('\t'.join('' if product[column] is None else str(product[column]) for column in _COLUMNS[1:] + ['path']))
+        else:
+            print(product['path'])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''Entry point of 'procsim inventory'.'''
+    parser = argparse.ArgumentParser(prog='procsim inventory', description='Query the inventory of generated products.')
+    parser.add_argument('-d', '--database', required=True, help='inventory database, as set in the scenario')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query = commands.add_parser('query', help='list products matching all criteria, ordered by start time')
+    query.add_argument('--type', dest='product_type', help='product type')
+    query.add_argument('--overlaps', nargs=2, metavar=('T1', 'T2'), help='products overlapping with [T1, T2] (ISO times)')
+    query.add_argument('--validity', action='store_true', help='use validity times instead of phenomenon times')
+    query.add_argument('--slice', dest='slice_frame_nr', type=int, help='slice/frame number')
+    query.add_argument('--data-take', dest='data_take_id', type=int, help='data take ID')
+    query.add_argument('--baseline', help='baseline')
+    query.add_argument('-l', '--long', action='store_true', help='also list type, times, slice, data take and baseline')
+
+    resolve = commands.add_parser('resolve', help='resolve wildcards in a JobOrder template')
+    resolve.add_argument('src', help='JobOrder template')
+    resolve.add_argument('dest', help='resolved JobOrder')
+
+    args = parser.parse_args(argv)
+    inventory = ProductInventory(args.database)
+    try:
+        if args.command == 'query':
+            overlaps = None
+            if args.overlaps is not None:
+                try:
+                    overlaps = (time_from_iso(args.overlaps[0]), time_from_iso(args.overlaps[1]))
+                except ValueError as e:
+                    parser.error(str(e))
+            _print_products(inventory.query(args.product_type, overlaps, args.validity, args.slice_frame_nr,
+                                            args.data_take_id, args.baseline), args.long)
+        else:
+            for pattern in resolve_job_order(inventory, args.src, args.dest):
+                print('Cannot resolve {}'.format(pattern), file=sys.stderr)
+    finally:
+        inventory.close()
+    return 0
@@ -4,8 +4,9 @@ Copyright (C) 2021 S[&]T, The Netherlands.
 Interface for procsim product generators
 '''
 import abc
-from typing import Iterable, List
+from typing import Callable, Iterable, List, Optional
 
+from .input_catalogue import InputCatalogue
 from .job_order import JobOrderInput
 
 
@@ -17,6 +18,28 @@ class IProductGenerator(abc.ABC):
     def parse_inputs(self, inputs: Iterable[JobOrderInput]) -> bool:
         pass
 
+    def set_input_catalogue(self, catalogue: InputCatalogue) -> None:
+        '''
+        Optional: use the inputs prepared by the catalogue, which is shared by
+        all generators of the task, instead of reading them again.
+        '''
+        pass
+
+    def set_output_listener(self, listener: Callable[[str, str, Optional[bytes]], None]) -> None:
+        '''
+        Optional: call listener with the product type, path and MPH document
+        (the file contents) of every generated product (None if the product
+        has no main product header).
+        '''
+        pass
+
+    def close(self) -> None:
+        '''
+        Optional: release the resources held by the generator, such as
+        database connections. Called when the task is done.
+        '''
+        pass
+
     @abc.abstractmethod
     def list_scenario_parameters(self) -> List[str]:
         '''
@@ -11,6 +11,7 @@ import datetime
 from typing import List, Optional
 from xml.etree import ElementTree as et
 
+from procsim.core import timestamps
 from procsim.core.exceptions import ParseError, ProcsimException
 
 THIS_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -79,15 +80,11 @@ class JobOrderParser:
     Only errors are logged, since the logger is not setup yet (it needs info
     from the JobOrder for that).
     '''
-    ISO_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
-
     @classmethod
     def _time_from_iso(cls, timestr: Optional[str]) -> Optional[datetime.datetime]:
         if timestr is None:
             return None
-        if timestr[-1] == 'Z':
-            timestr = timestr[:-1]  # strip 'Z', if any
-        return datetime.datetime.strptime(timestr, cls.ISO_TIME_FORMAT).replace(tzinfo=datetime.timezone.utc)
+        return timestamps.from_iso(timestr)
 
     def __init__(self, logger, schema):
         self._logger = logger
@@ -11,13 +11,15 @@ import os
 import random
 import signal
 import sys
-from typing import List, Optional, Tuple
+from typing import Callable, List, Mapping, Optional, Tuple
 
-from . import utils
+from . import campaign, inventory, utils
 from .iproduct_generator import IProductGenerator
 from .exceptions import GeneratorError, ScenarioError, TerminateError
+from .input_catalogue import InputCatalogue
 from .job_order import JobOrderParser, JobOrderTask, job_order_parser_factory
 from .logger import Logger
+from .resource_monitor import ResourceMonitor
 from .version import __version__
 from .work_simulator import WorkSimulator
 
@@ -210,6 +212,7 @@ def _do_work(logger, config, job_task: Optional[JobOrderTask]):
     memory_mb = config.get('memory_usage', 0)
     disk_space_mb = config.get('disk_usage', 0)
     nr_progress_log_messages = config.get('nr_progress_log_messages', 0)
+    pin_cpus = config.get('pin_cpus', False)
 
     # The Job order resource parameters are treated as limits over the
     # resource usage as specified in the scenario config.
@@ -217,7 +220,7 @@ def _do_work(logger, config, job_task: Optional[JobOrderTask]):
         if job_task.nr_cpu_cores != 0.0:
             nr_cpu = min(nr_cpu, int(job_task.nr_cpu_cores))
         memory_mb = min(memory_mb, job_task.amount_of_ram_mb)
-        disk_space_mb = min(memory_mb, job_task.disk_space_mb)
+        disk_space_mb = min(disk_space_mb, job_task.disk_space_mb)
 
     worker = WorkSimulator(
         logger,
@@ -225,9 +228,34 @@ def _do_work(logger, config, job_task: Optional[JobOrderTask]):
         nr_cpu,
         memory_mb,
         disk_space_mb,
-        nr_progress_log_messages)
+        nr_progress_log_messages,
+        pin_cpus=pin_cpus)
     worker.start()
 
+    # Effective targets, to be compared with the actual resource usage
+    return {
+        'wall_time': time,
+        'cpu_time': time * nr_cpu,
+        'peak_rss_mb': memory_mb,
+        'written_mb': disk_space_mb,
+    }
+
+
+def _report_resource_usage(logger, config, targets: dict, monitor: ResourceMonitor):
+    # Log actual resource usage versus scenario, and optionally write it to a
+    # JSON file.
+    usage = monitor.report()
+    logger.info('Resource usage: wall time {} s, cpu time {} s, peak RSS {} MB, average RSS {} MB, '
+                'read {} MB, written {} MB'.format(usage['wall_time'], usage['cpu_time'], usage['peak_rss_mb'],
+                                                   usage['average_rss_mb'], usage['read_mb'], usage['written_mb']))
+    for key, target in targets.items():
+        logger.info('Resource usage: {} {} (scenario {})'.format(key, usage[key], target))
+    report_file = config.get('resource_report')
+    if report_file:
+        with open(report_file, 'w') as f:
+            json.dump({'scenario': targets, 'actual': usage}, f, indent=2)
+        logger.debug('Resource usage written to {}'.format(report_file))
+
 
 def _generate_intermediate_files(logger, job_task: Optional[JobOrderTask]):
     if job_task is None:
@@ -244,10 +272,64 @@ def _generate_intermediate_files(logger, job_task: Optional[JobOrderTask]):
             file.close()
 
 
+def _create_logger(node: str, processor_name: str, processor_version: str, stdout_levels: List[str],
+                   stderr_levels: List[str], log_level: Optional[str] = None) -> Logger:
+    # The log level, if set, overrules the levels of the job order.
+    if log_level is not None:
+        stdout_levels = []
+        stderr_levels = []
+        for level in Logger.LEVELS[::-1]:
+            stdout_levels.append(level)
+            if level == log_level.upper():
+                break
+    return Logger(node, processor_name, processor_version, stdout_levels, stderr_levels)
+
+
+def _run_task(logger: Logger, mission: str, scenario: dict, job_task: JobOrderTask,
+              documents: Optional[Mapping[str, bytes]] = None,
+              output_listener: Optional[Callable[[str, str, Optional[bytes]], None]] = None) -> None:
+    '''
+    Simulate the task: consume resources, then generate the output products
+    of the scenario. The MPH documents of input products that are known
+    already can be passed in documents, keyed by path. If set, the output
+    listener is called for every generated product.
+    '''
+    _log_processor_parameters(job_task.processing_parameters, logger)
+    _log_inputs(job_task.inputs, logger)
+    _log_configured_messages(scenario, logger)
+
+    monitor = ResourceMonitor()
+    monitor.start()
+    targets = _do_work(logger, scenario, job_task)
+
+    _generate_intermediate_files(logger, job_task)
+
+    generators = _create_product_generators(logger, mission, job_task, scenario)
+    catalogue = InputCatalogue(job_task.inputs)
+    for path, document in (documents or {}).items():
+        catalogue.set_document(path, document)
+    for gen in generators:
+        try:
+            gen.set_input_catalogue(catalogue)
+            if output_listener is not None:
+                gen.set_output_listener(output_listener)
+            if job_task.inputs and not gen.parse_inputs(job_task.inputs):
+                raise GeneratorError('Parsing inputs failed')
+            gen.read_scenario_parameters()
+            gen.generate_output()
+        finally:
+            gen.close()
+
+    monitor.stop()
+    _report_resource_usage(logger, scenario, targets, monitor)
+
+
 versiontext = "procsim v" + __version__ + \
     ", Copyright (C) 2022 S[&]T, The Netherlands."
 procsim_description = \
-    "Simulate a processor task, using a scenario read from config_filename."
+    "Simulate a processor task, using a scenario read from config_filename. " \
+    "Use 'procsim inventory -h' to query the inventory of generated products, " \
+    "'procsim campaign -h' to generate the products of a chain of tasks in one run."
 
 
 def print_product_info(prod):
@@ -327,6 +409,11 @@ def parse_command_line():
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'inventory':
+        sys.exit(inventory.main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == 'campaign':
+        sys.exit(campaign.main(sys.argv[2:]))
+
     task_filename, job_filename, config_filename, scenario_name, log_level, no_match_outputs = parse_command_line()
     logger = Logger('', '', '', Logger.LEVELS, [])  # Create temporary logger
 
@@ -348,25 +435,8 @@ def main():
 
         scenario, job_task = _find_fitting_scenario(task_filename, config, job, scenario_name, no_match_outputs)
 
-        # Adjust log level
-        stdout_levels = job.stdout_levels
-        stderr_levels = job.stderr_levels
-        log_level = log_level or scenario.get('log_level') or config.get('log_level')
-        if log_level is not None:
-            stdout_levels = []
-            stderr_levels = []
-            for level in Logger.LEVELS[::-1]:
-                stdout_levels.append(level)
-                if level == log_level.upper():
-                    break
-
-        logger = Logger(
-            job.node,
-            job.processor_name,
-            job.processor_version,
-            stdout_levels,
-            stderr_levels
-        )
+        logger = _create_logger(job.node, job.processor_name, job.processor_version, job.stdout_levels,
+                                job.stderr_levels, log_level or scenario.get('log_level') or config.get('log_level'))
 
         exit_code = scenario.get('exit_code', 0)
 
@@ -378,20 +448,7 @@ def main():
             if job._is_validated:
                 logger.debug('JobOrder validation against schema: OK')
             logger.info('Read task {} from the JobOrder'.format(job_task.name))
-        _log_processor_parameters(job_task.processing_parameters, logger)
-        _log_inputs(job_task.inputs, logger)
-        _log_configured_messages(scenario, logger)
-
-        _do_work(logger, scenario, job_task)
-
-        _generate_intermediate_files(logger, job_task)
-
-        generators = _create_product_generators(logger, config['mission'], job_task, scenario)
-        for gen in generators:
-            if job_task.inputs and not gen.parse_inputs(job_task.inputs):
-                raise GeneratorError('Parsing inputs failed')
-            gen.read_scenario_parameters()
-            gen.generate_output()
+        _run_task(logger, config['mission'], scenario, job_task)
 
         logger.info('Task done, exit with code {}'.format(exit_code))
 
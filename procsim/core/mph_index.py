@@ -0,0 +1,153 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Persistent index of main product headers.
+'''
+import array
+import datetime
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+
+# Version of the schema. Tables of older versions are dropped, the index is
+# a cache.
+_VERSION = 1
+
+_SCHEMA = '''
+DROP TABLE IF EXISTS mph;
+CREATE TABLE mph (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    product_type TEXT,
+    begin_position TEXT,
+    end_position TEXT,
+    slice_frame_nr INTEGER,
+    document BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS anx (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    anx BLOB NOT NULL
+)
+'''
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def _time_as_iso(time: Optional[datetime.datetime]) -> Optional[str]:
+    return None if time is None else time.isoformat()
+
+
+class MphIndex:
+    '''
+    This class is responsible for storing main product headers in an SQLite
+    database, so that the headers of products that are input to many tasks,
+    possibly in zip archives, are read from disk only once.
+
+    An entry holds the MPH document, the XML file contents, as written or
+    read. It is parsed as if it was read from the product, so a header from
+    the index equals a header parsed from the product itself. Entries are
+    keyed on the product path. An entry is only valid as long as the
+    modification time and size of the file it was read from (the MPH, or the
+    zip archive) are unchanged.
+
+    The ANX lists of orbit prediction files are stored in the same way,
+    keyed on the path of the file, as arrays of microseconds since 1970.
+
+    The database uses write-ahead logging, so it can be shared by procsim
+    instances running in parallel. Within a process, the index can be used
+    from several threads; access to the database is serialized.
+    '''
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        with self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            if self._db.execute('PRAGMA user_version').fetchone()[0] != _VERSION:
+                for statement in _SCHEMA.split(';'):
+                    self._db.execute(statement)
+                self._db.execute('PRAGMA user_version = {}'.format(_VERSION))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> 'MphIndex':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def lookup(self, product_path: str, stat_path: str) -> Optional[bytes]:
+        '''
+        Return the MPH document of the product, or None if not present or if
+        the file at stat_path changed since it was stored.
+        '''
+        try:
+            stat = os.stat(stat_path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT mtime_ns, size, document FROM mph WHERE path = ?',
+                                   (os.path.abspath(product_path),)).fetchone()
+        if row is None or row[0] != stat.st_mtime_ns or row[1] != stat.st_size:
+            return None
+        return row[2]
+
+    def store(self, product_path: str, stat_path: str, document: bytes, product_type: Optional[str] = None,
+              begin_position: Optional[datetime.datetime] = None, end_position: Optional[datetime.datetime] = None,
+              slice_frame_nr: Optional[int] = None) -> None:
+        '''
+        Store the MPH document of the product. The product type, begin/end
+        position and slice/frame number are stored in separate (queryable)
+        columns.
+        '''
+        stat = os.stat(stat_path)
+        with self._lock, self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.execute('INSERT OR REPLACE INTO mph VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (
+                os.path.abspath(product_path),
+                stat.st_mtime_ns,
+                stat.st_size,
+                product_type,
+                _time_as_iso(begin_position),
+                _time_as_iso(end_position),
+                slice_frame_nr,
+                document))
+
+    def lookup_anx(self, file_name: str) -> Optional[List[datetime.datetime]]:
+        '''
+        Return the ANX list of the orbit prediction file, or None if not
+        present or if the file changed since it was stored.
+        '''
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._db.execute('SELECT mtime_ns, size, anx FROM anx WHERE path = ?',
+                                   (os.path.abspath(file_name),)).fetchone()
+        if row is None or row[0] != stat.st_mtime_ns or row[1] != stat.st_size:
+            return None
+        anx = array.array('q')
+        anx.frombytes(row[2])
+        return [_EPOCH + us * _MICROSECOND for us in anx]
+
+    def store_anx(self, file_name: str, anx_list: List[datetime.datetime]) -> None:
+        '''Store the ANX list of the orbit prediction file.'''
+        stat = os.stat(file_name)
+        anx = array.array('q', [(t - _EPOCH) // _MICROSECOND for t in anx_list])
+        with self._lock, self._db:
+            self._db.execute('BEGIN IMMEDIATE')
+            self._db.execute('INSERT OR REPLACE INTO anx VALUES (?, ?, ?, ?)', (
+                os.path.abspath(file_name),
+                stat.st_mtime_ns,
+                stat.st_size,
+                anx.tobytes()))
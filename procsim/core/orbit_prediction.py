@@ -0,0 +1,76 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+ANX times from orbit prediction files (AUX_ORB, MPL_ORBPRE).
+'''
+import datetime
+import os
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree as et
+
+from procsim.core import timestamps
+from procsim.core.mph_index import MphIndex
+
+# Path of the ANX timestamps, below the root element.
+_UTC_PATH = ('Data_Block', 'List_of_OSVs', 'OSV', 'UTC')
+
+# ANX lists read by this process, keyed on absolute path. Values are the
+# modification time and size of the file, and the sorted ANX list.
+_anx_lists: Dict[str, Tuple[int, int, List[datetime.datetime]]] = {}
+
+
+def iter_anx_times(file_name: str) -> Iterator[datetime.datetime]:
+    '''
+    Yield the UTC times of the orbit state vectors in the file, in file order.
+
+    The file is parsed incrementally. Every OSV is discarded once it is read,
+    so memory use does not depend on the length of the OSV list. Elements are
+    matched in the namespace of the root element, if any.
+    '''
+    tags: List[str] = []
+    elements: List[et.Element] = []
+    utc_path: List[str] = []
+    for event, elem in et.iterparse(file_name, events=('start', 'end')):
+        if event == 'start':
+            if not tags:
+                namespace = elem.tag[:elem.tag.index('}') + 1] if elem.tag[0] == '{' else ''
+                utc_path = [namespace + tag for tag in _UTC_PATH]
+            tags.append(elem.tag)
+            elements.append(elem)
+            continue
+        tags.pop()
+        elements.pop()
+        if len(tags) == 4 and tags[1:] == utc_path[:3] and elem.tag == utc_path[3]:
+            if elem.text is not None:
+                # Trim 'UTC=' off the start of the timestamp.
+                yield timestamps.from_iso(elem.text[4:])
+        elif len(tags) == 3 and tags[1:] == utc_path[:2] and elem.tag == utc_path[2]:
+            # Done with this OSV; remove it from List_of_OSVs.
+            del elements[-1][:]
+
+
+def _stat_key(file_name: str) -> Tuple[str, int, int]:
+    stat = os.stat(file_name)
+    return os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size
+
+
+def read_anx_list(file_name: str, index: Optional[MphIndex] = None) -> List[datetime.datetime]:
+    '''
+    Return the sorted ANX times in an orbit prediction file.
+
+    ANX lists are cached in this process and, if an index is given, in the
+    index, so that the file is parsed once for all generators and tasks that
+    use it. Cached lists are valid as long as the modification time and size
+    of the file are unchanged.
+    '''
+    path, mtime_ns, size = _stat_key(file_name)
+    entry = _anx_lists.get(path)
+    if entry is not None and entry[0] == mtime_ns and entry[1] == size:
+        return list(entry[2])
+    anx_list = index.lookup_anx(file_name) if index is not None else None
+    if anx_list is None:
+        anx_list = sorted(iter_anx_times(file_name))
+        if index is not None:
+            index.store_anx(file_name, anx_list)
+    _anx_lists[path] = (mtime_ns, size, anx_list)
+    return list(anx_list)
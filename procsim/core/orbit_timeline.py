@@ -0,0 +1,154 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+ANX, orbit and slice/frame lookups.
+'''
+import bisect
+import datetime
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+# ANX, orbit index and slice/frame number of a time.
+OrbitPosition = Tuple[datetime.datetime, int, int]
+
+
+class OrbitTimeline:
+    '''
+    This class is responsible for finding the ANX, orbit and slice/frame
+    number of times, given a list of ANX.
+
+    The orbit index is the index of the ANX in the (sorted) list. Before the
+    first and after the last ANX, orbits are extrapolated using the orbital
+    period, as in SliceGrid; orbits before the first ANX have a negative
+    index. Without ANX, times have no orbit.
+
+    Slices and frames are numbered from 1 within an orbit, starting at ANX.
+    The number wraps after the (rounded) number of slices/frames per orbit.
+    '''
+    def __init__(self, anx_list: Iterable[datetime.datetime], orbital_period: datetime.timedelta):
+        self.anx_list: List[datetime.datetime] = sorted(anx_list)
+        self.orbital_period = orbital_period
+
+    def _anx_index(self, t: datetime.datetime, lo: int = 0) -> Tuple[Optional[datetime.datetime], int]:
+        anx_list = self.anx_list
+        if not anx_list:
+            return None, -1
+        if t < anx_list[0]:
+            nr_orbits = -((t - anx_list[0]) // self.orbital_period)
+            return anx_list[0] - nr_orbits * self.orbital_period, -nr_orbits
+        index = bisect.bisect_right(anx_list, t, lo) - 1
+        anx = anx_list[index]
+        if index == len(anx_list) - 1 and t - anx >= self.orbital_period:
+            nr_orbits = (t - anx) // self.orbital_period
+            return anx + nr_orbits * self.orbital_period, index + nr_orbits
+        return anx, index
+
+    def anx(self, t: datetime.datetime) -> Optional[datetime.datetime]:
+        '''Return the last ANX at or before t, or None.'''
+        return self._anx_index(t)[0]
+
+    def anx_orbit(self, t: datetime.datetime) -> Tuple[Optional[datetime.datetime], Optional[int]]:
+        '''Return the last ANX at or before t and its orbit index, or (None, None).'''
+        anx, index = self._anx_index(t)
+        return (anx, index) if anx is not None else (None, None)
+
+    def _slice_frame_nr(self, t: datetime.datetime, anx: datetime.datetime, spacing: datetime.timedelta) -> int:
+        slice_frame_per_orbit = round(self.orbital_period / spacing)
+        return ((t - anx) // spacing % slice_frame_per_orbit) + 1
+
+    def slice_frame_nr(self, t: datetime.datetime, spacing: datetime.timedelta) -> Optional[int]:
+        '''Return the number of the slice/frame containing t, or None.'''
+        anx = self.anx(t)
+        if anx is None:
+            return None
+        return self._slice_frame_nr(t, anx, spacing)
+
+    def slice_frame_interval(self, t: datetime.datetime,
+                             spacing: datetime.timedelta) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+        '''Return the start and end of the slice/frame containing t, or None.'''
+        anx = self.anx(t)
+        if anx is None:
+            return None
+        slice_frame_nr = self._slice_frame_nr(t, anx, spacing)
+        return anx + (slice_frame_nr - 1) * spacing, anx + slice_frame_nr * spacing
+
+    def positions(self, times: Sequence[datetime.datetime],
+                  spacing: datetime.timedelta) -> List[Optional[OrbitPosition]]:
+        '''
+        Return the ANX, orbit index and slice/frame number of each time, or
+        None if there are no ANX. If the times are sorted, the ANX list is
+        searched incrementally.
+        '''
+        positions: List[Optional[OrbitPosition]] = []
+        lo = 0
+        previous = None
+        for t in times:
+            if previous is None or t < previous:
+                lo = 0
+            anx, index = self._anx_index(t, lo)
+            previous = t
+            if anx is None:
+                positions.append(None)
+                continue
+            lo = max(min(index, len(self.anx_list) - 1), 0)
+            positions.append((anx, index, self._slice_frame_nr(t, anx, spacing)))
+        return positions
+
+
+class OrbitTimelineMixin:
+    '''
+    ANX list, orbital period and slice/frame lookups of a product generator.
+
+    The generator sets _anx_list and _orbital_period; both can be replaced,
+    e.g. by scenario parameters or by the ANX of an orbit prediction file.
+    Lookups that find no ANX are logged as a warning.
+    '''
+    _logger: Any
+    _orbit_timeline: OrbitTimeline
+
+    @property
+    def _anx_list(self) -> List[datetime.datetime]:
+        return self._orbit_timeline.anx_list
+
+    @_anx_list.setter
+    def _anx_list(self, anx_list: List[datetime.datetime]) -> None:
+        self._orbit_timeline = OrbitTimeline(anx_list, self._orbit_timeline.orbital_period)
+
+    @property
+    def _orbital_period(self) -> datetime.timedelta:
+        return self._orbit_timeline.orbital_period
+
+    @_orbital_period.setter
+    def _orbital_period(self, orbital_period: datetime.timedelta) -> None:
+        self._orbit_timeline = OrbitTimeline(self._anx_list, orbital_period)
+
+    def _get_slice_frame_nr(self, start: datetime.datetime, spacing: datetime.timedelta) -> Optional[int]:
+        slice_frame_nr = self._orbit_timeline.slice_frame_nr(start, spacing)
+        if slice_frame_nr is None:
+            self._logger.warning(f'No previous ANX found for {start} in ANX list {self._anx_list}.')
+        return slice_frame_nr
+
+    def _get_slice_frame_interval(self,
+                                  start: datetime.datetime,
+                                  spacing: datetime.timedelta) -> Optional[Tuple[datetime.datetime, datetime.datetime]]:
+        slice_frame_interval = self._orbit_timeline.slice_frame_interval(start, spacing)
+        if slice_frame_interval is None:
+            self._logger.warning(f'No previous ANX found for {start} in ANX list {self._anx_list}.')
+        return slice_frame_interval
+
+    def _get_slice_positions(self, slice_edges: List[Tuple[datetime.datetime, datetime.datetime]],
+                             spacing: datetime.timedelta) -> List[Tuple[datetime.datetime, datetime.datetime, datetime.datetime, int]]:
+        '''
+        Return start, end, ANX and slice number of the slices. ANX and slice
+        number are taken from the middle of the slice, to treat merged slices
+        accurately. Without ANX, the slices are skipped.
+        '''
+        slice_middles = [slice_start + (slice_end - slice_start) / 2 for slice_start, slice_end in slice_edges]
+        slice_positions = []
+        for (slice_start, slice_end), slice_middle, position in zip(
+                slice_edges, slice_middles, self._orbit_timeline.positions(slice_middles, spacing)):
+            if position is None:
+                self._logger.warning(f'No previous ANX found for {slice_middle} in ANX list {self._anx_list}.')
+                continue
+            anx, _, slice_nr = position
+            slice_positions.append((slice_start, slice_end, anx, slice_nr))
+        return slice_positions
@@ -0,0 +1,67 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Read files from zipped products, without extracting the archive.
+'''
+import os
+import zipfile
+from typing import Optional
+
+
+def is_archive(path: str, extension: str = '.zip') -> bool:
+    '''Return True if path is an existing (zip) archive.'''
+    return os.path.isfile(path) and os.path.splitext(path)[1].lower() == extension.lower()
+
+
+class ProductArchive:
+    '''
+    This class is responsible for reading the files of a zipped product
+    directory. Only the members that are opened are read (and decompressed),
+    so reading the MPH of a large product is cheap. The payload is only
+    extracted on request.
+    '''
+    def __init__(self, archive_path: str):
+        self.archive_path = archive_path
+        self._zip = zipfile.ZipFile(archive_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def find(self, file_name: str) -> Optional[str]:
+        '''
+        Return the member name of file_name. This is normally located in the
+        product directory (named after the archive), but any member with the
+        same base name is accepted.
+        '''
+        product_dir = os.path.splitext(os.path.basename(self.archive_path))[0]
+        expected = product_dir + '/' + file_name
+        names = self._zip.namelist()
+        if expected in names:
+            return expected
+        for name in names:
+            if name.rsplit('/', 1)[-1] == file_name:
+                return name
+        return None
+
+    def open(self, file_name: str):
+        '''Return a readable binary stream for file_name in the archive.'''
+        member = self.find(file_name)
+        if member is None:
+            raise FileNotFoundError('{} not found in {}'.format(file_name, self.archive_path))
+        return self._zip.open(member)
+
+    def extract(self, keep_zip: bool = True) -> None:
+        '''
+        Extract the complete archive next to it. The archive is closed and,
+        unless keep_zip is set, removed.
+        '''
+        self._zip.extractall(os.path.dirname(self.archive_path))
+        self.close()
+        if not keep_zip:
+            os.remove(self.archive_path)
+
+    def close(self) -> None:
+        self._zip.close()
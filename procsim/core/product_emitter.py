@@ -0,0 +1,225 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Creation of products by a bounded pool of worker threads, completed in the
+order in which the products were emitted.
+'''
+import collections
+import concurrent.futures
+import contextlib
+import copy
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple
+
+
+class BufferedLogger:
+    '''
+    This class is responsible for recording log messages, to pass them on to
+    another logger later. A product created in a worker thread logs to a
+    buffered logger, so that the messages of concurrent products are not
+    interleaved.
+    '''
+    def __init__(self, logger):
+        self._logger = logger
+        self._messages: List[Tuple[str, tuple, dict]] = []
+
+    @property
+    def logger(self):
+        # The logger to which the messages are passed on.
+        return self._logger
+
+    def debug(self, *args, **kwargs):
+        self._messages.append(('debug', args, kwargs))
+
+    def info(self, *args, **kwargs):
+        self._messages.append(('info', args, kwargs))
+
+    def progress(self, *args, **kwargs):
+        self._messages.append(('progress', args, kwargs))
+
+    def warning(self, *args, **kwargs):
+        self._messages.append(('warning', args, kwargs))
+
+    def error(self, *args, **kwargs):
+        self._messages.append(('error', args, kwargs))
+
+    def log(self, level: str, *args, **kwargs):
+        self._messages.append(('log', (level,) + args, kwargs))
+
+    def split(self) -> 'BufferedLogger':
+        '''
+        Return a buffered logger with the messages recorded so far. This
+        logger continues without them.
+        '''
+        other = BufferedLogger(self._logger)
+        other._messages, self._messages = self._messages, []
+        return other
+
+    def flush(self) -> None:
+        '''Pass the recorded messages on, and forget them.'''
+        for method, args, kwargs in self._messages:
+            getattr(self._logger, method)(*args, **kwargs)
+        self._messages.clear()
+
+
+class ProductEmitter:
+    '''
+    This class is responsible for running product creation jobs in a bounded
+    pool of worker threads.
+
+    Every job may come with a completion function, which is called in the
+    emitting thread, in the order in which the jobs were submitted. This is
+    where log messages are passed on and products are registered, so that
+    both happen in the same order as with sequential creation. To bound
+    memory use, at most two jobs per worker are in flight; submit waits for
+    the oldest job otherwise.
+
+    With one worker, jobs and completion functions run immediately, in the
+    emitting thread.
+    '''
+    def __init__(self, workers: int = 1):
+        self._workers = max(1, workers)
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._pending: Deque[Tuple[concurrent.futures.Future, Optional[Callable[[], Any]]]] = collections.deque()
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    def submit(self, job: Callable[[], Any], done: Optional[Callable[[], Any]] = None) -> None:
+        if self._workers == 1:
+            try:
+                job()
+            finally:
+                if done is not None:
+                    done()
+            return
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self._workers, thread_name_prefix='procsim-output')
+        self._pending.append((self._executor.submit(job), done))
+        while len(self._pending) > 2 * self._workers:
+            self._complete_oldest()
+
+    def _complete_oldest(self) -> None:
+        future, done = self._pending.popleft()
+        try:
+            future.result()
+        finally:
+            if done is not None:
+                done()
+
+    def join(self) -> None:
+        '''
+        Wait for all jobs and complete them. The exception of the first job
+        that failed, if any, is raised; jobs that did not start yet are then
+        cancelled, and the others are completed first.
+        '''
+        try:
+            while self._pending:
+                self._complete_oldest()
+        finally:
+            self._shutdown()
+
+    def _shutdown(self) -> None:
+        # Cancel the jobs that did not start yet, wait for the others, and
+        # complete these in order, so that their log messages and products
+        # are not lost. Their exceptions are not raised; the one that caused
+        # the shutdown is.
+        pending, self._pending = self._pending, collections.deque()
+        for future, _ in pending:
+            future.cancel()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for future, done in pending:
+            if not future.cancelled() and done is not None:
+                done()
+
+    def __enter__(self) -> 'ProductEmitter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.join()
+        else:
+            self._shutdown()
+
+
+class ProductEmissionMixin:
+    '''
+    Concurrent creation of the products of a product generator.
+
+    The generator sets _output_workers, initializes _emitter and
+    _registrations to None, and provides _get_content_generator,
+    _get_mph_index, _get_inventory and _register_output (see
+    ProductIOMixin). A product created in a worker thread is created by a
+    snapshot of the generator, which collects its registrations in
+    _registrations. These are passed on to the generator when the product is
+    completed.
+    '''
+    _logger: Any
+    _hdr: Any
+    _output_workers: int
+    _emitter: Optional[ProductEmitter]
+    _registrations: Optional[List[tuple]]
+
+    @contextlib.contextmanager
+    def _product_emission(self) -> Iterator[None]:
+        '''
+        Context in which _emit_product creates products concurrently, using
+        the configured number of output workers. All products are complete at
+        the end of the context.
+        '''
+        logger = self._logger
+        self._emitter = ProductEmitter(self._output_workers)
+        if self._emitter.workers > 1:
+            # Messages of this thread are passed on in order with those of
+            # the products.
+            self._logger = BufferedLogger(logger)
+        try:
+            with self._emitter:
+                yield
+        finally:
+            if self._logger is not logger:
+                self._logger.flush()
+                self._logger = logger
+            self._emitter = None
+
+    def _emit_product(self, create: Callable[..., None], *args, **kwargs) -> None:
+        '''
+        Create product(s) by calling create, a method of this generator, with
+        the given arguments. With more than one output worker, the method is
+        called on a snapshot of this generator and its header, in a worker
+        thread. Log messages and registrations of the product(s) are passed on
+        in the order in which the products were emitted. Changes that create
+        makes to the header are not seen by the products emitted after it, so
+        header fields that carry over between products must be set before
+        calling this method.
+        '''
+        if self._emitter is None or self._emitter.workers == 1:
+            create(*args, **kwargs)
+            return
+        preceding = self._logger.split()
+        snapshot = self._snapshot()
+        self._emitter.submit(lambda: create.__func__(snapshot, *args, **kwargs),
+                             lambda: self._complete_snapshot(preceding, snapshot))
+
+    def _snapshot(self):
+        # Shallow copy of this generator, with a header of its own. The
+        # databases are opened by, and only used in, the emitting thread.
+        self._get_mph_index()
+        self._get_inventory()
+        snapshot = copy.copy(self)
+        snapshot._hdr = copy.deepcopy(self._hdr)
+        snapshot._logger = BufferedLogger(self._logger.logger)
+        snapshot._content_generator = self._get_content_generator().fork()
+        snapshot._archive = None
+        snapshot._emitter = None
+        snapshot._registrations = []
+        return snapshot
+
+    def _complete_snapshot(self, preceding: BufferedLogger, snapshot) -> None:
+        preceding.flush()
+        snapshot._logger.flush()
+        registrations, snapshot._registrations = snapshot._registrations, []
+        for product_path, stat_path, document, hdr in registrations:
+            self._register_output(product_path, stat_path, document, hdr)
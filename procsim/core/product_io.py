@@ -0,0 +1,295 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Reading and writing of the products of a product generator: main product
+headers, zip archives, the MPH index and the inventory.
+'''
+import concurrent.futures
+import copy
+import io
+import os
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from .file_content import ContentGenerator
+from .input_catalogue import InputCatalogue, InputProduct
+from .inventory import ProductInventory
+from .mph_index import MphIndex
+from .product_archive import ProductArchive, is_archive
+from .zip_writer import ZipArchiveWriter
+
+
+class ProductIOMixin:
+    '''
+    Product input and output of a product generator, shared by the missions.
+
+    The generator initializes the attributes below, and implements the
+    mission specific hooks: the main product header class, the file name of
+    the MPH in a product, and the slice/frame number and data take ID of a
+    header.
+    '''
+    _logger: Any
+    _hdr: Any
+    _output_config: dict
+    _scenario_config: dict
+    _zip_extension: str
+    _zip_compression: str
+    _content: str
+    _content_seed: Optional[int]
+    _content_generator: Optional[ContentGenerator]
+    _checksums: List[str]
+    _checksum_manifest: bool
+    _checksums_in_mph: bool
+    _input_workers: int
+    _registrations: Optional[List[tuple]]
+    _archive: Optional[ZipArchiveWriter]
+    _input_catalogue: Optional[InputCatalogue]
+    _output_listener: Optional[Callable[[str, str, Optional[bytes]], None]]
+    _mph_index: Optional[MphIndex]
+    _inventory: Optional[ProductInventory]
+
+    def _create_header(self) -> Any:
+        '''Return an empty main product header of the mission.'''
+        raise NotImplementedError
+
+    def _mph_file_name(self, product_path: str) -> str:
+        '''Return the file name of the MPH in the product at product_path.'''
+        raise NotImplementedError
+
+    def _header_slice_frame_nr(self, hdr: Any) -> Optional[int]:
+        raise NotImplementedError
+
+    def _header_data_take_id(self, hdr: Any) -> Optional[int]:
+        raise NotImplementedError
+
+    def _write_mph(self, file_path: str) -> None:
+        '''
+        Write the MPH of the product, and the checksum manifest(s), if enabled.
+        If the product is written to a zip archive, the archive is closed.
+        The manifests are placed next to the product directory, one per
+        algorithm, in the format used by md5sum/sha256sum.
+        '''
+        document = self._hdr.render(self._checksums_in_mph)
+        if self._archive is not None and self._archive.contains(file_path):
+            # The MPH is the last member, it completes the archive.
+            with self._archive.open(file_path) as file:
+                file.write(document)
+            archive_path = self._archive.archive_path
+            self._close_zip_archive()
+            self._register_output(archive_path, archive_path, document)
+        else:
+            with open(file_path, 'wb') as file:
+                file.write(document)
+            self._register_output(os.path.dirname(file_path), file_path, document)
+        if not self._checksum_manifest:
+            return
+        product_dir = os.path.dirname(os.path.abspath(file_path))
+        for algorithm in self._checksums:
+            with open(product_dir + '.' + algorithm, 'w') as manifest:
+                for product in self._hdr.products:
+                    checksum = product.get('checksums', {}).get(algorithm)
+                    if checksum is not None:
+                        path = os.path.normpath(os.path.join(os.path.basename(product_dir), product['file_name']))
+                        manifest.write('{}  {}\n'.format(checksum, path))
+
+    def _start_zip_archive(self, full_dir_name: str) -> None:
+        '''
+        Write the files of the product in directory full_dir_name directly into
+        a zip archive, instead of creating the directory.
+        The archive is completed by _write_mph.
+        '''
+        archive_path = os.path.normpath(full_dir_name) + self._zip_extension
+        self._archive = ZipArchiveWriter(archive_path, full_dir_name, self._zip_compression)
+
+    def _close_zip_archive(self) -> None:
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+    def _open_output_file(self, file_path: str, size: int):
+        # Return binary stream to write a product file to, either in the zip
+        # archive or on disk.
+        if self._archive is not None and self._archive.contains(file_path):
+            return self._archive.open(file_path, size)
+        # Make sure encompassing folder exists.
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        return open(file_path, 'wb')
+
+    def _get_content_generator(self) -> ContentGenerator:
+        # Created on first use, after the scenario parameters have been read.
+        if self._content_generator is None:
+            self._content_generator = ContentGenerator(self._content, self._content_seed)
+        return self._content_generator
+
+    def set_input_catalogue(self, catalogue: InputCatalogue) -> None:
+        '''
+        Use the inputs as prepared by the catalogue, which is shared by all
+        generators of the task. Headers are read only once.
+        '''
+        self._input_catalogue = catalogue
+        catalogue.set_header_reader(self._read_input_header)
+
+    def set_output_listener(self, listener: Callable[[str, str, Optional[bytes]], None]) -> None:
+        '''
+        Call listener with the product type, path and MPH document (the file
+        contents) of every generated product. The document is None for
+        products without main product header.
+        '''
+        self._output_listener = listener
+
+    def close(self) -> None:
+        '''Close the MPH index and inventory, if opened.'''
+        if self._mph_index is not None:
+            self._mph_index.close()
+            self._mph_index = None
+        if self._inventory is not None:
+            self._inventory.close()
+            self._inventory = None
+
+    def _input_product(self, path: str) -> Optional[InputProduct]:
+        return None if self._input_catalogue is None else self._input_catalogue.product(path, self._zip_extension)
+
+    def _is_input_product(self, path: str) -> bool:
+        '''Return True if path is a product directory or a zipped product directory.'''
+        product = self._input_product(path)
+        if product is not None:
+            return product.is_product
+        return os.path.isdir(path) or is_archive(path, self._zip_extension)
+
+    def _get_mph_index(self) -> Optional[MphIndex]:
+        # The index is optional, enabled by setting its database path.
+        if self._mph_index is None:
+            db_path = self._output_config.get('mph_index') or self._scenario_config.get('mph_index')
+            if db_path:
+                self._mph_index = MphIndex(db_path)
+        return self._mph_index
+
+    def _get_inventory(self) -> Optional[ProductInventory]:
+        # The inventory is optional, enabled by setting its database path.
+        if self._inventory is None:
+            db_path = self._output_config.get('inventory') or self._scenario_config.get('inventory')
+            if db_path:
+                self._inventory = ProductInventory(db_path)
+        return self._inventory
+
+    def _register_output(self, product_path: str, stat_path: str, document: bytes,
+                         hdr: Optional[Any] = None) -> None:
+        # Add a generated product, with its MPH document as written, to the
+        # MPH index and inventory, if enabled, and pass it on to the output
+        # listener, if set.
+        if hdr is None:
+            hdr = self._hdr
+        if self._registrations is not None:
+            # Created in a worker thread, registered by the emitting generator.
+            if self._get_mph_index() is not None or self._get_inventory() is not None or \
+                    self._output_listener is not None:
+                self._registrations.append((product_path, stat_path, document, copy.deepcopy(hdr)))
+            return
+        self._index_mph(product_path, stat_path, document, hdr)
+        inventory = self._get_inventory()
+        if inventory is not None:
+            inventory.add(product_path, hdr.product_type, hdr.begin_position, hdr.end_position,
+                          hdr.validity_start, hdr.validity_stop, self._header_slice_frame_nr(hdr),
+                          self._header_data_take_id(hdr), hdr.product_baseline)
+        if self._output_listener is not None:
+            self._output_listener(hdr.product_type, product_path, document)
+
+    def _index_mph(self, product_path: str, stat_path: str, document: bytes,
+                   hdr: Any) -> None:
+        index = self._get_mph_index()
+        if index is not None:
+            index.store(product_path, stat_path, document, hdr.product_type, hdr.begin_position, hdr.end_position,
+                        self._header_slice_frame_nr(hdr))
+
+    def _locate_mph(self, path: str) -> Tuple[bool, str, str, str]:
+        # Return whether a product is zipped, and the file name, (virtual) path
+        # and stat path (the MPH, or the zip archive) of its MPH.
+        zipped = is_archive(path, self._zip_extension)
+        mph_file_name = self._mph_file_name(os.path.splitext(path)[0] if zipped else path)
+        mph_path = os.path.join(path, mph_file_name)
+        return zipped, mph_file_name, mph_path, path if zipped else mph_path
+
+    def _read_mph(self, path: str, hdr: Any,
+                  fields: Optional[Iterable[str]] = None) -> str:
+        # Parse MPH of a product directory or zip archive, return its (virtual)
+        # path. Use the MPH index, if enabled. Only complete reads are indexed.
+        if fields is None:
+            return self._read_mph_document(path, hdr)[0]
+        zipped, mph_file_name, mph_path, stat_path = self._locate_mph(path)
+        index = self._get_mph_index()
+        document = None if index is None else index.lookup(path, stat_path)
+        if document is not None:
+            hdr.parse(io.BytesIO(document), fields)
+        elif zipped:
+            with ProductArchive(path) as archive, archive.open(mph_file_name) as file:
+                hdr.parse(file, fields)
+        else:
+            hdr.parse(mph_path, fields)
+        return mph_path
+
+    def _read_mph_document(self, path: str, hdr: Any) -> Tuple[str, bytes]:
+        # Read and parse the MPH of a product directory or zip archive, return
+        # its (virtual) path and the document. Use the MPH index, if enabled.
+        # The index holds the documents, which are parsed as the file itself.
+        zipped, mph_file_name, mph_path, stat_path = self._locate_mph(path)
+        index = self._get_mph_index()
+        document = None if index is None else index.lookup(path, stat_path)
+        if document is not None:
+            hdr.parse(io.BytesIO(document))
+            return mph_path, document
+        if zipped:
+            with ProductArchive(path) as archive, archive.open(mph_file_name) as file:
+                document = file.read()
+        else:
+            with open(mph_path, 'rb') as file:
+                document = file.read()
+        hdr.parse(io.BytesIO(document))
+        self._index_mph(path, stat_path, document, hdr)
+        return mph_path, document
+
+    def _read_input_header(self, product: InputProduct) -> None:
+        # Header reader for the input catalogue. The MPH document may be known
+        # already, if the product was generated in the same process.
+        hdr = self._create_header()
+        if product.document is None:
+            product.document = self._read_mph_document(product.path, hdr)[1]
+        else:
+            hdr.parse(io.BytesIO(product.document))
+        product.header = hdr
+
+    def _parse_input_mph(self, path: str, hdr: Any,
+                         fields: Optional[Iterable[str]] = None) -> str:
+        '''
+        Parse the MPH of the input product at path into hdr. The product can be
+        a directory or a zip archive. Archives are not extracted, the MPH is
+        read from the archive member. Return the (virtual) path of the MPH.
+        If fields is set and the header is not read yet, only these fields
+        are parsed (see MainProductHeader.parse).
+        '''
+        product = self._input_product(path)
+        if self._input_catalogue is None or product is None or not product.is_product or \
+                (fields is not None and product.document is None):
+            return self._read_mph(path, hdr, fields)
+        # Parse the document read by the catalogue, as the file itself: fields
+        # that are not in the MPH are left as they are.
+        self._input_catalogue.read_header(product)
+        hdr.parse(io.BytesIO(product.document), fields)
+        return os.path.join(product.path, self._mph_file_name(product.root))
+
+    def _parse_input_mphs(self, paths: List[str], fields: Optional[Iterable[str]] = None
+                          ) -> List[Tuple[str, Any]]:
+        '''
+        Parse the MPHs of the input products at paths, as _parse_input_mph.
+        Return the (virtual) path of the MPH and the header of every product,
+        in the order of paths. With more than one input worker, the MPHs are
+        fetched and parsed by that many threads.
+        '''
+        def parse(path):
+            hdr = self._create_header()
+            return self._parse_input_mph(path, hdr, fields), hdr
+
+        workers = min(self._input_workers, len(paths))
+        if workers <= 1:
+            return [parse(path) for path in paths]
+        self._get_mph_index()    # Open the index once, it is shared by the threads
+        with concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix='procsim-input') as executor:
+            return list(executor.map(parse, paths))
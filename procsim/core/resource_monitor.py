@@ -0,0 +1,123 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Measure the resources actually used by procsim (and its worker processes).
+'''
+import glob
+import os
+import resource
+import threading
+import time
+from typing import Dict, List, Optional
+
+_MB = 2**20
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _child_pids() -> List[int]:
+    # Direct children of all threads of this process.
+    pids = []
+    for path in glob.glob('/proc/self/task/*/children'):
+        try:
+            with open(path) as f:
+                pids.extend(int(pid) for pid in f.read().split())
+        except (OSError, ValueError):
+            pass
+    return pids
+
+
+def _rss_bytes(pid='self') -> int:
+    try:
+        with open('/proc/{}/statm'.format(pid)) as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _io_counters() -> Dict[str, int]:
+    # Bytes passed to read/write system calls (rchar/wchar), so including I/O
+    # that is satisfied from, or not yet flushed from, the page cache.
+    counters = {}
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                counters[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return counters
+
+
+def _cpu_time() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class ResourceMonitor:
+    '''
+    This class is responsible for measuring CPU time (including terminated
+    worker processes), peak and average RSS (including running workers), bytes
+    read/written and wall time between start() and stop().
+
+    RSS is sampled from /proc in a background thread.
+    '''
+    def __init__(self, interval: float = 0.1):
+        self._interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._start_time = 0.0
+        self._wall_time = 0.0
+        self._start_cpu = 0.0
+        self._cpu_time = 0.0
+        self._start_io: Dict[str, int] = {}
+        self._io: Dict[str, int] = {}
+        self._rss_samples: List[int] = []
+
+    def _sample(self):
+        rss = _rss_bytes()
+        for pid in _child_pids():
+            rss += _rss_bytes(pid)
+        self._rss_samples.append(rss)
+
+    def _run(self):
+        while not self._stop_event.wait(self._interval):
+            self._sample()
+
+    def start(self):
+        self._start_time = time.monotonic()
+        self._start_cpu = _cpu_time()
+        self._start_io = _io_counters()
+        self._rss_samples = []
+        self._sample()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._sample()
+        self._wall_time = time.monotonic() - self._start_time
+        self._cpu_time = _cpu_time() - self._start_cpu
+        io = _io_counters()
+        self._io = {key: value - self._start_io.get(key, 0) for key, value in io.items()}
+
+    def report(self) -> dict:
+        '''
+        Return measured usage. Sizes are in MB, times in seconds.
+        '''
+        # ru_maxrss is in kB on Linux. It also catches peaks between samples,
+        # but only for a single process.
+        peak = max(self._rss_samples + [resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024])
+        average = sum(self._rss_samples) / len(self._rss_samples) if self._rss_samples else 0
+        return {
+            'wall_time': round(self._wall_time, 3),
+            'cpu_time': round(self._cpu_time, 3),
+            'peak_rss_mb': round(peak / _MB, 1),
+            'average_rss_mb': round(average / _MB, 1),
+            'read_mb': round(self._io.get('rchar', 0) / _MB, 1),
+            'written_mb': round(self._io.get('wchar', 0) / _MB, 1),
+        }
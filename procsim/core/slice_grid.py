@@ -0,0 +1,95 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Slice grid, aligned to ANX.
+'''
+import bisect
+import datetime
+from typing import List, Sequence, Tuple
+
+Interval = Tuple[datetime.datetime, datetime.datetime]
+
+
+def _ceil_div(a: datetime.timedelta, b: datetime.timedelta) -> int:
+    return -(-a // b)
+
+
+class SliceGrid:
+    '''
+    This class is responsible for finding the slices that overlap a segment.
+
+    Every orbit starts at an ANX and holds a fixed number of slices, the
+    orbital period divided by the slice spacing. Before the first and after
+    the last known ANX, ANX are extrapolated using the orbital period.
+
+    The slice indices that overlap a segment are computed directly, so the
+    cost depends on the number of slices returned only, not on the number of
+    orbits in the ANX list or on the number of slices per orbit. Timedelta
+    arithmetic is exact (integer microseconds), so the slice bounds are the
+    same as those obtained by stepping through the grid.
+    '''
+    def __init__(self, anx_list: Sequence[datetime.datetime],
+                 orbital_period: datetime.timedelta, spacing: datetime.timedelta):
+        if not anx_list:
+            raise ValueError('Slice grid needs at least one ANX')
+        self._anx_list = list(anx_list)
+        self._orbital_period = orbital_period
+        self._spacing = spacing
+        self._slices_per_orbit = int(round(orbital_period / spacing))
+
+    def _anx(self, index: int) -> datetime.datetime:
+        # Index in the ANX list, extended with extrapolated ANX on both sides.
+        if index < 0:
+            return self._anx_list[0] - (-index) * self._orbital_period
+        last = len(self._anx_list) - 1
+        if index > last:
+            return self._anx_list[last] + (index - last) * self._orbital_period
+        return self._anx_list[index]
+
+    def _last_anx_index_before(self, t: datetime.datetime) -> int:
+        # Index of the last ANX at or before t.
+        first, last = self._anx_list[0], self._anx_list[-1]
+        if t < first:
+            return -_ceil_div(first - t, self._orbital_period)
+        if t >= last + self._orbital_period:
+            return len(self._anx_list) - 1 + (t - last) // self._orbital_period
+        return bisect.bisect_right(self._anx_list, t) - 1
+
+    def _first_anx_index_from(self, t: datetime.datetime) -> int:
+        # Index of the first ANX at or after t.
+        first, last = self._anx_list[0], self._anx_list[-1]
+        if t <= first:
+            return -((first - t) // self._orbital_period)
+        if t > last:
+            return len(self._anx_list) - 1 + _ceil_div(t - last, self._orbital_period)
+        return bisect.bisect_left(self._anx_list, t)
+
+    def overlapping_slices(self, start: datetime.datetime, end: datetime.datetime) -> List[Interval]:
+        '''
+        Return the slices that overlap [start, end], bounds included, ordered
+        by ANX and by slice number.
+        '''
+        slices = []
+        spacing = self._spacing
+        for index in range(self._last_anx_index_before(start), self._first_anx_index_from(end)):
+            anx = self._anx(index)
+            first = max(_ceil_div(start - anx, spacing) - 1, 0)
+            last = min((end - anx) // spacing, self._slices_per_orbit - 1)
+            slices.extend([(anx + i * spacing, anx + (i + 1) * spacing) for i in range(first, last + 1)])
+        return slices
+
+    def slice_edges(self, start: datetime.datetime, end: datetime.datetime,
+                    minimum_duration: datetime.timedelta) -> List[Interval]:
+        '''
+        Return the slices that overlap [start, end]. If the part of the first
+        or last slice inside the segment is shorter than minimum_duration, the
+        slice is merged with its neighbour.
+        '''
+        slice_edges = self.overlapping_slices(start, end)
+        if len(slice_edges) > 1 and slice_edges[0][1] - start < minimum_duration:
+            slice_edges[1] = (slice_edges[0][0], slice_edges[1][1])
+            del slice_edges[0]
+        if len(slice_edges) > 1 and end - slice_edges[-1][0] < minimum_duration:
+            slice_edges[-2] = (slice_edges[-2][0], slice_edges[-1][1])
+            del slice_edges[-1]
+        return slice_edges
@@ -0,0 +1,128 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from procsim.core import campaign
+from procsim.core.campaign import Campaign
+from procsim.core.exceptions import ScenarioError
+from procsim.core.job_order import JobOrderTask
+from procsim.core.logger import Logger
+
+
+def _config(output_path):
+    raw = {
+        'name': 'Raw', 'processor_name': 'rawgenerator', 'processor_version': '01.00', 'task_name': 'generate',
+        'output_path': output_path, 'baseline': 1, 'zip_output': False,
+        'begin_position': '2021-02-01T00:00:00.000Z', 'end_position': '2021-02-01T01:38:10.000Z',
+        'acquisition_date': '2021-02-01T01:38:10.000Z', 'acquisition_station': 'SP',
+        'creation_date': '2021-02-01T05:00:00.000Z',
+        'outputs': [{'type': 'RAW_022_10', 'size': 0}, {'type': 'RAW_023_10', 'size': 0}]
+    }
+    slices = []
+    for type in ('022', '023'):
+        slices.append({
+            'name': 'Slices ' + type, 'processor_name': 'l0preproc_sm', 'processor_version': '01.01',
+            'task_name': 'Step1', 'output_path': output_path, 'baseline': 0, 'zip_output': False, 'data_take_id': 1,
+            'creation_date': '2021-02-01T06:00:00.000Z',
+            'anx': ['2021-01-31T22:47:21.765Z', '2021-02-01T00:25:33.745Z'],
+            'outputs': [
+                {'type': 'RAWS{}_10'.format(type), 'metadata_source': '.*RAW_{}_10.*'.format(type),
+                 'enable_slicing': False, 'size': 0}
+            ]
+        })
+    return {'mission': 'biomass', 'scenarios': [raw] + slices}
+
+
+def _campaign(output_path, steps, workers=1):
+    logger = Logger('', '', '', [], [])
+    return Campaign(logger, _config(output_path), {'config': '', 'log_level': 'error', 'steps': steps}).run(workers)
+
+
+STEPS = [
+    {'name': 'raw', 'scenario': 'Raw'},
+    # Independent branches, each with one of the raw products as input.
+    {'name': 'slice_22', 'scenario': 'Slices 022', 'inputs': ['RAW_022_10']},
+    {'name': 'slice_23', 'scenario': 'Slices 023', 'after': ['raw'], 'inputs': [{'type': 'RAW_02[3-9]_10'}]}
+]
+
+
+class CampaignTest(unittest.TestCase):
+
+    def testRun(self):
+        with tempfile.TemporaryDirectory() as output_path:
+            self.assertEqual(_campaign(output_path, STEPS), 0)
+            names = sorted(name[:14] for name in os.listdir(output_path))
+            self.assertEqual(names, ['BIO_RAWS022_10', 'BIO_RAWS023_10', 'BIO_RAW_022_10', 'BIO_RAW_023_10'])
+
+    def testWorkers(self):
+        listings = []
+        for workers in (1, 2):
+            with tempfile.TemporaryDirectory() as output_path:
+                self.assertEqual(_campaign(output_path, STEPS, workers), 0)
+                listings.append(sorted(os.listdir(output_path)))
+        self.assertEqual(listings[0], listings[1])
+
+    def testFailedStep(self):
+        # Steps that depend on a failed step, also indirectly, are skipped.
+        steps = [
+            {'name': 'raw', 'scenario': 'Raw', 'parameters': {'exit_code': 3}},
+            {'name': 'slices', 'scenario': 'Slices 022', 'inputs': ['RAW_022_10']},
+            {'name': 'slices_again', 'scenario': 'Slices 023', 'inputs': ['RAW_023_10']}
+        ]
+        for workers in (1, 2):
+            with tempfile.TemporaryDirectory() as output_path:
+                with mock.patch.object(Logger, 'warning') as warning:
+                    self.assertEqual(_campaign(output_path, steps, workers), 3)
+                self.assertEqual([call.args[0] for call in warning.call_args_list],
+                                 ['Skip step slices, step raw did not succeed',
+                                  'Skip step slices_again, step slices did not succeed'])
+                self.assertFalse(any(name.startswith('BIO_RAWS') for name in os.listdir(output_path)))
+
+    def testLogLevel(self):
+        # As in procsim, the log level of a scenario takes precedence over that of the configuration file.
+        levels = []
+        create_logger = campaign.procsim_main._create_logger
+
+        def _create_logger(*args):
+            levels.append(args[-1])
+            return create_logger(*args)
+
+        with tempfile.TemporaryDirectory() as output_path:
+            config = _config(output_path)
+            config['log_level'] = 'error'
+            config['scenarios'][0]['log_level'] = 'warning'
+            with mock.patch.object(campaign.procsim_main, '_create_logger', _create_logger):
+                Campaign(Logger('', '', '', [], []), config, {'steps': STEPS[:2]}).run()
+        self.assertEqual(levels, ['warning', 'error'])
+
+    def testProductsWithoutMph(self):
+        # Products are passed on with their MPH, if any.
+        with tempfile.TemporaryDirectory() as output_path:
+            scenario = {
+                'name': 'Aux', 'processor_name': 'aux', 'processor_version': '01.00', 'task_name': 'generate',
+                'output_path': output_path, 'baseline': 1, 'creation_date': '2021-02-01T05:00:00.000Z',
+                'begin_position': '2021-02-01T00:00:00.000Z', 'end_position': '2021-02-01T01:38:10.000Z',
+                'outputs': [{'type': 'MPL_ORBPRE', 'size': 0}, {'type': 'AUX_INS___', 'size': 0}]
+            }
+            job_task = JobOrderTask()
+            job_task.name = 'generate'
+            exit_code, products = campaign._run_step('biomass', scenario, 'error', job_task, {})
+        self.assertEqual(exit_code, 0)
+        self.assertEqual([(file_type, document is None) for file_type, _, document in products],
+                         [('MPL_ORBPRE', True), ('AUX_INS___', False)])
+
+    def testInvalid(self):
+        with self.assertRaises(ScenarioError):
+            _campaign('.', [{'name': 'slices', 'scenario': 'Slices 022', 'after': ['raw']}, {'name': 'raw', 'scenario': 'Raw'}])
+        with self.assertRaises(ScenarioError):
+            _campaign('.', [{'name': 'raw', 'scenario': 'Raw'}, {'name': 'raw', 'scenario': 'Raw'}])
+        with self.assertRaises(ScenarioError):
+            _campaign('.', [{'name': 'raw', 'scenario': 'Unknown'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
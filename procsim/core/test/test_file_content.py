@@ -0,0 +1,95 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import hashlib
+import io
+import os
+import random
+import tempfile
+import unittest
+import zlib
+
+from procsim.core.exceptions import ScenarioError
+from procsim.core.file_content import CONTENT_TYPES, Checksum, ContentGenerator, preallocate
+
+_MB = 2**20
+
+
+class ContentGeneratorTest(unittest.TestCase):
+
+    def testSize(self):
+        for content in CONTENT_TYPES:
+            with tempfile.TemporaryFile() as f:
+                f.write(b'header')
+                ContentGenerator(content, seed=0).write(f, 2 * _MB + 10)
+                f.flush()
+                self.assertEqual(os.fstat(f.fileno()).st_size, 2 * _MB + 16, content)
+
+    def testContent(self):
+        for content in ['zeros', 'sparse']:
+            f = io.BytesIO()
+            ContentGenerator(content).write(f, 1000)
+            self.assertEqual(f.getvalue(), bytes(1000))
+
+        # Seeded data is reproducible
+        data = []
+        for _ in range(2):
+            f = io.BytesIO()
+            ContentGenerator('random', seed=1).write(f, 1000)
+            data.append(f.getvalue())
+        self.assertEqual(data[0], data[1])
+        self.assertNotEqual(data[0], bytes(1000))
+
+    def testChecksums(self):
+        for content in CONTENT_TYPES:
+            with tempfile.TemporaryFile() as f:
+                checksums = [Checksum('md5'), Checksum('sha256'), Checksum('crc32')]
+                ContentGenerator(content, seed=0).write(f, _MB + 10, checksums)
+                f.seek(0)
+                data = f.read()
+            self.assertEqual(checksums[0].hexdigest(), hashlib.md5(data).hexdigest(), content)
+            self.assertEqual(checksums[1].hexdigest(), hashlib.sha256(data).hexdigest(), content)
+            self.assertEqual(checksums[2].hexdigest(), '{:08x}'.format(zlib.crc32(data)), content)
+
+    def testPreallocate(self):
+        with tempfile.TemporaryFile() as f:
+            # Not supported by all file systems.
+            if preallocate(f, _MB):
+                self.assertEqual(os.fstat(f.fileno()).st_size, _MB)
+            self.assertFalse(preallocate(f, 0))
+        self.assertFalse(preallocate(io.BytesIO(), _MB))
+
+    def testFork(self):
+        # Forked pseudo random generators depend on the order of forking only.
+        data = []
+        for _ in range(2):
+            generator = ContentGenerator('random', seed=1)
+            forks = [generator.fork() for _ in range(2)]
+            files = [io.BytesIO(), io.BytesIO()]
+            for fork, f in reversed(list(zip(forks, files))):
+                fork.write(f, 1000)
+            data.append([f.getvalue() for f in files])
+        self.assertEqual(data[0], data[1])
+        self.assertNotEqual(data[0][0], data[0][1])
+        generator = ContentGenerator('zeros')
+        self.assertIs(generator.fork(), generator)
+
+    def testRandbytesFallback(self):
+        # Without randbytes (Python < 3.9), the content is the same.
+        class _Random:
+            def __init__(self, seed):
+                self.getrandbits = random.Random(seed).getrandbits
+
+        gen = ContentGenerator('random', 5)
+        old_gen = ContentGenerator('random', 5)
+        old_gen._rng = _Random(5)
+        for amount in (0, 1, 1000):
+            self.assertEqual(old_gen._randbytes(amount), gen._randbytes(amount))
+
+    def testUnknown(self):
+        self.assertRaises(ScenarioError, ContentGenerator, 'foo')
+        self.assertRaises(ScenarioError, Checksum, 'foo')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import concurrent.futures
+import os
+import tempfile
+import time
+import unittest
+
+from procsim.core.input_catalogue import InputCatalogue
+from procsim.core.job_order import JobOrderInput
+from procsim.core.zip_writer import ZipArchiveWriter
+
+
+class InputCatalogueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.nr_reads = 0
+
+    def _input(self, file_type, names):
+        input = JobOrderInput()
+        input.file_type = file_type
+        input.file_names = []
+        for name in names:
+            path = os.path.join(self.tmp_dir.name, name)
+            if name.endswith('.zip'):
+                archive = ZipArchiveWriter(path, os.path.splitext(path)[0])
+                with archive.open(os.path.join(os.path.splitext(path)[0], 'mph.xml')) as f:
+                    f.write(b'<xml/>')
+                archive.close()
+            else:
+                os.makedirs(path)
+            input.file_names.append(path)
+        return input
+
+    def _read_header(self, product):
+        self.nr_reads += 1
+        product.header = product.root
+
+    def testHeaders(self):
+        raw = self._input('RAW', ['20_25_3.zip', '00_05_1', '10_15_2.zip'])
+        aux = self._input('AUX', ['00_59_0'])
+        catalogue = InputCatalogue([raw, aux])
+        catalogue.set_header_reader(self._read_header)
+        products = [catalogue.product(path) for path in raw.file_names + aux.file_names]
+        self.assertEqual([p.file_type for p in products], ['RAW', 'RAW', 'RAW', 'AUX'])
+        self.assertTrue(all(p.is_product for p in products))
+        self.assertIsNone(catalogue.product(os.path.join(self.tmp_dir.name, 'other')))
+
+        # Every header is read once
+        for _ in range(2):
+            self.assertEqual([catalogue.read_header(p) for p in products], [p.root for p in products])
+        self.assertEqual(self.nr_reads, 4)
+
+        self.assertEqual(catalogue.get('key', lambda: [1]), [1])
+        self.assertEqual(catalogue.get('key', lambda: [2]), [1])
+
+    def testConcurrentReads(self):
+        input = self._input('RAW', ['00_05_1'])
+        catalogue = InputCatalogue([input])
+
+        def read_header(product):
+            time.sleep(0.01)
+            self._read_header(product)
+
+        catalogue.set_header_reader(read_header)
+        product = catalogue.product(input.file_names[0])
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            headers = list(executor.map(catalogue.read_header, [product] * 4))
+        self.assertEqual(headers, [product.root] * 4)
+        self.assertEqual(self.nr_reads, 1)
+
+    def testExtract(self):
+        input = self._input('RAW', ['00_05_1.zip'])
+        catalogue = InputCatalogue([input])
+        product = catalogue.product(input.file_names[0])
+        archive_path = product.path
+        self.assertTrue(product.is_archive)
+        catalogue.extract(product)
+        catalogue.extract(product)
+        self.assertFalse(os.path.exists(archive_path))
+        self.assertTrue(product.is_dir)
+        self.assertTrue(os.path.isfile(os.path.join(product.path, 'mph.xml')))
+        self.assertIs(catalogue.product(archive_path), product)
+        self.assertIs(catalogue.product(product.root), product)
+
+    def testZipExtension(self):
+        # The zip extension can differ per output.
+        input = self._input('RAW', ['00_05_1.zip'])
+        path = os.path.splitext(input.file_names[0])[0] + '.ZIPX'
+        os.rename(input.file_names[0], path)
+        input.file_names = [path]
+        catalogue = InputCatalogue([input])
+        self.assertFalse(catalogue.product(path).is_product)
+        product = catalogue.product(path, '.zipx')
+        self.assertTrue(product.is_archive)
+        self.assertEqual(product.root, os.path.splitext(path)[0])
+
+    def testSetDocument(self):
+        input = self._input('RAW', ['00_05_1', '10_15_2'])
+        catalogue = InputCatalogue([input])
+        catalogue.set_document(input.file_names[0], b'<xml/>')
+        self.assertEqual(catalogue.product(input.file_names[0]).document, b'<xml/>')
+        self.assertIsNone(catalogue.product(input.file_names[1]).document)
+
+
+if __name__ == '__main__':
+    unittest.main()
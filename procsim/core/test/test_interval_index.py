@@ -0,0 +1,47 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import datetime
+import random
+import unittest
+
+from procsim.core.interval_index import IntervalIndex
+
+T0 = datetime.datetime(2021, 2, 1, 0, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+def _t(minutes):
+    return T0 + datetime.timedelta(minutes=minutes)
+
+
+class IntervalIndexTest(unittest.TestCase):
+
+    def testBounds(self):
+        index = IntervalIndex([(_t(20), _t(30), 'b'), (_t(0), _t(10), 'a'), (_t(20), _t(25), 'c')])
+        self.assertEqual([value for _, _, value in index], ['a', 'b', 'c'])
+        self.assertEqual([value for _, _, value in index.overlapping(_t(10), _t(20))], ['a', 'b', 'c'])
+        self.assertEqual(index.overlapping(_t(10), _t(20), closed=False), [])
+        self.assertEqual([value for _, _, value in index.overlapping(_t(26), _t(40))], ['b'])
+        self.assertEqual(index.overlapping(_t(31), _t(40)), [])
+        self.assertEqual(IntervalIndex([]).overlapping(_t(0), _t(10)), [])
+
+    def testSameAsScan(self):
+        rnd = random.Random(1)
+        intervals = []
+        for i in range(300):
+            start = rnd.uniform(0, 1000)
+            # Mostly short intervals, some of which nest in long ones.
+            length = rnd.uniform(0, 200) if rnd.random() < 0.1 else rnd.uniform(0, 10)
+            intervals.append((_t(start), _t(start + length), i))
+        index = IntervalIndex(intervals)
+        for _ in range(500):
+            start = rnd.uniform(-50, 1050)
+            end = start + rnd.uniform(0, 30)
+            expected = sorted((i for i in intervals if i[0] <= _t(end) and i[1] >= _t(start)), key=lambda i: i[0])
+            self.assertEqual(index.overlapping(_t(start), _t(end)), expected)
+            expected = sorted((i for i in intervals if i[0] < _t(end) and i[1] > _t(start)), key=lambda i: i[0])
+            self.assertEqual(index.overlapping(_t(start), _t(end), closed=False), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import datetime
+import random
+import unittest
+
+from procsim.core.interval_merge import merge_intervals
+
+T0 = datetime.datetime(2021, 2, 1, 0, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+def _t(minutes):
+    return T0 + datetime.timedelta(minutes=minutes)
+
+
+class IntervalMergeTest(unittest.TestCase):
+
+    def testMerge(self):
+        result = merge_intervals([
+            ('b', _t(0), _t(10), 'b1'),
+            ('a', _t(20), _t(30), 'a2'),
+            ('a', _t(0), _t(10), 'a1'),
+            ('a', _t(10), _t(15), 'a3'),    # Touches a1
+            ('a', _t(1), _t(2), 'a4'),      # Within a1
+            ('b', _t(11), _t(12), 'b2'),
+        ])
+        self.assertEqual(list(result.keys()), ['b', 'a'])
+        a = result['a']
+        self.assertEqual(a.spans, [(_t(0), _t(15)), (_t(20), _t(30))])
+        self.assertEqual(a.gaps, [(_t(15), _t(20))])
+        self.assertEqual((a.count, a.first, a.last), (4, 'a1', 'a2'))
+        self.assertFalse(a.is_contiguous)
+
+        # A nested interval does not end the coverage.
+        result = merge_intervals([('c', _t(0), _t(10), 'c1'), ('c', _t(2), _t(3), 'c2'), ('c', _t(5), _t(10), 'c3')])
+        c = result['c']
+        self.assertEqual(c.spans, [(_t(0), _t(10))])
+        self.assertTrue(c.is_contiguous)
+        self.assertEqual((c.first, c.last), ('c1', 'c3'))
+        self.assertEqual(merge_intervals([]), {})
+
+    def testSameAsScan(self):
+        rnd = random.Random(1)
+        intervals = []
+        for i in range(300):
+            start = rnd.uniform(0, 1000)
+            intervals.append((i % 3, _t(start), _t(start + rnd.uniform(0, 10)), i))
+        result = merge_intervals(intervals)
+        for key, coverage in result.items():
+            members = [interval for interval in intervals if interval[0] == key]
+            # Every interval is within one span, and no span contains a gap.
+            for _, start, stop, _ in members:
+                self.assertEqual(sum(1 for span in coverage.spans if span[0] <= start and stop <= span[1]), 1)
+            for gap_start, gap_stop in coverage.gaps:
+                self.assertFalse(any(start < gap_stop and stop > gap_start for _, start, stop, _ in members))
+            self.assertEqual(len(coverage.spans), len(coverage.gaps) + 1)
+            self.assertEqual(coverage.spans[0][0], min(start for _, start, _, _ in members))
+            self.assertEqual(coverage.spans[-1][1], max(stop for _, _, stop, _ in members))
+
+
+if __name__ == '__main__':
+    unittest.main()
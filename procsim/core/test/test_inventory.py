@@ -0,0 +1,83 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import contextlib
+import datetime
+import io
+import os
+import tempfile
+import unittest
+from xml.etree import ElementTree as et
+
+from procsim.core import inventory
+from procsim.core.inventory import ProductInventory, resolve_job_order
+
+_JOB_ORDER = '''<Ipf_Job_Order><List_of_Tasks><Task><List_of_Inputs><Input><List_of_Selected_Inputs>
+<Selected_Input><File_Type>RAW_025_10</File_Type><List_of_File_Names>
+<File_Name>{0}/BIO_RAW_025_10_*.zip</File_Name>
+<File_Name>{0}/BIO_RAW_026_10_*.zip</File_Name>
+<File_Name>{0}/BIO_RAW_027_10_*.zip</File_Name>
+<File_Name>{0}/BIO_RAW_025_10_fixed.zip</File_Name>
+</List_of_File_Names></Selected_Input>
+</List_of_Selected_Inputs></Input></List_of_Inputs></Task></List_of_Tasks></Ipf_Job_Order>
+'''
+
+
+def _time(minute):
+    return datetime.datetime(2021, 2, 1, 0, 0, tzinfo=datetime.timezone.utc) + datetime.timedelta(minutes=minute)
+
+
+class ProductInventoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.db_path = os.path.join(self.tmp_dir.name, 'inventory.db')
+        self.inventory = ProductInventory(self.db_path)
+        self.addCleanup(self.inventory.close)
+        for nr in range(10):
+            # 5 minute slices, 10 minutes apart. Slice 0 is long.
+            stop = _time(60) if nr == 0 else _time(10 * nr + 5)
+            self.inventory.add(os.path.join(self.tmp_dir.name, 'S1_RAW__0S_{}'.format(nr)), 'S1_RAW__0S',
+                               _time(10 * nr), stop, _time(10 * nr - 1), stop, nr + 1, 3, '01')
+        self.inventory.add(os.path.join(self.tmp_dir.name, 'BIO_RAW_025_10_A.zip'), 'RAW_025_10', _time(0), _time(90))
+
+    def testQuery(self):
+        products = self.inventory.query('S1_RAW__0S', (_time(42), _time(53)))
+        self.assertEqual([p['slice_frame_nr'] for p in products], [1, 5, 6])
+        self.assertEqual(products[1]['begin_position'], '2021-02-01T00:40:00.000000Z')
+        products = self.inventory.query('S1_RAW__0S', (_time(38), _time(39.5)), validity=True)
+        self.assertEqual([p['slice_frame_nr'] for p in products], [1, 5])
+        self.assertEqual(len(self.inventory.query(overlaps=(_time(86), _time(87)))), 1)
+        self.assertEqual(len(self.inventory.query(slice_frame_nr=3, data_take_id=3, baseline='01')), 1)
+
+        # Replace a product
+        self.inventory.add(os.path.join(self.tmp_dir.name, 'S1_RAW__0S_4'), 'S1_RAW__0S', _time(200), _time(205))
+        self.assertEqual(len(self.inventory.query('S1_RAW__0S', (_time(201), _time(202)))), 1)
+        self.assertEqual(len(self.inventory.query('S1_RAW__0S')), 10)
+
+    def testCommandLine(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            inventory.main(['-d', self.db_path, 'query', '--type', 'S1_RAW__0S',
+                            '--overlaps', '2021-02-01T00:42:00Z', '2021-02-01T00:43:00'])
+        self.assertEqual(out.getvalue().split(), [os.path.join(self.tmp_dir.name, 'S1_RAW__0S_{}'.format(nr)) for nr in [0, 4]])
+        self.assertEqual(inventory.time_from_iso('2021-02-01T00:42:00.500Z'), _time(42) + datetime.timedelta(seconds=0.5))
+
+    def testResolveJobOrder(self):
+        src = os.path.join(self.tmp_dir.name, 'template.xml')
+        dest = os.path.join(self.tmp_dir.name, 'JobOrder.xml')
+        with open(src, 'w') as f:
+            f.write(_JOB_ORDER.format(self.tmp_dir.name))
+        # Products that are not in the inventory are looked up on disk.
+        open(os.path.join(self.tmp_dir.name, 'BIO_RAW_026_10_B.zip'), 'w').close()
+        unresolved = resolve_job_order(self.inventory, src, dest)
+        self.assertEqual(unresolved, [os.path.join(self.tmp_dir.name, 'BIO_RAW_027_10_*.zip')])
+        names = [el.text for el in et.parse(dest).iter('File_Name')]
+        self.assertEqual(names, [os.path.join(self.tmp_dir.name, 'BIO_RAW_025_10_A.zip'),
+                                 os.path.join(self.tmp_dir.name, 'BIO_RAW_026_10_B.zip'), 'dummy',
+                                 os.path.join(self.tmp_dir.name, 'BIO_RAW_025_10_fixed.zip')])
+
+
+if __name__ == '__main__':
+    unittest.main()
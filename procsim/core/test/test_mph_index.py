@@ -0,0 +1,81 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import datetime
+import os
+import concurrent.futures
+import sqlite3
+import tempfile
+import unittest
+
+from procsim.core.mph_index import MphIndex
+
+
+DOCUMENT = b'<?xml version="1.0" encoding="UTF-8"?>\n<eop:EarthObservation/>\n'
+BEGIN = datetime.datetime(2021, 2, 1, 0, 24, 32, tzinfo=datetime.timezone.utc)
+END = datetime.datetime(2021, 2, 1, 0, 29, 32, tzinfo=datetime.timezone.utc)
+
+
+class MphIndexTest(unittest.TestCase):
+
+    def testStoreLookup(self):
+        with tempfile.TemporaryDirectory() as dir:
+            mph_path = os.path.join(dir, 'PRODUCT', 'mph.xml')
+            os.makedirs(os.path.dirname(mph_path))
+            with open(mph_path, 'w') as f:
+                f.write('<xml/>')
+            with MphIndex(os.path.join(dir, 'index.db')) as index:
+                self.assertIsNone(index.lookup(os.path.dirname(mph_path), mph_path))
+                index.store(os.path.dirname(mph_path), mph_path, DOCUMENT, 'RAWS025_10', BEGIN, END, 3)
+
+                # A second connection, e.g. from another procsim instance, sees the entry.
+                with MphIndex(os.path.join(dir, 'index.db')) as other:
+                    self.assertEqual(other.lookup(os.path.join(dir, '.', 'PRODUCT'), mph_path), DOCUMENT)
+                    with sqlite3.connect(os.path.join(dir, 'index.db')) as db:
+                        self.assertEqual(db.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+                        self.assertEqual(db.execute('SELECT product_type, begin_position, slice_frame_nr FROM mph').fetchall(),
+                                         [('RAWS025_10', '2021-02-01T00:24:32+00:00', 3)])
+
+                    # Modified products are not taken from the index.
+                    with open(mph_path, 'w') as f:
+                        f.write('<xml></xml>')
+                    self.assertIsNone(other.lookup(os.path.dirname(mph_path), mph_path))
+                    self.assertIsNone(other.lookup(os.path.join(dir, 'OTHER'), os.path.join(dir, 'OTHER', 'mph.xml')))
+
+    def testSchemaVersion(self):
+        # Indices of an older version are rebuilt, they only hold cached data.
+        with tempfile.TemporaryDirectory() as dir:
+            db_path = os.path.join(dir, 'index.db')
+            with sqlite3.connect(db_path) as db:
+                db.execute('CREATE TABLE mph (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, hdr BLOB)')
+            with open(os.path.join(dir, 'mph.xml'), 'w') as f:
+                f.write('<xml/>')
+            with MphIndex(db_path) as index:
+                index.store(dir, os.path.join(dir, 'mph.xml'), DOCUMENT)
+                self.assertEqual(index.lookup(dir, os.path.join(dir, 'mph.xml')), DOCUMENT)
+            with MphIndex(db_path) as index:
+                self.assertEqual(index.lookup(dir, os.path.join(dir, 'mph.xml')), DOCUMENT)
+
+    def testThreads(self):
+        with tempfile.TemporaryDirectory() as dir:
+            paths = []
+            for i in range(8):
+                mph_path = os.path.join(dir, 'PRODUCT{}'.format(i), 'mph.xml')
+                os.makedirs(os.path.dirname(mph_path))
+                with open(mph_path, 'w') as f:
+                    f.write('<xml/>')
+                paths.append(mph_path)
+            index = MphIndex(os.path.join(dir, 'index.db'))
+
+            # One index, used by several threads.
+            def store_lookup(mph_path):
+                index.store(os.path.dirname(mph_path), mph_path, DOCUMENT, 'RAWS025_10')
+                return index.lookup(os.path.dirname(mph_path), mph_path)
+
+            with concurrent.futures.ThreadPoolExecutor(4) as executor:
+                self.assertEqual(list(executor.map(store_lookup, paths)), [DOCUMENT] * 8)
+            index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
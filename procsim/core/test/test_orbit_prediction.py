@@ -0,0 +1,105 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import datetime
+import os
+import tempfile
+import unittest
+from xml.etree import ElementTree as et
+
+from procsim.core import orbit_prediction, timestamps
+from procsim.core.mph_index import MphIndex
+
+ORBPRE_DATA = '''<?xml version="1.0" encoding="UTF-8"?>
+<Earth_Explorer_File xmlns="http://eop-cfi.esa.int/CFI">
+  <Earth_Explorer_Header>
+    <Fixed_Header>
+      <Validity_Period>
+        <Validity_Start>UTC=2021-12-09T13:00:00</Validity_Start>
+      </Validity_Period>
+    </Fixed_Header>
+  </Earth_Explorer_Header>
+  <Data_Block type="xml">
+    <List_of_OSVs count="4">
+      <OSV>
+        <TAI>TAI=2021-12-09T15:39:44.000000</TAI>
+        <UTC>UTC=2021-12-09T15:39:07.000000</UTC>
+        <Absolute_Orbit>+00003</Absolute_Orbit>
+      </OSV>
+      <OSV>
+        <UTC>UTC=2021-12-09T13:59:07.000000</UTC>
+      </OSV>
+      <OSV>
+        <UTC/>
+      </OSV>
+      <OSV>
+        <UTC>UTC=2021-12-09T14:49:07.000000</UTC>
+      </OSV>
+    </List_of_OSVs>
+    <UTC>UTC=2000-01-01T00:00:00.000000</UTC>
+  </Data_Block>
+</Earth_Explorer_File>
+'''
+
+
+def _utc(hour, minute):
+    return datetime.datetime(2021, 12, 9, hour, minute, 7, tzinfo=datetime.timezone.utc)
+
+
+def _read_tree(file_name):
+    # The former implementation, which parses the complete tree.
+    root = et.parse(file_name).getroot()
+    ns = {'d': root.tag[1:root.tag.index('}')]}
+    return [timestamps.from_iso(utc.text[4:])
+            for utc in root.findall('d:Data_Block/d:List_of_OSVs/d:OSV/d:UTC', ns) if utc.text is not None]
+
+
+class OrbitPredictionTest(unittest.TestCase):
+
+    def testIterAnxTimes(self):
+        with tempfile.TemporaryDirectory() as dir:
+            file_name = os.path.join(dir, 'ORBPRE.EOF')
+            with open(file_name, 'w') as f:
+                f.write(ORBPRE_DATA)
+            self.assertEqual(list(orbit_prediction.iter_anx_times(file_name)),
+                             [_utc(15, 39), _utc(13, 59), _utc(14, 49)])
+            self.assertEqual(list(orbit_prediction.iter_anx_times(file_name)), _read_tree(file_name))
+
+            # Without namespace.
+            with open(file_name, 'w') as f:
+                f.write(ORBPRE_DATA.replace(' xmlns="http://eop-cfi.esa.int/CFI"', ''))
+            self.assertEqual(len(list(orbit_prediction.iter_anx_times(file_name))), 3)
+
+    def testReadAnxList(self):
+        with tempfile.TemporaryDirectory() as dir:
+            file_name = os.path.join(dir, 'ORBPRE.EOF')
+            with open(file_name, 'w') as f:
+                f.write(ORBPRE_DATA)
+            index = MphIndex(os.path.join(dir, 'index.db'))
+            expected = [_utc(13, 59), _utc(14, 49), _utc(15, 39)]
+            anx_list = orbit_prediction.read_anx_list(file_name, index)
+            self.assertEqual(anx_list, expected)
+
+            # Callers get their own copy of the cached list.
+            anx_list.clear()
+            self.assertEqual(orbit_prediction.read_anx_list(file_name), expected)
+
+            # Another process finds the list in the index.
+            orbit_prediction._anx_lists.clear()
+            other = MphIndex(os.path.join(dir, 'index.db'))
+            self.assertEqual(other.lookup_anx(file_name), expected)
+            self.assertEqual(other.lookup_anx(file_name)[0].tzinfo, datetime.timezone.utc)
+
+            # A modified file is read again.
+            with open(file_name, 'w') as f:
+                f.write(ORBPRE_DATA.replace('13:59:07.000000', '13:59:08.000'))
+            self.assertIsNone(other.lookup_anx(file_name))
+            anx_list = orbit_prediction.read_anx_list(file_name, other)
+            self.assertEqual(anx_list[0], _utc(13, 59) + datetime.timedelta(seconds=1))
+            self.assertEqual(index.lookup_anx(file_name), anx_list)
+            index.close()
+            other.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
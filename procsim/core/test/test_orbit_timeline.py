@@ -0,0 +1,60 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import datetime
+import random
+import unittest
+
+from procsim.core.orbit_timeline import OrbitTimeline
+
+ORBITAL_PERIOD = datetime.timedelta(seconds=6060)
+SPACING = datetime.timedelta(seconds=180)
+ANX1 = datetime.datetime(2021, 2, 1, 0, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+class OrbitTimelineTest(unittest.TestCase):
+
+    def testLookups(self):
+        anx2 = ANX1 + ORBITAL_PERIOD + datetime.timedelta(seconds=1)
+        timeline = OrbitTimeline([anx2, ANX1], ORBITAL_PERIOD)
+        self.assertEqual(timeline.anx_list, [ANX1, anx2])
+
+        # Extrapolated before the first ANX.
+        self.assertEqual(timeline.anx_orbit(ANX1 - datetime.timedelta(microseconds=1)), (ANX1 - ORBITAL_PERIOD, -1))
+        self.assertEqual(timeline.anx_orbit(ANX1 - 2 * ORBITAL_PERIOD), (ANX1 - 2 * ORBITAL_PERIOD, -2))
+        self.assertEqual(timeline.slice_frame_nr(ANX1 - datetime.timedelta(microseconds=1), SPACING), 34)
+        self.assertEqual(timeline.slice_frame_interval(ANX1 - ORBITAL_PERIOD + 2.5 * SPACING, SPACING),
+                         (ANX1 - ORBITAL_PERIOD + 2 * SPACING, ANX1 - ORBITAL_PERIOD + 3 * SPACING))
+        self.assertEqual(timeline.anx_orbit(ANX1), (ANX1, 0))
+        self.assertEqual(timeline.anx_orbit(anx2 - datetime.timedelta(microseconds=1)), (ANX1, 0))
+        self.assertEqual(timeline.anx_orbit(anx2 + ORBITAL_PERIOD / 2), (anx2, 1))
+        # Extrapolated after the last ANX.
+        self.assertEqual(timeline.anx_orbit(anx2 + 3 * ORBITAL_PERIOD), (anx2 + 3 * ORBITAL_PERIOD, 4))
+
+        self.assertEqual(timeline.slice_frame_nr(ANX1, SPACING), 1)
+        self.assertEqual(timeline.slice_frame_nr(anx2 + 2.5 * SPACING, SPACING), 3)
+        self.assertEqual(timeline.slice_frame_interval(anx2 + 3 * ORBITAL_PERIOD + 2.5 * SPACING, SPACING),
+                         (anx2 + 3 * ORBITAL_PERIOD + 2 * SPACING, anx2 + 3 * ORBITAL_PERIOD + 3 * SPACING))
+
+        empty = OrbitTimeline([], ORBITAL_PERIOD)
+        self.assertEqual(empty.anx_orbit(ANX1), (None, None))
+        self.assertEqual(empty.positions([ANX1], SPACING), [None])
+
+    def testPositions(self):
+        rnd = random.Random(1)
+        timeline = OrbitTimeline([ANX1 + i * ORBITAL_PERIOD + datetime.timedelta(seconds=rnd.uniform(-1, 1))
+                                  for i in range(10)], ORBITAL_PERIOD)
+        times = sorted(ANX1 + datetime.timedelta(seconds=rnd.uniform(-1, 15) * ORBITAL_PERIOD.total_seconds())
+                       for _ in range(500))
+        # Sorted, and in random order.
+        for _ in range(2):
+            expected = []
+            for t in times:
+                anx, index = timeline.anx_orbit(t)
+                expected.append(None if anx is None else (anx, index, timeline.slice_frame_nr(t, SPACING)))
+            self.assertEqual(timeline.positions(times, SPACING), expected)
+            rnd.shuffle(times)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import os
+import tempfile
+import unittest
+
+from procsim.core.product_archive import ProductArchive, is_archive
+from procsim.core.zip_writer import ZipArchiveWriter
+
+
+class ProductArchiveTest(unittest.TestCase):
+
+    def testReadMember(self):
+        with tempfile.TemporaryDirectory() as dir:
+            product_dir = os.path.join(dir, 'PRODUCT')
+            archive = ZipArchiveWriter(product_dir + '.zip', product_dir)
+            with archive.open(os.path.join(product_dir, 'data', 'file.dat'), 5) as f:
+                f.write(b'12345')
+            with archive.open(os.path.join(product_dir, 'mph.xml')) as f:
+                f.write(b'<xml/>')
+            archive.close()
+            self.assertTrue(is_archive(product_dir + '.zip'))
+            self.assertFalse(is_archive(product_dir + '.zip', '.ZIP2'))
+
+            with ProductArchive(product_dir + '.zip') as product:
+                self.assertEqual(product.find('mph.xml'), 'PRODUCT/mph.xml')
+                self.assertEqual(product.find('file.dat'), 'PRODUCT/data/file.dat')
+                self.assertIsNone(product.find('other.xml'))
+                with product.open('mph.xml') as f:
+                    self.assertEqual(f.read(), b'<xml/>')
+                self.assertRaises(FileNotFoundError, product.open, 'other.xml')
+            self.assertFalse(os.path.exists(product_dir))
+
+            ProductArchive(product_dir + '.zip').extract(keep_zip=False)
+            self.assertFalse(os.path.exists(product_dir + '.zip'))
+            with open(os.path.join(product_dir, 'data', 'file.dat'), 'rb') as f:
+                self.assertEqual(f.read(), b'12345')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import threading
+import time
+import unittest
+
+from procsim.core.product_emitter import BufferedLogger, ProductEmissionMixin, ProductEmitter
+
+
+class _Logger:
+    def __init__(self):
+        self.messages = []
+
+    def debug(self, *args, **kwargs):
+        self.messages.append(('D',) + args)
+
+    def info(self, *args, **kwargs):
+        self.messages.append(('I',) + args)
+
+    def log(self, level, *args, **kwargs):
+        self.messages.append((level[0],) + args)
+
+
+class _ContentGenerator:
+    def fork(self):
+        return self
+
+
+class _Generator(ProductEmissionMixin):
+    def __init__(self, workers):
+        self._logger = _Logger()
+        self._hdr = {'nr': 0}
+        self._output_workers = workers
+        self._emitter = None
+        self._registrations = None
+        self.registered = []
+
+    def _get_content_generator(self):
+        return _ContentGenerator()
+
+    def _get_mph_index(self):
+        return None
+
+    def _get_inventory(self):
+        return None
+
+    def _register_output(self, product_path, stat_path, document, hdr=None):
+        if self._registrations is not None:
+            self._registrations.append((product_path, stat_path, document, hdr))
+        else:
+            self.registered.append((product_path, hdr))
+
+    def _create_product(self, i):
+        time.sleep(0.002 * (5 - i))
+        self._hdr['nr'] = i
+        self._logger.debug('product', i)
+        self._register_output(str(i), str(i), b'', dict(self._hdr))
+
+
+class ProductEmitterTest(unittest.TestCase):
+
+    def testBufferedLogger(self):
+        logger = _Logger()
+        buffered = BufferedLogger(logger)
+        buffered.debug('a')
+        first = buffered.split()
+        buffered.log('INFO', 'b')
+        self.assertEqual(logger.messages, [])
+        buffered.flush()
+        first.flush()
+        self.assertEqual(logger.messages, [('I', 'b'), ('D', 'a')])
+        first.flush()
+        self.assertEqual(len(logger.messages), 2)
+
+    def testOrder(self):
+        for workers in (1, 3):
+            done = []
+            threads = set()
+
+            def job(i):
+                # Later jobs finish first.
+                time.sleep(0.002 * (10 - i))
+                threads.add(threading.current_thread().name)
+
+            with ProductEmitter(workers) as emitter:
+                for i in range(10):
+                    emitter.submit(lambda i=i: job(i), lambda i=i: done.append(i))
+                    # In flight: at most two jobs per worker.
+                    self.assertLessEqual(len(emitter._pending), 2 * workers)
+            self.assertEqual(done, list(range(10)))
+            self.assertEqual(len(threads) > 1, workers > 1)
+
+    def testError(self):
+        done = []
+
+        def job(i):
+            if i == 2:
+                raise ValueError(i)
+
+        with self.assertRaises(ValueError):
+            with ProductEmitter(2) as emitter:
+                for i in range(4):
+                    emitter.submit(lambda i=i: job(i), lambda i=i: done.append(i))
+        # Products before the failing one are completed, the failing one too,
+        # and those after it that had started, in order.
+        self.assertEqual(done, list(range(len(done))))
+        self.assertGreaterEqual(len(done), 3)
+
+    def testErrorWhileEmitting(self):
+        done = []
+        with self.assertRaises(RuntimeError):
+            with ProductEmitter(2) as emitter:
+                for i in range(2):
+                    emitter.submit(lambda: None, lambda i=i: done.append(i))
+                for future, _ in emitter._pending:
+                    future.result()
+                raise RuntimeError()
+        # Jobs that were completed are not lost.
+        self.assertEqual(done, [0, 1])
+
+    def testProductEmission(self):
+        for workers in (1, 3):
+            gen = _Generator(workers)
+            with gen._product_emission():
+                for i in range(5):
+                    gen._logger.info('emit', i)
+                    gen._emit_product(gen._create_product, i)
+            self.assertEqual(gen.registered, [(str(i), {'nr': i}) for i in range(5)])
+            self.assertEqual(gen._logger.messages, [m for i in range(5) for m in (('I', 'emit', i), ('D', 'product', i))])
+            # Products created in a worker thread have a header of their own.
+            self.assertEqual(gen._hdr['nr'], 4 if workers == 1 else 0)
+            self.assertIsNone(gen._emitter)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import datetime
+import os
+import tempfile
+import unittest
+
+from procsim.core.product_io import ProductIOMixin
+
+
+BEGIN = datetime.datetime(2021, 2, 1, 0, 24, 32, tzinfo=datetime.timezone.utc)
+END = datetime.datetime(2021, 2, 1, 0, 29, 32, tzinfo=datetime.timezone.utc)
+
+
+class _Header:
+    def __init__(self):
+        self.product_type = None
+        self.begin_position = self.validity_start = BEGIN
+        self.end_position = self.validity_stop = END
+        self.product_baseline = 1
+        self.slice_frame_nr = 3
+        self.data_take_id = 7
+        self.products = []
+
+    def render(self, checksums_in_mph=False):
+        return '<mph type="{}"/>\n'.format(self.product_type).encode()
+
+    def parse(self, file, fields=None):
+        if isinstance(file, str):
+            with open(file, 'rb') as f:
+                document = f.read()
+        else:
+            document = file.read()
+        self.product_type = document.decode().split('"')[1]
+
+
+class _Generator(ProductIOMixin):
+    def __init__(self, config):
+        self._logger = None
+        self._hdr = _Header()
+        self._output_config = config
+        self._scenario_config = {}
+        self._zip_extension = '.zip'
+        self._zip_compression = 'store'
+        self._content = 'zeros'
+        self._content_seed = None
+        self._content_generator = None
+        self._checksums = []
+        self._checksum_manifest = False
+        self._checksums_in_mph = False
+        self._input_workers = 2
+        self._registrations = None
+        self._archive = None
+        self._input_catalogue = None
+        self._output_listener = None
+        self._mph_index = None
+        self._inventory = None
+
+    def _create_header(self):
+        return _Header()
+
+    def _mph_file_name(self, product_path):
+        return os.path.basename(product_path).lower() + '.xml'
+
+    def _header_slice_frame_nr(self, hdr):
+        return hdr.slice_frame_nr
+
+    def _header_data_take_id(self, hdr):
+        return hdr.data_take_id
+
+
+class ProductIOTest(unittest.TestCase):
+
+    def testWriteRead(self):
+        with tempfile.TemporaryDirectory() as dir:
+            config = {'mph_index': os.path.join(dir, 'index.db'), 'inventory': os.path.join(dir, 'inventory.db')}
+            gen = _Generator(config)
+            self.addCleanup(gen.close)
+            outputs = []
+            gen.set_output_listener(lambda *args: outputs.append(args))
+
+            # One zipped product and one directory.
+            paths = []
+            for name, zipped in (('PRODUCT_A', True), ('PRODUCT_B', False)):
+                product_dir = os.path.join(dir, name)
+                if zipped:
+                    gen._start_zip_archive(product_dir)
+                with gen._open_output_file(os.path.join(product_dir, 'data', 'file.dat'), 4) as f:
+                    f.write(b'data')
+                gen._hdr.product_type = name[-1]
+                gen._write_mph(os.path.join(product_dir, gen._mph_file_name(product_dir)))
+                paths.append(product_dir + '.zip' if zipped else product_dir)
+            self.assertIsNone(gen._archive)
+            self.assertTrue(all(gen._is_input_product(path) for path in paths))
+            self.assertEqual([(product_type, path) for product_type, path, _ in outputs], [('A', paths[0]), ('B', paths[1])])
+            rows = gen._get_inventory().query()
+            self.assertEqual([(row['path'], row['slice_frame_nr'], row['data_take_id']) for row in rows],
+                             [(paths[0], 3, 7), (paths[1], 3, 7)])
+
+            # The headers are read back in order, also by the input workers,
+            # from the index and from the files.
+            for _ in range(2):
+                headers = gen._parse_input_mphs(paths)
+                self.assertEqual([(mph_path, hdr.product_type) for mph_path, hdr in headers],
+                                 [(os.path.join(paths[0], 'product_a.xml'), 'A'),
+                                  (os.path.join(paths[1], 'product_b.xml'), 'B')])
+                gen.close()
+                os.remove(config['mph_index'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import os
+import tempfile
+import time
+import unittest
+
+from procsim.core.resource_monitor import ResourceMonitor
+
+_MB = 2**20
+
+
+class ResourceMonitorTest(unittest.TestCase):
+
+    def testReport(self):
+        monitor = ResourceMonitor(interval=0.01)
+        monitor.start()
+        block = bytearray(50 * _MB)
+        with tempfile.TemporaryFile() as f:
+            f.write(os.urandom(2 * _MB))
+        end = time.monotonic() + 0.2
+        while time.monotonic() < end:
+            pass
+        monitor.stop()
+        del block
+
+        report = monitor.report()
+        self.assertGreaterEqual(report['wall_time'], 0.2)
+        self.assertGreater(report['cpu_time'], 0.1)
+        self.assertGreaterEqual(report['peak_rss_mb'], 50)
+        self.assertLessEqual(report['average_rss_mb'], report['peak_rss_mb'])
+        self.assertGreaterEqual(report['written_mb'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
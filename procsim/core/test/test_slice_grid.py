@@ -0,0 +1,77 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import bisect
+import datetime
+import random
+import unittest
+
+from procsim.core.slice_grid import SliceGrid
+
+ORBITAL_PERIOD = datetime.timedelta(seconds=5940)
+SPACING = datetime.timedelta(seconds=108)
+MINIMUM_DURATION = datetime.timedelta(seconds=30)
+ANX1 = datetime.datetime(2021, 2, 1, 0, 0, 0, tzinfo=datetime.timezone.utc)
+
+
+def _enumerate_slice_edges(anx_list, segment_start, segment_end):
+    # Reference: the orbit by orbit enumeration that SliceGrid replaces.
+    anx_list = anx_list.copy()
+    while segment_start < anx_list[0]:
+        anx_list.insert(0, anx_list[0] - ORBITAL_PERIOD)
+    while segment_end > anx_list[-1]:
+        anx_list.append(anx_list[-1] + ORBITAL_PERIOD)
+    anx_idx_start = bisect.bisect_right(anx_list, segment_start) - 1
+    anx_idx_end = bisect.bisect_left(anx_list, segment_end) + 1
+    slice_edges = []
+    slices_per_orbit = int(round(ORBITAL_PERIOD / SPACING))
+    for anx in anx_list[anx_idx_start:anx_idx_end - 1]:
+        slice_edges.extend([(anx + i * SPACING, anx + (i + 1) * SPACING) for i in range(slices_per_orbit)])
+    slice_edges = [slice for slice in slice_edges if slice[1] >= segment_start and slice[0] <= segment_end]
+    if slice_edges[0][1] - segment_start < MINIMUM_DURATION:
+        slice_edges[1] = (slice_edges[0][0], slice_edges[1][1])
+        del slice_edges[0]
+    if segment_end - slice_edges[-1][0] < MINIMUM_DURATION:
+        slice_edges[-2] = (slice_edges[-2][0], slice_edges[-1][1])
+        del slice_edges[-1]
+    return slice_edges
+
+
+class SliceGridTest(unittest.TestCase):
+
+    def testMerge(self):
+        grid = SliceGrid([ANX1], ORBITAL_PERIOD, SPACING)
+        # Short first and last slices are merged with their neighbours.
+        start = ANX1 + SPACING - MINIMUM_DURATION / 2
+        end = ANX1 + 3 * SPACING + MINIMUM_DURATION / 2
+        self.assertEqual(grid.slice_edges(start, end, MINIMUM_DURATION),
+                         [(ANX1, ANX1 + 2 * SPACING), (ANX1 + 2 * SPACING, ANX1 + 4 * SPACING)])
+        # Slices of sufficient length are kept.
+        start = ANX1 + SPACING - MINIMUM_DURATION
+        end = ANX1 + 2 * SPACING + MINIMUM_DURATION
+        self.assertEqual(len(grid.slice_edges(start, end, MINIMUM_DURATION)), 3)
+        # A single slice is never merged.
+        self.assertEqual(grid.slice_edges(ANX1 + SPACING / 3, ANX1 + SPACING / 2, MINIMUM_DURATION),
+                         [(ANX1, ANX1 + SPACING)])
+
+    def testSameAsEnumeration(self):
+        rnd = random.Random(1)
+        # Regular and slightly irregular ANX, as read from orbit prediction files.
+        anx_lists = [
+            [ANX1],
+            [ANX1 + i * ORBITAL_PERIOD for i in range(5)],
+            [ANX1 + i * ORBITAL_PERIOD + datetime.timedelta(microseconds=rnd.randint(-500000, 500000)) for i in range(5)],
+        ]
+        for anx_list in anx_lists:
+            grid = SliceGrid(anx_list, ORBITAL_PERIOD, SPACING)
+            for _ in range(300):
+                start = ANX1 + datetime.timedelta(seconds=rnd.uniform(-3, 8) * ORBITAL_PERIOD.total_seconds())
+                if rnd.random() < 0.2:
+                    # On the grid.
+                    start = anx_list[0] + rnd.randint(-100, 400) * SPACING
+                end = start + datetime.timedelta(seconds=rnd.uniform(SPACING.total_seconds(), 3 * ORBITAL_PERIOD.total_seconds()))
+                self.assertEqual(grid.slice_edges(start, end, MINIMUM_DURATION), _enumerate_slice_edges(anx_list, start, end))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import datetime
+import unittest
+
+from procsim.core import timestamps
+
+
+def _strptime(timestr, format):
+    return datetime.datetime.strptime(timestr, format).replace(tzinfo=datetime.timezone.utc)
+
+
+class TimestampsTest(unittest.TestCase):
+
+    def testFromIso(self):
+        for timestr in ['2021-02-01T00:24:32.000', '2021-02-01T00:24:32.123456', '2021-02-01T00:24:32.1',
+                        '2021-02-01T00:24:32.12345', '2024-02-29T23:59:59.999999', '2021-2-1T0:24:32.5']:
+            expected = _strptime(timestr, timestamps.ISO_FORMAT)
+            self.assertEqual(timestamps.from_iso(timestr), expected)
+            self.assertEqual(timestamps.from_iso(timestr + 'Z'), expected)
+            self.assertEqual(timestamps.from_iso(timestr).tzinfo, datetime.timezone.utc)
+        for timestr in ['2021-02-01T00:24:32', '2021-02-01 00:24:32.000', '2021-02-30T00:24:32.000',
+                        '2021-02-01T00:24:32.000+01:00', '2021-W01-1T00:24:32.000', '']:
+            with self.assertRaises(ValueError):
+                timestamps.from_iso(timestr)
+
+    def testFromIsoShortAndCompact(self):
+        self.assertEqual(timestamps.from_iso_short('2021-02-01T00:24:32Z'),
+                         _strptime('2021-02-01T00:24:32', timestamps.ISO_FORMAT_SHORT))
+        self.assertEqual(timestamps.from_compact('20210201T002432'),
+                         _strptime('20210201T002432', timestamps.COMPACT_FORMAT))
+        for parse, timestr in [(timestamps.from_iso_short, '2021-02-01T00:24:32.000Z'),
+                               (timestamps.from_compact, '20210231T002432'),
+                               (timestamps.from_compact, '2021-02-01T00:24:32')]:
+            with self.assertRaises(ValueError):
+                parse(timestr)
+
+    def testFormat(self):
+        utc = datetime.datetime(2021, 2, 1, 0, 24, 32, 123456, tzinfo=datetime.timezone.utc)
+        cet = utc.astimezone(datetime.timezone(datetime.timedelta(hours=1)))
+        self.assertEqual(timestamps.to_iso(utc), '2021-02-01T00:24:32.123456Z')
+        self.assertEqual(timestamps.to_iso_ms(utc), '2021-02-01T00:24:32.123Z')
+        self.assertEqual(timestamps.to_iso_short(utc), '2021-02-01T00:24:32Z')
+        self.assertEqual(timestamps.to_compact(utc), '20210201T002432')
+        # Equal times in other time zones are formatted as is, like strftime().
+        self.assertEqual(timestamps.to_compact(cet), '20210201T012432')
+        self.assertEqual(timestamps.format_time(cet, 'UTC=%Y-%m-%dT%H:%M:%S'), cet.strftime('UTC=%Y-%m-%dT%H:%M:%S'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,7 @@ import multiprocessing
 import os
 import queue
 import subprocess
+import tempfile
 import threading
 import time
 import unittest
@@ -19,6 +20,7 @@ _MB = 2**20
 class _Logger:
     def __init__(self):
         self.count = 0
+        self.warnings = []
 
     def debug(self, *args, **kwargs):
         pass
@@ -26,6 +28,9 @@ class _Logger:
     def progress(self, *args, **kwargs):
         self.count += 1
 
+    def warning(self, *args, **kwargs):
+        self.warnings.append(args[0])
+
     def error(self, *args, **kwargs):
         print(*args, **kwargs)
 
@@ -65,6 +70,26 @@ class WorkSimulatorTest(unittest.TestCase):
         mem_after, cpu = _meas_resource_usage()
         self.assertAlmostEqual(mem_after - mem_before, MEMORY_MB, delta=10)
 
+    def testCpuWorkers(self):
+        # Workers share one deadline; exactly one progress message per step
+        TEST_TIME = 1
+        NR_PROGRESS_MESSAGES = 3
+
+        logger = _Logger()
+        sim = work_simulator.WorkSimulator(
+            logger,
+            time=TEST_TIME,
+            nr_cpu=2,
+            memory_mb=0,
+            disk_space_mb=0,
+            nr_progress_log_messages=NR_PROGRESS_MESSAGES
+        )
+        tstart = time.monotonic()
+        sim.start()
+        self.assertAlmostEqual(time.monotonic() - tstart, TEST_TIME, delta=0.5)
+        self.assertEqual(logger.count, NR_PROGRESS_MESSAGES)
+        self.assertEqual(multiprocessing.active_children(), [])
+
     def testAll(self):
         # Test with all available cores
         TEST_TIME = 10
@@ -113,5 +138,35 @@ class WorkSimulatorTest(unittest.TestCase):
         self.assertGreater(cpu, self.MIN_CPU_LOAD)
 
 
+class CgroupLimitsTest(unittest.TestCase):
+
+    def _write(self, dir, name, content):
+        with open(os.path.join(dir, name), 'w') as f:
+            f.write(content + '\n')
+
+    def testLimits(self):
+        with tempfile.TemporaryDirectory() as dir:
+            self.assertIsNone(work_simulator.cgroup_cpu_limit(dir))
+            self.assertIsNone(work_simulator.cgroup_memory_limit_mb(dir))
+            self._write(dir, 'cpu.max', 'max 100000')
+            self._write(dir, 'memory.max', 'max')
+            self.assertIsNone(work_simulator.cgroup_cpu_limit(dir))
+            self.assertIsNone(work_simulator.cgroup_memory_limit_mb(dir))
+            self._write(dir, 'cpu.max', '150000 100000')
+            self._write(dir, 'memory.max', str(512 * _MB))
+            self.assertEqual(work_simulator.cgroup_cpu_limit(dir), 1.5)
+            self.assertEqual(work_simulator.cgroup_memory_limit_mb(dir), 512)
+
+    def testWarning(self):
+        with tempfile.TemporaryDirectory() as dir:
+            self._write(dir, 'cpu.max', '100000 100000')
+            self._write(dir, 'memory.max', str(100 * _MB))
+            logger = _Logger()
+            sim = work_simulator.WorkSimulator(logger, time=0, nr_cpu=2, memory_mb=200, disk_space_mb=0,
+                                               nr_progress_log_messages=0, cgroup_dir=dir)
+            sim._check_limits()
+            self.assertEqual(len(logger.warnings), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
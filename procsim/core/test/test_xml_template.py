@@ -0,0 +1,33 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import unittest
+from xml.etree import ElementTree as et
+
+from procsim.core.xml_template import TemplateCache, serialize
+
+
+def _build(values):
+    root = et.Element('root', {'id': values['id'] + '_1'})
+    et.SubElement(root, 'name').text = values['name']
+    if values['optional'] is not None:
+        et.SubElement(root, 'optional').text = values['optional']
+    return root
+
+
+class XmlTemplateTest(unittest.TestCase):
+
+    def testRender(self):
+        templates = TemplateCache()
+        for values in [
+            {'id': 'a', 'name': 'b', 'optional': 'c'},
+            {'id': 'a"\n<&>', 'name': 'b"\n<&>', 'optional': 'c'},
+            {'id': 'a', 'name': '', 'optional': None},
+            {'id': 'x', 'name': None, 'optional': ''},
+        ]:
+            self.assertEqual(templates.render('key', values, _build), serialize(_build(values)))
+        self.assertEqual(len(templates._templates), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
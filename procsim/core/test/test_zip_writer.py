@@ -0,0 +1,54 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+'''
+import os
+import tempfile
+import unittest
+import zipfile
+
+from procsim.core.exceptions import ScenarioError
+from procsim.core.zip_writer import ZipArchiveWriter, zip_directory
+
+
+class ZipArchiveWriterTest(unittest.TestCase):
+
+    def testArchive(self):
+        with tempfile.TemporaryDirectory() as dir:
+            product_dir = os.path.join(dir, 'PRODUCT')
+            archive = ZipArchiveWriter(product_dir + '.zip', product_dir)
+            self.assertTrue(archive.contains(os.path.join(product_dir, 'data', 'file.dat')))
+            self.assertFalse(archive.contains(os.path.join(dir, 'other.dat')))
+            with archive.open(os.path.join(product_dir, 'data', 'file.dat'), 5) as f:
+                f.write(b'12345')
+            with archive.open(os.path.join(product_dir, 'mph.xml')) as f:
+                f.write(b'<xml/>')
+            archive.close()
+
+            self.assertFalse(os.path.exists(product_dir))
+            with zipfile.ZipFile(product_dir + '.zip') as zipped:
+                self.assertEqual(zipped.namelist(), ['PRODUCT/', 'PRODUCT/data/', 'PRODUCT/data/file.dat', 'PRODUCT/mph.xml'])
+                self.assertEqual(zipped.getinfo('PRODUCT/data/file.dat').compress_type, zipfile.ZIP_STORED)
+                zipped.extractall(dir)
+            with open(os.path.join(product_dir, 'data', 'file.dat'), 'rb') as f:
+                self.assertEqual(f.read(), b'12345')
+
+    def testCompressionPolicy(self):
+        with tempfile.TemporaryDirectory() as dir:
+            product_dir = os.path.join(dir, 'PRODUCT')
+            os.makedirs(os.path.join(product_dir, 'schema'))
+            for name in ['data.dat', 'mph.xml', os.path.join('schema', 'product.xsd')]:
+                with open(os.path.join(product_dir, name), 'wb') as f:
+                    f.write(b'<a>text</a>' * 100)
+            zip_directory(product_dir, product_dir + '.zip', 'deflate_text')
+            with zipfile.ZipFile(product_dir + '.zip') as zipped:
+                self.assertEqual(zipped.namelist(), ['PRODUCT/', 'PRODUCT/schema/', 'PRODUCT/data.dat',
+                                                     'PRODUCT/mph.xml', 'PRODUCT/schema/product.xsd'])
+                self.assertEqual(zipped.getinfo('PRODUCT/data.dat').compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(zipped.getinfo('PRODUCT/mph.xml').compress_type, zipfile.ZIP_DEFLATED)
+                self.assertEqual(zipped.getinfo('PRODUCT/schema/product.xsd').compress_type, zipfile.ZIP_DEFLATED)
+                self.assertEqual(zipped.read('PRODUCT/mph.xml'), b'<a>text</a>' * 100)
+            self.assertRaises(ScenarioError, ZipArchiveWriter, product_dir + '.zip', product_dir, 'bzip2')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Parsing and formatting of the timestamps used in job orders, scenarios, main
+product headers and product names.
+
+Parsed times are UTC. Parsing accepts exactly what the strptime() formats
+below accept, but well-formed times take a fast path using fromisoformat().
+Results are memoized, since the same times are typically parsed and
+formatted many times (data take bounds, ANX times, product names).
+'''
+import datetime
+import functools
+import re
+
+ISO_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+ISO_FORMAT_SHORT = '%Y-%m-%dT%H:%M:%S'
+COMPACT_FORMAT = '%Y%m%dT%H%M%S'
+
+_CACHE_SIZE = 4096
+
+# fromisoformat() only accepts 3 or 6 digits in the fraction before Python 3.11.
+_ISO_RE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}\.(?:[0-9]{3}|[0-9]{6})')
+_ISO_SHORT_RE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}T[0-9]{2}:[0-9]{2}:[0-9]{2}')
+_COMPACT_RE = re.compile(r'[0-9]{8}T[0-9]{6}')
+
+_UTC = datetime.timezone.utc
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _parse_iso(timestr: str) -> datetime.datetime:
+    if _ISO_RE.fullmatch(timestr):
+        return datetime.datetime.fromisoformat(timestr).replace(tzinfo=_UTC)
+    return datetime.datetime.strptime(timestr, ISO_FORMAT).replace(tzinfo=_UTC)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _parse_iso_short(timestr: str) -> datetime.datetime:
+    if _ISO_SHORT_RE.fullmatch(timestr):
+        return datetime.datetime.fromisoformat(timestr).replace(tzinfo=_UTC)
+    return datetime.datetime.strptime(timestr, ISO_FORMAT_SHORT).replace(tzinfo=_UTC)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _parse_compact(timestr: str) -> datetime.datetime:
+    if _COMPACT_RE.fullmatch(timestr):
+        return datetime.datetime(int(timestr[0:4]), int(timestr[4:6]), int(timestr[6:8]),
+                                 int(timestr[9:11]), int(timestr[11:13]), int(timestr[13:15]), tzinfo=_UTC)
+    return datetime.datetime.strptime(timestr, COMPACT_FORMAT).replace(tzinfo=_UTC)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _format(time: datetime.datetime, tzinfo, format: str) -> str:
+    # Equal times in different time zones have equal hashes, hence the
+    # time zone is part of the key.
+    return time.strftime(format)
+
+
+def from_iso(timestr: str) -> datetime.datetime:
+    '''Parse a time in ISO_FORMAT, with an optional 'Z' suffix.'''
+    if timestr[-1:] == 'Z':
+        timestr = timestr[:-1]
+    return _parse_iso(timestr)
+
+
+def from_iso_short(timestr: str) -> datetime.datetime:
+    '''Parse a time in ISO_FORMAT_SHORT (no fraction), with an optional 'Z' suffix.'''
+    if timestr[-1:] == 'Z':
+        timestr = timestr[:-1]
+    return _parse_iso_short(timestr)
+
+
+def from_compact(timestr: str) -> datetime.datetime:
+    '''Parse a time in COMPACT_FORMAT, as used in product names.'''
+    return _parse_compact(timestr)
+
+
+def format_time(time: datetime.datetime, format: str) -> str:
+    '''Cached equivalent of time.strftime(format).'''
+    return _format(time, time.tzinfo, format)
+
+
+def to_iso(time: datetime.datetime) -> str:
+    '''Format as ISO time with microseconds and 'Z' suffix.'''
+    return _format(time, time.tzinfo, ISO_FORMAT) + 'Z'
+
+
+def to_iso_ms(time: datetime.datetime) -> str:
+    '''Format as ISO time with milliseconds and 'Z' suffix.'''
+    return _format(time, time.tzinfo, ISO_FORMAT)[:-3] + 'Z'
+
+
+def to_iso_short(time: datetime.datetime) -> str:
+    '''Format as ISO time without fraction, with 'Z' suffix.'''
+    return _format(time, time.tzinfo, ISO_FORMAT_SHORT) + 'Z'
+
+
+def to_compact(time: datetime.datetime) -> str:
+    '''Format as compact time, as used in product names.'''
+    return _format(time, time.tzinfo, COMPACT_FORMAT)
@@ -7,6 +7,10 @@ Common XML/JSON helper functions
 import datetime
 import os
 import re
+from typing import Callable, Iterable, Iterator
+from xml.etree import ElementTree as et
+
+from procsim.core import timestamps
 
 
 def indent_xml(element, level=0):
@@ -25,6 +29,84 @@ def indent_xml(element, level=0):
             element.tail = i
 
 
+def iter_top_level_elements(file, tags: Iterable[str], chunk_size: int = 2048) -> Iterator[et.Element]:
+    '''
+    Stream an XML file (a path or a binary file object) and yield the
+    complete top level elements, the children of the root, with one of the
+    given tags. Reading stops as soon as all tags have been found.
+    '''
+    pending = set(tags)
+    if not pending:
+        return
+    if not hasattr(file, 'read'):
+        with open(file, 'rb') as f:
+            yield from iter_top_level_elements(f, pending, chunk_size)
+        return
+    parser = et.XMLPullParser(events=('start', 'end'))
+    depth = 0
+    while True:
+        data = file.read(chunk_size)
+        if data:
+            parser.feed(data)
+        else:
+            parser.close()
+        for event, element in parser.read_events():
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if element.tag in pending:
+                pending.discard(element.tag)
+                yield element
+                if not pending:
+                    return
+            else:
+                element.clear()
+        if not data:
+            return
+
+
+def _escape_pretty(data: str) -> str:
+    # Same escaping as xml.dom.minidom, for text and attribute values.
+    return data.replace('&', '&amp;').replace('<', '&lt;').replace('"', '&quot;').replace('>', '&gt;')
+
+
+def _write_pretty_element(write: Callable[[str], object], element: et.Element, current: str, indent: str) -> None:
+    tag = element.tag
+    write(current + '<' + tag)
+    for name, value in element.items():
+        write(' ' + name + '="' + _escape_pretty(value) + '"')
+    text = element.text
+    if not len(element):
+        if text:
+            write('>' + _escape_pretty(text) + '</' + tag + '>\n')
+        else:
+            write('/>\n')
+        return
+    write('>\n')
+    child_indent = current + indent
+    if text:
+        write(child_indent + _escape_pretty(text) + '\n')
+    for child in element:
+        _write_pretty_element(write, child, child_indent, indent)
+        if child.tail:
+            write(child_indent + _escape_pretty(child.tail) + '\n')
+    write(current + '</' + tag + '>\n')
+
+
+def pretty_xml(element: et.Element, indent: str = '    ') -> str:
+    '''
+    Serialize an element tree as an indented XML document, in a single pass.
+    The output is the same as serializing the tree, re-parsing it with
+    xml.dom.minidom and calling toprettyxml(indent).
+    '''
+    parts = ['<?xml version="1.0" ?>\n']
+    _write_pretty_element(parts.append, element, '', indent)
+    return ''.join(parts)
+
+
 def json_remove_comments(json_like):
     """
     Removes C-style comments from *json_like* and returns the result.  Example::
@@ -72,5 +154,5 @@ def get_current_utc_datetime() -> datetime.datetime:
     Can be overridden in tests using environment variable CURRENT_UTC_DATETIME=<some time>.
     """
     if 'CURRENT_UTC_DATETIME' in os.environ:
-        return datetime.datetime.strptime(os.environ['CURRENT_UTC_DATETIME'], '%Y%m%dT%H%M%S').replace(tzinfo=datetime.timezone.utc)
+        return timestamps.from_compact(os.environ['CURRENT_UTC_DATETIME'])
     return datetime.datetime.now(datetime.timezone.utc)
@@ -3,12 +3,115 @@ Copyright (C) 2021 S[&]T, The Netherlands.
 '''
 import multiprocessing
 import os
+import signal
 import sys
 import tempfile
 import time
+from typing import List, Optional
 
 _MB = 2**20
 
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+
+def _read_first_line(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dir(cgroup_root: str = CGROUP_ROOT) -> str:
+    # Return the cgroup v2 directory of this process. Inside a container the
+    # cgroup namespace usually makes this the root itself.
+    try:
+        with open('/proc/self/cgroup') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    path = os.path.join(cgroup_root, line[3:].strip().lstrip('/'))
+                    if os.path.isdir(path):
+                        return path
+                    break
+    except OSError:
+        pass
+    return cgroup_root
+
+
+def cgroup_cpu_limit(cgroup_dir: Optional[str] = None) -> Optional[float]:
+    '''
+    Return the number of CPUs allowed by the cgroup v2 'cpu.max' quota, or None
+    if there is no quota.
+    '''
+    line = _read_first_line(os.path.join(cgroup_dir or _cgroup_dir(), 'cpu.max'))
+    if not line:
+        return None
+    fields = line.split()
+    if fields[0] == 'max':
+        return None
+    try:
+        quota = int(fields[0])
+        period = int(fields[1]) if len(fields) > 1 else 100000
+    except ValueError:
+        return None
+    return quota / period if period > 0 else None
+
+
+def cgroup_memory_limit_mb(cgroup_dir: Optional[str] = None) -> Optional[int]:
+    '''
+    Return the cgroup v2 'memory.max' limit in MB, or None if unlimited.
+    '''
+    line = _read_first_line(os.path.join(cgroup_dir or _cgroup_dir(), 'memory.max'))
+    if not line or line == 'max':
+        return None
+    try:
+        return int(line) // _MB
+    except ValueError:
+        return None
+
+
+def allowed_cpus(cgroup_dir: Optional[str] = None) -> List[int]:
+    '''
+    Return sorted list of CPUs this process may run on, using the affinity mask
+    if the platform supports it, else the cgroup cpuset.
+    '''
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    line = _read_first_line(os.path.join(cgroup_dir or _cgroup_dir(), 'cpuset.cpus.effective'))
+    cpus = []
+    if line:
+        for part in line.split(','):
+            first, _, last = part.partition('-')
+            cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus or list(range(multiprocessing.cpu_count()))
+
+
+def _pin_to_cpu(cpu: Optional[int]):
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+
+
+def _burn_until(end_time: float):
+    while time.monotonic() < end_time:
+        pass
+
+
+def cpu_worker(start: float, deadline: float, nr_steps: int, counter, cpu: Optional[int] = None):
+    '''
+    Keep one CPU busy until the deadline (monotonic clock), incrementing the
+    shared counter after every step. Defined at module level, so that it can
+    be used as target with the 'spawn' start method.
+    '''
+    # The parent handles SIGINT and terminates its workers; SIGTERM just ends
+    # the worker, instead of raising TerminateError in the inherited handler.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _pin_to_cpu(cpu)
+    for step in range(nr_steps):
+        _burn_until(start + (deadline - start) * (step + 1) / nr_steps)
+        with counter.get_lock():
+            counter.value += 1
+
 
 class WorkSimulator:
     '''
@@ -18,7 +121,7 @@ class WorkSimulator:
     stress.
     '''
     def __init__(self, logger, time, nr_cpu, memory_mb, disk_space_mb,
-                 nr_progress_log_messages, tmp_dir=''):
+                 nr_progress_log_messages, tmp_dir='', pin_cpus=False, cgroup_dir=None):
         self._logger = logger
         self._time = time
         self._nr_cpu = int(nr_cpu)
@@ -27,6 +130,9 @@ class WorkSimulator:
         self._nr_progress_log_messages = nr_progress_log_messages
         self._tmp_dir = tmp_dir
         self._temp_file_name = None
+        self._pin_cpus = pin_cpus
+        self._cgroup_dir = cgroup_dir or _cgroup_dir()
+        self._cpus: List[int] = []
 
     @property
     def temp_file_name(self):
@@ -66,33 +172,74 @@ class WorkSimulator:
     def _free_memory(self):
         self.memory_block = None
 
+    def _check_limits(self):
+        # Compare requested resources with what the container can deliver.
+        self._cpus = allowed_cpus(self._cgroup_dir)
+        cpu_limit = cgroup_cpu_limit(self._cgroup_dir)
+        available = len(self._cpus)
+        if cpu_limit is not None:
+            available = min(available, max(int(cpu_limit), 1))
+            self._logger.debug('cgroup CPU quota is {:.2f} CPUs'.format(cpu_limit))
+        if self._nr_cpu > available:
+            self._logger.warning('Scenario requests {} CPUs, but only {} available (CPUs {})'.format(
+                self._nr_cpu, available, ','.join(str(cpu) for cpu in self._cpus)))
+        memory_limit = cgroup_memory_limit_mb(self._cgroup_dir)
+        if memory_limit is not None and self._memory_mb > memory_limit:
+            self._logger.warning('Scenario requests {} MB of RAM, but cgroup limit is {} MB'.format(
+                self._memory_mb, memory_limit))
+
+    def _worker_cpu(self, worker_nr) -> Optional[int]:
+        # Return a distinct allowed CPU for this worker, if pinning is requested.
+        if self._pin_cpus and self._cpus:
+            return self._cpus[worker_nr % len(self._cpus)]
+        return None
+
     def _eat_cpu_cycles(self):
+        if self._time <= 0:
+            return
+        self._logger.debug('Start processing on {} cores'.format(self._nr_cpu))
+        nr_steps = max(self._nr_progress_log_messages, 1)
+        nr_workers = max(self._nr_cpu, 1)
 
-        def do_work(step, nr_log_messages):
-            for progress in range(0, 100, step):
-                if nr_log_messages > 0:
-                    self._logger.progress('Working, progress {}%'.format(progress))
-                now = time.time()
-                while now + self._time / nr_steps > time.time():
-                    x = 2
-                    # for n in range(25):
-                    #     x = x * x
-
-        if self._time > 0:
-            self._logger.debug('Start processing on {} cores'.format(self._nr_cpu))
-            nr_steps = max(self._nr_progress_log_messages, 1)
-            step = int(100 / nr_steps)
-            procs = []
-            for n in range(self._nr_cpu - 1):
-                proc = multiprocessing.Process(target=do_work, args=(step, 0))
-                procs.append(proc)
+        # All workers share one deadline on the (system wide) monotonic clock
+        # and report completed steps to a shared counter.
+        context = multiprocessing.get_context('spawn')
+        counter = context.Value('i', 0)
+        start = time.monotonic()
+        deadline = start + self._time
+        procs = []
+        affinity = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else None
+        try:
+            for n in range(1, nr_workers):
+                proc = context.Process(target=cpu_worker,
+                                       args=(start, deadline, nr_steps, counter, self._worker_cpu(n)))
                 proc.start()
-            do_work(step, self._nr_progress_log_messages)
+                procs.append(proc)
+
+            # The main process is a worker as well, and reports the aggregate progress.
+            _pin_to_cpu(self._worker_cpu(0))
+            for step in range(nr_steps):
+                if self._nr_progress_log_messages > 0:
+                    progress = 100 * counter.value // (nr_steps * nr_workers)
+                    self._logger.progress('Working, progress {}%'.format(progress))
+                _burn_until(start + (deadline - start) * (step + 1) / nr_steps)
+                with counter.get_lock():
+                    counter.value += 1
             for proc in procs:
                 proc.join()
+        finally:
+            # Also reached on TerminateError: do not leave orphaned workers.
+            for proc in procs:
+                if proc.is_alive():
+                    proc.terminate()
+            for proc in procs:
+                proc.join()
+            if self._pin_cpus and affinity is not None:
+                os.sched_setaffinity(0, affinity)
 
     def start(self):
         '''Blocks until done'''
+        self._check_limits()
         self._create_temp_file()
         self._allocate_memory()
         self._eat_cpu_cycles()
@@ -109,6 +256,9 @@ if __name__ == '__main__':
         def progress(self, *args, **kwargs):
             print(*args, **kwargs)
 
+        def warning(self, *args, **kwargs):
+            print(*args, **kwargs)
+
         def error(self, *args, **kwargs):
             print(*args, **kwargs)
 
@@ -0,0 +1,108 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Precompiled XML document templates.
+
+A template is an ElementTree document, serialized once with placeholders for
+the variable fields. Rendering only escapes the field values and joins them
+with the fixed parts, so the output is identical to serializing the document
+with ElementTree, at a fraction of the cost.
+'''
+import io
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.etree import ElementTree as et
+from xml.sax.saxutils import escape
+
+from procsim.core import utils
+
+_PLACEHOLDER = '\x00{}\x00'
+_PLACEHOLDER_RE = re.compile('\x00([^\x00]*)\x00')
+
+# Escape values as ElementTree.write() does, to get exactly the same output.
+# Besides '&', '<' and '>', attribute values have quotes and whitespace
+# other than spaces escaped.
+_ATTRIB_ENTITIES = {'"': '&quot;', '\r': '&#13;', '\n': '&#10;', '\t': '&#09;'}
+
+
+def _escape_text(text: str) -> str:
+    return escape(text)
+
+
+def _escape_attrib(text: str) -> str:
+    return escape(text, _ATTRIB_ENTITIES)
+
+
+def serialize(root: et.Element) -> bytes:
+    '''Indent the document and serialize it as an UTF-8 XML file.'''
+    utils.indent_xml(root)
+    buffer = io.BytesIO()
+    et.ElementTree(root).write(buffer, xml_declaration=True, encoding='utf-8')
+    return buffer.getvalue()
+
+
+def write_file(file, data: bytes) -> None:
+    '''Write data to file, a path or a binary file object.'''
+    if hasattr(file, 'write'):
+        file.write(data)
+    else:
+        with open(file, 'wb') as f:
+            f.write(data)
+
+
+class XmlTemplate:
+    '''
+    Serialized document with slots for the variable fields. A slot is either
+    (a part of) an element text or an attribute value.
+    '''
+    def __init__(self, document: str):
+        self._parts: List[str] = []
+        self._slots: List[Tuple[int, str, Callable[[str], str]]] = []
+        in_tag = False
+        pieces = _PLACEHOLDER_RE.split(document)
+        for i, piece in enumerate(pieces):
+            if i % 2 == 0:
+                self._parts.append(piece)
+                # Escaped text and attribute values contain no '<' or '>'.
+                if piece.rfind('<') > piece.rfind('>'):
+                    in_tag = True
+                elif piece.rfind('>') > piece.rfind('<'):
+                    in_tag = False
+            else:
+                self._slots.append((len(self._parts), piece, _escape_attrib if in_tag else _escape_text))
+                self._parts.append('')
+
+    def render(self, values: Dict[str, Optional[str]]) -> str:
+        parts = self._parts.copy()
+        for index, name, escape in self._slots:
+            parts[index] = escape(values[name])
+        return ''.join(parts)
+
+
+class TemplateCache:
+    '''
+    This class is responsible for compiling and caching templates.
+
+    The builder creates the document from a dictionary of field values. The
+    structure of the document may only depend on the key, on the names of the
+    fields and on which fields are None or empty strings. Templates are cached
+    on these, None and empty fields are part of the template and all other
+    fields are slots.
+    '''
+    def __init__(self):
+        self._templates: Dict[tuple, XmlTemplate] = {}
+
+    def get(self, key, values: Dict[str, Optional[str]],
+            builder: Callable[[Dict[str, Optional[str]]], et.Element]) -> XmlTemplate:
+        full_key = (key, tuple(values), tuple(None if value is None else not value for value in values.values()))
+        template = self._templates.get(full_key)
+        if template is None:
+            placeholders = {name: value if not value else _PLACEHOLDER.format(name) for name, value in values.items()}
+            template = XmlTemplate(serialize(builder(placeholders)).decode('utf-8'))
+            self._templates[full_key] = template
+        return template
+
+    def render(self, key, values: Dict[str, Optional[str]],
+               builder: Callable[[Dict[str, Optional[str]]], et.Element]) -> bytes:
+        '''Return the document as UTF-8 encoded XML file contents.'''
+        return self.get(key, values, builder).render(values).encode('utf-8')
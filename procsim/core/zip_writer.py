@@ -0,0 +1,101 @@
+'''
+Copyright (C) 2021 S[&]T, The Netherlands.
+
+Write product directories directly into a zip archive.
+'''
+import os
+import shutil
+import zipfile
+from typing import Optional, Set
+
+from procsim.core import utils
+from procsim.core.exceptions import ScenarioError
+
+# Compression policies:
+# - store: no compression (default, the payload of generated products is random data)
+# - deflate: compress all members
+# - deflate_text: only compress text members, such as XML files and schemas
+COMPRESSION_POLICIES = ['store', 'deflate', 'deflate_text']
+
+TEXT_EXTENSIONS = ['.xml', '.xsd', '.txt', '.json', '.kml', '.html']
+
+
+class ZipArchiveWriter:
+    '''
+    This class is responsible for writing the files of a product directory
+    directly into a zip archive, without staging them on disk first.
+
+    The archive has the same layout as when zipping the directory with
+    shutil.make_archive: all members are prefixed with the directory name,
+    unless include_dir_name is False.
+    '''
+    def __init__(self, archive_path: str, product_dir: str, compression: str = 'store', include_dir_name: bool = True):
+        if compression not in COMPRESSION_POLICIES:
+            raise ScenarioError('Zip compression {} not supported, use one of {}'.format(compression, COMPRESSION_POLICIES))
+        self.archive_path = archive_path
+        self._product_dir = os.path.abspath(product_dir)
+        self._root_dir = os.path.dirname(self._product_dir) if include_dir_name else self._product_dir
+        self._compression = compression
+        self._date_time = utils.get_current_utc_datetime().timetuple()[:6]
+        os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+        self._zip = zipfile.ZipFile(archive_path, 'w', allowZip64=True)
+        self._dirs: Set[str] = set()
+        if include_dir_name:
+            self._add_dir(os.path.basename(self._product_dir))
+
+    def _add_dir(self, arc_dir: str):
+        if arc_dir in self._dirs or arc_dir in ('', '.'):
+            return
+        self._add_dir(os.path.dirname(arc_dir))
+        self._dirs.add(arc_dir)
+        info = zipfile.ZipInfo(arc_dir + '/', self._date_time)
+        info.external_attr = 0o40775 << 16 | 0x10     # drwxrwxr-x, MS-DOS directory flag
+        self._zip.writestr(info, b'')
+
+    def _compress_type(self, path: str) -> int:
+        if self._compression == 'deflate' or \
+                (self._compression == 'deflate_text' and os.path.splitext(path)[1].lower() in TEXT_EXTENSIONS):
+            return zipfile.ZIP_DEFLATED
+        return zipfile.ZIP_STORED
+
+    def _arc_name(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self._root_dir).replace(os.sep, '/')
+
+    def contains(self, path: str) -> bool:
+        '''Return True if path is located in the product directory.'''
+        return os.path.abspath(path).startswith(self._product_dir + os.sep)
+
+    def open(self, path: str, size: Optional[int] = None):
+        '''
+        Return a writable stream for the member at path. The (expected) size
+        is needed to decide whether the Zip64 extensions must be used.
+        '''
+        arc_name = self._arc_name(path)
+        self._add_dir(os.path.dirname(arc_name))
+        info = zipfile.ZipInfo(arc_name, self._date_time)
+        info.compress_type = self._compress_type(path)
+        info.external_attr = 0o100664 << 16     # -rw-rw-r--
+        force_zip64 = size is not None and size >= zipfile.ZIP64_LIMIT
+        return self._zip.open(info, 'w', force_zip64=force_zip64)
+
+    def write(self, path: str):
+        '''Copy an existing file into the archive.'''
+        with open(path, 'rb') as src, self.open(path, os.path.getsize(path)) as dst:
+            shutil.copyfileobj(src, dst, 2**20)
+
+    def close(self):
+        self._zip.close()
+
+
+def zip_directory(dir_name: str, archive_path: str, compression: str = 'store') -> None:
+    '''
+    Zip an existing directory, using the compression policy.
+    '''
+    archive = ZipArchiveWriter(archive_path, dir_name, compression)
+    for root, dirs, files in os.walk(dir_name):
+        dirs.sort()
+        for dir in dirs:
+            archive._add_dir(archive._arc_name(os.path.join(root, dir)))
+        for file in sorted(files):
+            archive.write(os.path.join(root, file))
+    archive.close()
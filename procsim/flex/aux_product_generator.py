@@ -177,7 +177,10 @@ class Aux(product_generator.ProductGeneratorBase):
         # Create root directory and header
         self._logger.info(f'Create {dir_name}')
         dir_name = os.path.join(self._output_path, dir_name)
-        os.makedirs(dir_name, exist_ok=True)
+        if self._zip_output:
+            self._start_zip_archive(dir_name)
+        else:
+            os.makedirs(dir_name, exist_ok=True)
 
         # Create aux files
         self._generate_default_file_list()
@@ -187,7 +190,4 @@ class Aux(product_generator.ProductGeneratorBase):
             self._add_file_to_product(file.get_full_path(name_gen, dir_name), self._size_mb // len(self._generated_files), representation_path)
 
         file_name = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_name)
-
-        if self._zip_output:
-            self.zip_folder(dir_name, self._zip_extension)
+        self._write_mph(file_name)
@@ -4,7 +4,6 @@ Copyright (C) 2021-2023 S[&]T, The Netherlands.
 Flex Level 0 product generators,
 format according to ESA-EOPG-EOEP-TN-0022
 '''
-import bisect
 import collections
 import datetime
 import os
@@ -13,8 +12,9 @@ from typing import Iterable, List, Tuple, Optional
 from . import constants
 from procsim.core.exceptions import ScenarioError
 from procsim.core.job_order import JobOrderInput
+from procsim.core.slice_grid import SliceGrid
 
-from . import main_product_header, product_generator, product_name
+from . import main_product_header, product_generator
 
 _HDR_PARAMS: List[tuple] = [
     ('cycle_number', 'cycle_number', 'str'),
@@ -49,14 +49,10 @@ class ProductGeneratorL0(product_generator.ProductGeneratorBase):
             if input.file_type in self.INPUTS:
                 for file in input.file_names:
                     # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
+                    if not self._is_input_product(file):
                         continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
                     hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
+                    mph_file_name = self._parse_input_mph(file, hdr, ('begin_position', 'end_position', self.ID_FIELD))
                     if hdr.begin_position is None or hdr.end_position is None:
                         raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
                     data_take_id = getattr(hdr, self.ID_FIELD)
@@ -195,49 +191,22 @@ class EO(ProductGeneratorL0):
         # Create directory and files
         self._logger.info('Create {}'.format(dir_name))
         dir_name = os.path.join(self._output_path, dir_name)
-        os.makedirs(dir_name, exist_ok=True)
+        if self._zip_output:
+            self._start_zip_archive(dir_name)
+        else:
+            os.makedirs(dir_name, exist_ok=True)
 
         for sensor in ('lres', 'hre1', 'hre2'):
             file_path = os.path.join(dir_name, name_gen.generate_binary_file_name('_'+sensor))
             self._add_file_to_product(file_path, self._size_mb // 2)
 
         file_path = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_path)
-
-        if self._zip_output:
-            self.zip_folder(dir_name, self._zip_extension)
+        self._write_mph(file_path)
 
     def _get_slice_edges(self, segment_start: datetime.datetime, segment_end: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
-        # If insufficient ANX are specified, infer the others.
-        anx_list = self._anx_list.copy()
-        while segment_start < anx_list[0]:
-            anx_list.insert(0, anx_list[0] - self._orbital_period)
-        while segment_end > anx_list[-1]:
-            anx_list.append(anx_list[-1] + self._orbital_period)
-
-        # Find ANX list that covers the segment duration.
-        anx_idx_start = bisect.bisect_right(anx_list, segment_start) - 1
-        anx_idx_end = bisect.bisect_left(anx_list, segment_end) + 1
-
-        # Determine the slices that make up the space between ANX.
-        slice_edges = []
-        slices_per_orbit = int(round(self._orbital_period / self._slice_grid_spacing))
-        for anx in anx_list[anx_idx_start:anx_idx_end - 1]:
-            new_slice_edges = [(anx + i * self._slice_grid_spacing, anx + (i + 1) * self._slice_grid_spacing) for i in range(slices_per_orbit)]
-            slice_edges.extend(new_slice_edges)
-
-        # Only keep the slices that overlap the segment.
-        slice_edges = [slice for slice in slice_edges if slice[1] >= segment_start and slice[0] <= segment_end]
-
-        # Merge the first and last slice with their neighbour if they are going to be too short.
-        if slice_edges[0][1] - segment_start < self._slice_minimum_duration:
-            slice_edges[1] = (slice_edges[0][0], slice_edges[1][1])
-            del slice_edges[0]
-        if segment_end - slice_edges[-1][0] < self._slice_minimum_duration:
-            slice_edges[-2] = (slice_edges[-2][0], slice_edges[-1][1])
-            del slice_edges[-1]
-
-        return slice_edges
+        # ANX before the first and after the last known ANX are inferred.
+        grid = SliceGrid(self._anx_list, self._orbital_period, self._slice_grid_spacing)
+        return grid.slice_edges(segment_start, segment_end, self._slice_minimum_duration)
 
     def _generate_sliced_output(self, data_take_config: dict, segment_start: datetime.datetime, segment_end: datetime.datetime) -> None:
         if segment_start is None or segment_end is None:
@@ -248,13 +217,7 @@ class EO(ProductGeneratorL0):
 
         slice_edges = self._get_slice_edges(segment_start, segment_end)
 
-        for slice_start, slice_end in slice_edges:
-            # Get the ANX and slice number from the middle of the slice to treat merged slices accurately.
-            slice_middle = slice_start + (slice_end - slice_start) / 2
-            anx, orbitnum = self._get_anx_orbit(slice_middle)
-            slice_nr = self._get_slice_frame_nr(slice_middle, self._slice_grid_spacing)
-            if anx is None or slice_nr is None:
-                continue
+        for slice_start, slice_end, anx, slice_nr in self._get_slice_positions(slice_edges, self._slice_grid_spacing):
             validity_start = slice_start - self._slice_overlap_start
             validity_end = slice_end + self._slice_overlap_end
             acq_start = max(validity_start, segment_start)
@@ -436,17 +399,17 @@ class CAL(ProductGeneratorL0):
         # Create directory and files
         self._logger.info('Create {}'.format(dir_name))
         dir_name = os.path.join(self._output_path, dir_name)
-        os.makedirs(dir_name, exist_ok=True)
+        if self._zip_output:
+            self._start_zip_archive(dir_name)
+        else:
+            os.makedirs(dir_name, exist_ok=True)
 
         for sensor in ('lres', 'hre1', 'hre2'):
             file_path = os.path.join(dir_name, name_gen.generate_binary_file_name('_'+sensor))
             self._add_file_to_product(file_path, self._size_mb // 2)
 
         file_path = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_path)
-
-        if self._zip_output:
-            self.zip_folder(dir_name, self._zip_extension)
+        self._write_mph(file_path)
 
 
 class ANC(ProductGeneratorL0):
@@ -576,7 +539,10 @@ class ANC(ProductGeneratorL0):
         # Create directory and files
         self._logger.info('Create {}'.format(dir_name))
         dir_name = os.path.join(self._output_path, dir_name)
-        os.makedirs(dir_name, exist_ok=True)
+        if self._zip_output:
+            self._start_zip_archive(dir_name)
+        else:
+            os.makedirs(dir_name, exist_ok=True)
 
         if self._output_type in ('L0__VAU_TM', 'L0__TST___', 'L0__WRN___'):
             for sensor in ('lres', 'hre1', 'hre2'):
@@ -587,10 +553,7 @@ class ANC(ProductGeneratorL0):
             self._add_file_to_product(file_path, self._size_mb // 2)
 
         file_path = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_path)
-
-        if self._zip_output:
-            self.zip_folder(dir_name, self._zip_extension)
+        self._write_mph(file_path)
 
 
 class ANC_INSTTM(ANC):
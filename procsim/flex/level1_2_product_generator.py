@@ -14,7 +14,7 @@ from . import constants
 from procsim.core.exceptions import ScenarioError
 from procsim.core.job_order import JobOrderInput
 
-from . import main_product_header, product_generator, product_name
+from . import main_product_header, product_generator
 
 _HDR_PARAMS = [
     ('cycle_number', 'cycle_number', 'str'),
@@ -87,14 +87,10 @@ class EO(product_generator.ProductGeneratorBase):
             if input.file_type in mandatory_input_types:
                 for file in input.file_names:
                     # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
+                    if not self._is_input_product(file):
                         continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
                     hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
+                    mph_file_name = self._parse_input_mph(file, hdr, ('begin_position', 'end_position'))
                     if hdr.begin_position is None or hdr.end_position is None:
                         raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
                     start = hdr.begin_position
@@ -164,7 +160,7 @@ class EO(product_generator.ProductGeneratorBase):
             self._add_file_to_product(file_path, self._size_mb // 2)
 
         file_path = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_path)
+        self._write_mph(file_path)
 
 
 class CAL(product_generator.ProductGeneratorBase):
@@ -223,14 +219,10 @@ class CAL(product_generator.ProductGeneratorBase):
             if input.file_type[4:] == self._output_type[4:]:
                 for file in input.file_names:
                     # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
+                    if not self._is_input_product(file):
                         continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
                     hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
+                    mph_file_name = self._parse_input_mph(file, hdr, ('begin_position', 'end_position'))
                     if hdr.begin_position is None or hdr.end_position is None:
                         raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
                     start = hdr.begin_position
@@ -281,4 +273,4 @@ class CAL(product_generator.ProductGeneratorBase):
             self._add_file_to_product(file_path, self._size_mb // 2)
 
         file_path = os.path.join(dir_name, name_gen.generate_mph_file_name())
-        self._hdr.write(file_path)
+        self._write_mph(file_path)
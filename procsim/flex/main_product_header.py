@@ -12,10 +12,10 @@ TODO:
 '''
 
 import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 from xml.etree import ElementTree as et
 
-from procsim.core import utils
+from procsim.core import timestamps, utils, xml_template
 from procsim.core.exceptions import ParseError, ScenarioError
 
 from . import product_types
@@ -45,31 +45,28 @@ ows = "{%s}" % mph_namespaces['ows']
 xlink = "{%s}" % mph_namespaces['xlink']
 
 
-ISO_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
-ISO_TIME_FORMAT_SHORT = '%Y-%m-%dT%H:%M:%S'
+# Compiled MPH templates, per product type
+_templates = xml_template.TemplateCache()
 
 
 def _time_as_iso(tim: datetime.datetime) -> str:
-    s = tim.strftime(ISO_TIME_FORMAT)
-    return s[:-3] + 'Z'
+    return timestamps.to_iso_ms(tim)
 
 
 def _time_from_iso(timestr: Optional[str]) -> Optional[datetime.datetime]:
     if timestr is None:
         return None
-    timestr = timestr[:-1]  # strip 'Z'
-    return datetime.datetime.strptime(timestr, ISO_TIME_FORMAT).replace(tzinfo=datetime.timezone.utc)
+    return timestamps.from_iso(timestr)
 
 
 def _time_as_iso_short(tim: datetime.datetime) -> str:
-    return tim.strftime(ISO_TIME_FORMAT_SHORT) + 'Z'
+    return timestamps.to_iso_short(tim)
 
 
 def _time_from_iso_short(timestr: Optional[str]) -> Optional[datetime.datetime]:
     if timestr is None:
         return None
-    timestr = timestr[:-1]  # strip 'Z'
-    return datetime.datetime.strptime(timestr, ISO_TIME_FORMAT_SHORT).replace(tzinfo=datetime.timezone.utc)
+    return timestamps.from_iso_short(timestr)
 
 
 def _to_int(val: Optional[str]) -> Optional[int]:
@@ -260,16 +257,14 @@ class MainProductHeader:
         self.processor_name = name
         self.processor_version = version
 
-    def _insert_time_period(self, parent, start: datetime.datetime, stop: datetime.datetime, id):
+    def _insert_time_period(self, parent, start: Optional[str], stop: Optional[str], id: str):
         # Insert TimePeriod element
         time_period = et.SubElement(parent, gml + 'TimePeriod')
-        if self.eop_identifier is None:
-            raise ParseError(self.eop_identifier)
-        time_period.set(gml + 'id', self.eop_identifier + '_' + str(id))
+        time_period.set(gml + 'id', id)
         begin_position = et.SubElement(time_period, gml + 'beginPosition')
-        begin_position.text = _time_as_iso(start)    # Start date and time of the product
+        begin_position.text = start    # Start date and time of the product
         end_position = et.SubElement(time_period, gml + 'endPosition')
-        end_position.text = _time_as_iso(stop)       # Stop date and time of the product
+        end_position.text = stop       # Stop date and time of the product
 
     def _parse_time_period(self, parent, id):
         # Parse TimePeriod element, retrieve start/stop
@@ -295,73 +290,170 @@ class MainProductHeader:
         # et.SubElement(service_reference, ows + 'RequestMessage')  # download request (empty)
         return file_name
 
-    def append_file(self, product_path: str, size_mb: Optional[int] = None, representation_path: Optional[str] = None) -> None:
-        self.products.append({
+    def append_file(self, product_path: str, size_mb: Optional[int] = None, representation_path: Optional[str] = None,
+                    checksums: Optional[Dict[str, str]] = None) -> None:
+        product = {
             'file_name': product_path,
             'size': None if size_mb is None else size_mb * 2**20,
-        })
-
-    def write(self, file_name):
-        # Create MPH and write to file (TODO: split in generate and write methods?)
+        }
+        if checksums:
+            product['checksums'] = checksums    # Algorithm -> hex digest
+        self.products.append(product)
+
+    def _write_values(self, checksums: bool = False) -> Dict[str, Optional[str]]:
+        # Check that all mandatory parameters are set, and return the text
+        # of all variable fields of the MPH. The checksums of the files are
+        # only included if requested.
         if self._product_type_info is None:
             raise ParseError(self._product_type_info)
         level = self._product_type_info.level
-
-        mph = et.Element(opt + 'EarthObservation')
         if self.eop_identifier is None:
             raise ParseError(self.eop_identifier)
-        mph.set(gml + 'id', self.eop_identifier + '_1')
 
         # Some parameters have no default and MUST be set prior to generation
         if self.begin_position is None or self.end_position is None:
             raise ScenarioError('Begin/end position must be set before creating MPH')
         if not self.eop_identifier:
             raise ScenarioError('The eop_identifier (file name) must be set before creating MPH')
+        if level in ['raw']:
+            if self.acquisition_date is None:
+                raise ScenarioError('Acquisition time must be set prior to generating MPH')
+            if self.acquisition_station is None:
+                raise ScenarioError('Acquisition station must be set prior to generating MPH')
+        if self.processing_date is None or self.processor_name is None or \
+                self.processor_version is None or self._processing_level is None:
+            raise ScenarioError('Processing parameters must be set prior to generating MPH')
 
         # By convention, time_position is equal to end_position
         self.time_position = self.end_position
 
+        values: Dict[str, Optional[str]] = {
+            'eop_identifier': self.eop_identifier,
+            'begin_position': _time_as_iso(self.begin_position),
+            'end_position': _time_as_iso(self.end_position),
+            'time_position': _time_as_iso(self.time_position),
+            'platform_shortname': self._platform_shortname,
+            'sensor_name': self._sensor_name,
+            'sensor_type': self._sensor_type,
+            'sensor_mode': self.sensor_mode,
+        }
+        for i, acq in enumerate(self.acquisitions):
+            values.update({
+                'acq{}.orbit_number'.format(i): str(acq.orbit_number),
+                'acq{}.last_orbit_number'.format(i): str(acq.last_orbit_number),
+                'acq{}.orbit_direction'.format(i): acq.orbit_direction,
+            })
+        values.update({
+            'footprint_polygon': self.footprint_polygon,
+            'center_points': self.center_points,
+            'product_baseline': self.product_baseline,
+        })
+        for i, prod in enumerate(self.products):
+            values['product{}.file_name'.format(i)] = prod['file_name']
+            values['product{}.size'.format(i)] = None if prod.get('size') is None else str(prod['size'])
+            for j, (algorithm, checksum) in enumerate(prod.get('checksums', {}).items() if checksums else []):
+                values['product{}.algorithm{}'.format(i, j)] = algorithm
+                values['product{}.checksum{}'.format(i, j)] = checksum
+        values.update({
+            'creation_date': _time_as_iso(utils.get_current_utc_datetime()),
+            'doi': self.doi,
+            'acquisition_type': self.acquisition_type,
+            'acquisition_subtype': self.acquisition_subtype,
+            'product_type': self.product_type,
+            'product_status': self.product_status,
+            'product_status_subtype': self.product_status_subtype,
+            'downlink_station_code': self.downlink_station_code,
+            'acquisition_date': _time_as_iso(self.acquisition_date) if level in ['raw'] else None,
+            'archive_station_code': self.archive_station_code,
+            'processing_centre_code': self.processing_centre_code,
+            'processing_date': _time_as_iso(self.processing_date),
+            'processor_name': self.processor_name,
+            'processor_version': self.processor_version,
+            'processing_level': self._processing_level,
+        })
+        for i, name in enumerate(self.auxiliary_ds_file_names):
+            values['auxiliary_ds_file_name{}'.format(i)] = name
+        values['processing_mode'] = self.processing_mode
+
+        # Vendor specific metadata, omitted if None
+        vendor_specific = {
+            'mission_phase': self.mission_phase,
+            'duration': '%.3f' % (self.end_position - self.begin_position).total_seconds(),
+            'cycle_number': self.cycle_number,
+            'relative_orbit_number': self.relative_orbit_number,
+            'data_take_id': self.data_take_id,
+            'special_calibration': self.special_calibration,
+            'calibration_id': self.calibration_id,
+            'slice_frame_nr': self.slice_frame_nr,
+            'along_track_coordinate': self.along_track_coordinate,
+            'anx_elapsed': None if self.anx_elapsed is None else '%.3f' % self.anx_elapsed,
+            'nr_instrument_source_packets': self.nr_instrument_source_packets,
+            'nr_instrument_source_packets_erroneous': self.nr_instrument_source_packets_erroneous,
+            'nr_instrument_source_packets_corrupt': self.nr_instrument_source_packets_corrupt,
+            'nr_transfer_frames': self.nr_transfer_frames,
+            'nr_transfer_frames_erroneous': self.nr_transfer_frames_erroneous,
+            'nr_transfer_frames_corrupt': self.nr_transfer_frames_corrupt,
+            'apid': self.apid,
+            'completeness_assesment': self.completeness_assesment,
+            'sensor_detector': self.sensor_detector,
+            'slice_start_position': self.slice_start_position,
+            'slice_stop_position': self.slice_stop_position,
+        }
+        for name, value in vendor_specific.items():
+            values[name] = None if value is None else str(value)
+        return values
+
+    def _create_element_tree(self, values: Dict[str, Optional[str]]) -> et.Element:
+        # Create the MPH element tree from the field values. The structure
+        # depends only on the product type, the lengths of the lists and on
+        # which values are empty (see _write_values and xml_template).
+        assert self._product_type_info is not None
+        level = self._product_type_info.level
+        id = values['eop_identifier']
+
+        mph = et.Element(opt + 'EarthObservation')
+        mph.set(gml + 'id', id + '_1')
+
         phenomenon_time = et.SubElement(mph, om + 'phenomenonTime')
-        self._insert_time_period(phenomenon_time, self.begin_position, self.end_position, 2)
+        self._insert_time_period(phenomenon_time, values['begin_position'], values['end_position'], id + '_2')
 
         result_time = et.SubElement(mph, om + 'resultTime')
         time_instant = et.SubElement(result_time, gml + 'TimeInstant')
-        time_instant.set(gml + 'id', self.eop_identifier + '_3')
+        time_instant.set(gml + 'id', id + '_3')
         time_position = et.SubElement(time_instant, gml + 'timePosition')
-        time_position.text = _time_as_iso(self.time_position)
+        time_position.text = values['time_position']
 
         procedure = et.SubElement(mph, om + 'procedure')  # Procedure used to sense the data
         earth_observation_equipment = et.SubElement(procedure, eop + 'EarthObservationEquipment')  # Equipment used to sense the data
-        earth_observation_equipment.set(gml + 'id', self.eop_identifier + '_4')
+        earth_observation_equipment.set(gml + 'id', id + '_4')
         platform = et.SubElement(earth_observation_equipment, eop + 'platform')  # Platform description
         Platform = et.SubElement(platform, eop + 'Platform')  # Nested element for platform description
         short_name = et.SubElement(Platform, eop + 'shortName')
-        short_name.text = self._platform_shortname
+        short_name.text = values['platform_shortname']
 
         instrument = et.SubElement(earth_observation_equipment, eop + 'instrument')  # Instrument description
         Instrument = et.SubElement(instrument, eop + 'Instrument')  # Nested element for instrument description
         short_name = et.SubElement(Instrument, eop + 'shortName')
-        short_name.text = self._sensor_name
+        short_name.text = values['sensor_name']
 
         # Mandatory for L0, L1, L2A products
-        sensors = [{'type': self._sensor_type, 'mode': self.sensor_mode}]
         if level in ['raws', 'l0', 'l1', 'l2']:
             sensor = et.SubElement(earth_observation_equipment, eop + 'sensor')  # Sensor description
             Sensor = et.SubElement(sensor, eop + 'Sensor')  # Nested element for sensor description
-            for s in sensors:
-                sensor_type = et.SubElement(Sensor, eop + 'sensorType')
-                sensor_type.text = s['type']
-                sensor_mode = et.SubElement(Sensor, eop + 'operationalMode')
-                sensor_mode.set('codeSpace', 'urn:esa:eop:FLORIS:operationalMode')
-                sensor_mode.text = s['mode']
+            sensor_type = et.SubElement(Sensor, eop + 'sensorType')
+            sensor_type.text = values['sensor_type']
+            sensor_mode = et.SubElement(Sensor, eop + 'operationalMode')
+            sensor_mode.set('codeSpace', 'urn:esa:eop:FLORIS:operationalMode')
+            sensor_mode.text = values['sensor_mode']
 
         if level in ['raws', 'l0', 'l1', 'l2']:
             acquisition_params = et.SubElement(earth_observation_equipment, eop + 'acquisitionParameters')
             acquisition = et.SubElement(acquisition_params, eop + 'Acquisition')
-            for acq in self.acquisitions:
-                et.SubElement(acquisition, eop + 'orbitNumber').text = str(acq.orbit_number)
-                et.SubElement(acquisition, eop + 'lastOrbitNumber').text = str(acq.last_orbit_number)
-                et.SubElement(acquisition, eop + 'orbitDirection').text = acq.orbit_direction
+            for i in range(len(self.acquisitions)):
+                acq = 'acq{}.'.format(i)
+                et.SubElement(acquisition, eop + 'orbitNumber').text = values[acq + 'orbit_number']
+                et.SubElement(acquisition, eop + 'lastOrbitNumber').text = values[acq + 'last_orbit_number']
+                et.SubElement(acquisition, eop + 'orbitDirection').text = values[acq + 'orbit_direction']
                 et.SubElement(acquisition, eop + 'illuminationAzimuthAngle', attrib={'uom': 'deg'}).text = '10.2'
                 et.SubElement(acquisition, eop + 'acrossTrackIncidenceAngle', attrib={'uom': 'deg'}).text = '-14.0'
                 et.SubElement(acquisition, eop + 'alongTrackIncidenceAngle', attrib={'uom': 'deg'}).text = '-13.9'
@@ -376,17 +468,17 @@ class MainProductHeader:
         feature_of_interest = et.SubElement(mph, om + 'featureOfInterest')  # Observed area
         if level in ['l0', 'l1', 'l2']:
             footprint = et.SubElement(feature_of_interest, eop + 'Footprint')
-            footprint.set(gml + 'id', self.eop_identifier + '_5')
+            footprint.set(gml + 'id', id + '_5')
             multi_extent_of = et.SubElement(footprint, eop + 'multiExtentOf')  # Footprint representation structure, coordinates in posList
             multi_surface = et.SubElement(multi_extent_of, gml + 'MultiSurface')
-            multi_surface.set(gml + 'id', self.eop_identifier + '_6')
+            multi_surface.set(gml + 'id', id + '_6')
             surface_member = et.SubElement(multi_surface, gml + 'surfaceMember')
             polygon = et.SubElement(surface_member, gml + 'Polygon')
-            polygon.set(gml + 'id', self.eop_identifier + '_7')
+            polygon.set(gml + 'id', id + '_7')
             exterior = et.SubElement(polygon, gml + 'exterior')
             linear_ring = et.SubElement(exterior, gml + 'LinearRing')
             pos_list = et.SubElement(linear_ring, gml + 'posList')  # Footprint points
-            pos_list.text = self.footprint_polygon
+            pos_list.text = values['footprint_polygon']
             #
             # TODO! This is a discrepancy between spec and example!!
             #
@@ -394,60 +486,61 @@ class MainProductHeader:
             center_of = et.SubElement(footprint, eop + 'centerOf')  # Acquisition centre representation structure
 
             point = et.SubElement(center_of, gml + 'Point')
-            point.set(gml + 'id', self.eop_identifier + '_8')
+            point.set(gml + 'id', id + '_8')
             pos = et.SubElement(point, gml + 'pos')  # Coordinates of the centre of the acquisition
-            pos.text = self.center_points
+            pos.text = values['center_points']
 
         result = et.SubElement(mph, om + 'result')  # Observation result
         earth_observation_result = et.SubElement(result, eop + 'EarthObservationResult')
-        earth_observation_result.set(gml + 'id', self.eop_identifier + '_9')
+        earth_observation_result.set(gml + 'id', id + '_9')
 
-        for prod in self.products:
+        for i, prod in enumerate(self.products):
             product = et.SubElement(earth_observation_result, eop + 'product')
             product_information = et.SubElement(product, eop + 'ProductInformation')
-            self._insert_file_name(product_information, prod['file_name'])
-            if prod.get('size') is not None:
-                et.SubElement(product_information, eop + 'size', attrib={'uom': 'bytes'}).text = str(prod['size'])
+            self._insert_file_name(product_information, values['product{}.file_name'.format(i)])
+            if values['product{}.size'.format(i)] is not None:
+                et.SubElement(product_information, eop + 'size', attrib={'uom': 'bytes'}).text = values['product{}.size'.format(i)]
+                j = 0
+                while 'product{}.checksum{}'.format(i, j) in values:
+                    algorithm = values['product{}.algorithm{}'.format(i, j)]
+                    et.SubElement(product_information, eop + 'checksum',
+                                  attrib={'algorithm': algorithm}).text = values['product{}.checksum{}'.format(i, j)]
+                    j += 1
             else:
-                et.SubElement(product_information, eop + 'version').text = self.product_baseline
+                et.SubElement(product_information, eop + 'version').text = values['product_baseline']
                 et.SubElement(product_information, eop + 'timeliness').text = 'NOMINAL'  # TODO CALIBRATION?
 
         meta_data_property = et.SubElement(mph, eop + 'metaDataProperty')  # Observation metadata
         earth_observation_meta_data = et.SubElement(meta_data_property, eop + 'EarthObservationMetaData')
-        et.SubElement(earth_observation_meta_data, eop + 'identifier').text = self.eop_identifier
-        et.SubElement(earth_observation_meta_data, eop + 'creationDate').text = _time_as_iso(utils.get_current_utc_datetime())
-        et.SubElement(earth_observation_meta_data, eop + 'doi').text = self.doi  # Digital Object Identifier
-        et.SubElement(earth_observation_meta_data, eop + 'acquisitionType').text = self.acquisition_type
-        if self.acquisition_subtype is not None:
+        et.SubElement(earth_observation_meta_data, eop + 'identifier').text = id
+        et.SubElement(earth_observation_meta_data, eop + 'creationDate').text = values['creation_date']
+        et.SubElement(earth_observation_meta_data, eop + 'doi').text = values['doi']  # Digital Object Identifier
+        et.SubElement(earth_observation_meta_data, eop + 'acquisitionType').text = values['acquisition_type']
+        if values['acquisition_subtype'] is not None:
             act = et.SubElement(earth_observation_meta_data, eop + 'acquisitionSubType')
-            act.text = self.acquisition_subtype
+            act.text = values['acquisition_subtype']
             act.set('codeSpace', 'urn:esa:eop:FLEX:acquisitionSubTypes')
 
         # TODO: Write product type here? Ref says: "Describes product type in case that mixed types
         # are available within a single collection, this is ground segment specific definition"
-        et.SubElement(earth_observation_meta_data, eop + 'productType').text = self.product_type
-        et.SubElement(earth_observation_meta_data, eop + 'status').text = self.product_status
-        et.SubElement(earth_observation_meta_data, eop + 'statusSubType').text = self.product_status_subtype
+        et.SubElement(earth_observation_meta_data, eop + 'productType').text = values['product_type']
+        et.SubElement(earth_observation_meta_data, eop + 'status').text = values['product_status']
+        et.SubElement(earth_observation_meta_data, eop + 'statusSubType').text = values['product_status_subtype']
 
         if level in ['raw']:
-            if self.acquisition_date is None:
-                raise ScenarioError('Acquisition time must be set prior to generating MPH')
-            if self.acquisition_station is None:
-                raise ScenarioError('Acquisition station must be set prior to generating MPH')
-
             downlinked_to = et.SubElement(earth_observation_meta_data, eop + 'downlinkedTo')
             downlink_info = et.SubElement(downlinked_to, eop + 'DownlinkInformation')
             acq_station = et.SubElement(downlink_info, eop + 'acquisitionStation')
-            acq_station.text = self.downlink_station_code
+            acq_station.text = values['downlink_station_code']
             acq_station.set('codeSpace', 'urn:esa:eop:FLEX:stationCode')
-            et.SubElement(downlink_info, eop + 'acquisitionDate').text = _time_as_iso(self.acquisition_date)
+            et.SubElement(downlink_info, eop + 'acquisitionDate').text = values['acquisition_date']
 
             archived_in = et.SubElement(earth_observation_meta_data, eop + 'archivedIn')
             archive_info = et.SubElement(archived_in, eop + 'ArchivingInformation')
             arch_center = et.SubElement(archive_info, eop + 'archivingCenter')
-            arch_center.text = self.archive_station_code
+            arch_center.text = values['archive_station_code']
             arch_center.set('codeSpace', 'urn:esa:eop:FLEX:stationCode')
-            et.SubElement(archive_info, eop + 'archivingDate').text = _time_as_iso(self.acquisition_date)
+            et.SubElement(archive_info, eop + 'archivingDate').text = values['acquisition_date']
 
         qc_degradation = et.SubElement(earth_observation_meta_data, eop + 'productQualityDegradation')
         qc_degradation.set('uom', '%')
@@ -466,15 +559,12 @@ class MainProductHeader:
         processing = et.SubElement(earth_observation_meta_data, eop + 'processing')  # Data processing information
         processing_info = et.SubElement(processing, eop + 'ProcessingInformation')
         proc_center = et.SubElement(processing_info, eop + 'processingCenter')
-        proc_center.text = self.processing_centre_code
+        proc_center.text = values['processing_centre_code']
         proc_center.set('codeSpace', 'urn:esa:eop:FLEX:facility')
-        if self.processing_date is None or self.processor_name is None or \
-                self.processor_version is None or self._processing_level is None:
-            raise ScenarioError('Processing parameters must be set prior to generating MPH')
-        et.SubElement(processing_info, eop + 'processingDate').text = _time_as_iso(self.processing_date)
-        et.SubElement(processing_info, eop + 'processorName').text = self.processor_name
-        et.SubElement(processing_info, eop + 'processorVersion').text = self.processor_version
-        et.SubElement(processing_info, eop + 'processingLevel').text = self._processing_level
+        et.SubElement(processing_info, eop + 'processingDate').text = values['processing_date']
+        et.SubElement(processing_info, eop + 'processorName').text = values['processor_name']
+        et.SubElement(processing_info, eop + 'processorVersion').text = values['processor_version']
+        et.SubElement(processing_info, eop + 'processingLevel').text = values['processing_level']
 
         format = 'dat'
         if level == 'aux':
@@ -486,74 +576,136 @@ class MainProductHeader:
         et.SubElement(processing_info, eop + 'nativeProductFormat').text = format
 
         if level not in ['aux']:
-            for name in self.auxiliary_ds_file_names:
-                et.SubElement(processing_info, eop + 'auxiliaryDataSetFileName').text = name
+            for i in range(len(self.auxiliary_ds_file_names)):
+                et.SubElement(processing_info, eop + 'auxiliaryDataSetFileName').text = values['auxiliary_ds_file_name{}'.format(i)]
 
         processingMode = et.SubElement(processing_info, eop + 'processingMode')
-        processingMode.text = self.processing_mode
+        processingMode.text = values['processing_mode']
         processingMode.set('codeSpace', 'urn:esa:eop:FLEX:processingMode')
 
         # add vendor-specific metadata
         def add_vendor_specific(attr, value):
             if value is not None:
-                value = str(value)
                 vendor_specific = et.SubElement(earth_observation_meta_data, eop + 'vendorSpecific')
                 specific_information = et.SubElement(vendor_specific, eop + 'SpecificInformation')
                 et.SubElement(specific_information, eop + 'localAttribute').text = attr
                 et.SubElement(specific_information, eop + 'localValue').text = value
 
-        add_vendor_specific('missionPhase', self.mission_phase)
+        add_vendor_specific('missionPhase', values['mission_phase'])
         add_vendor_specific('Ref_Doc', 'Product_Definition_Format_xx.yy')  # TODO fill in ref_doc, task_table stuff?
 
         if level != 'raw':
             add_vendor_specific('Task_Table_Name', 'Task Table Name')
             add_vendor_specific('Task_Table_Version', 'xx.yy')
 
-        add_vendor_specific('Duration', '%.3f' % (self.end_position - self.begin_position).total_seconds())
+        add_vendor_specific('Duration', values['duration'])
 
         if level != 'raw':
-            add_vendor_specific('Cycle_Number', self.cycle_number)
-            add_vendor_specific('Relative_Orbit_Number', self.relative_orbit_number)
-            add_vendor_specific('dataTakeID', self.data_take_id)
-            add_vendor_specific('specialCalibration_in_L1EO', self.special_calibration)
-
-            if self.calibration_id is not None:
-                add_vendor_specific('calibrationID', self.calibration_id)
-                add_vendor_specific('calibrationSpare', 0)  # must be unsigned int
-            add_vendor_specific('slicingGridFrameNumber', self.slice_frame_nr)
-            add_vendor_specific('alongtrackCoordinate', self.along_track_coordinate)
-            if self.anx_elapsed is not None:
-                add_vendor_specific('ANX_elapsed_time', '%.3f' % self.anx_elapsed)
-            add_vendor_specific('Baseline', self.product_baseline)
+            add_vendor_specific('Cycle_Number', values['cycle_number'])
+            add_vendor_specific('Relative_Orbit_Number', values['relative_orbit_number'])
+            add_vendor_specific('dataTakeID', values['data_take_id'])
+            add_vendor_specific('specialCalibration_in_L1EO', values['special_calibration'])
+
+            if values['calibration_id'] is not None:
+                add_vendor_specific('calibrationID', values['calibration_id'])
+                add_vendor_specific('calibrationSpare', '0')  # must be unsigned int
+            add_vendor_specific('slicingGridFrameNumber', values['slice_frame_nr'])
+            add_vendor_specific('alongtrackCoordinate', values['along_track_coordinate'])
+            add_vendor_specific('ANX_elapsed_time', values['anx_elapsed'])
+            add_vendor_specific('Baseline', values['product_baseline'])
 
         if level in ('raw', 'raws', 'l0'):
-            add_vendor_specific('numOfISPs', self.nr_instrument_source_packets)
-            add_vendor_specific('numOfISPsWithErrors', self.nr_instrument_source_packets_erroneous)
-            add_vendor_specific('numOfCorruptedISPs', self.nr_instrument_source_packets_corrupt)
-            add_vendor_specific('numOfTFs', self.nr_transfer_frames)
-            add_vendor_specific('numOfTFsWithErrors', self.nr_transfer_frames_erroneous)
-            add_vendor_specific('numOfCorruptedTFs', self.nr_transfer_frames_corrupt)
+            add_vendor_specific('numOfISPs', values['nr_instrument_source_packets'])
+            add_vendor_specific('numOfISPsWithErrors', values['nr_instrument_source_packets_erroneous'])
+            add_vendor_specific('numOfCorruptedISPs', values['nr_instrument_source_packets_corrupt'])
+            add_vendor_specific('numOfTFs', values['nr_transfer_frames'])
+            add_vendor_specific('numOfTFsWithErrors', values['nr_transfer_frames_erroneous'])
+            add_vendor_specific('numOfCorruptedTFs', values['nr_transfer_frames_corrupt'])
 
         if level == 'raws':
-            add_vendor_specific('apid', self.apid)
-            add_vendor_specific('completenessAssesment', self.completeness_assesment)
+            add_vendor_specific('apid', values['apid'])
+            add_vendor_specific('completenessAssesment', values['completeness_assesment'])
 
-        add_vendor_specific('sensorDetector', self.sensor_detector)
+        add_vendor_specific('sensorDetector', values['sensor_detector'])
 
         if level in ('raws', 'l0'):
-            add_vendor_specific('sliceStartPosition', self.slice_start_position)
-            add_vendor_specific('sliceStopPosition', self.slice_stop_position)
-
-        # Create XML
-        tree = et.ElementTree(mph)
-        utils.indent_xml(tree.getroot())
-        tree.write(file_name, xml_declaration=True, encoding='utf-8')
-
-    def parse(self, file_name):  # TODO update for changes in writer..
-        '''Open MPH file and parse contents. Does not check for ID's.'''
-        tree = et.parse(file_name)
-        root = tree.getroot()
-        phenomenon_time = root.find(om + 'phenomenonTime')
+            add_vendor_specific('sliceStartPosition', values['slice_start_position'])
+            add_vendor_specific('sliceStopPosition', values['slice_stop_position'])
+
+        return mph
+
+    def render(self, checksums: bool = False) -> bytes:
+        '''
+        Create MPH and return it as UTF-8 encoded XML file contents. The MPH
+        is rendered from a precompiled template, see xml_template. If
+        checksums is set, the checksums of the files are listed as
+        eop:checksum elements. These are not part of the MPH schema.
+        '''
+        values = self._write_values(checksums)
+        return _templates.render(self.product_type, values, self._create_element_tree)
+
+    def write(self, file_name, checksums: bool = False):
+        '''
+        Create MPH and write to file (a path or a binary file object), see
+        render().
+        '''
+        xml_template.write_file(file_name, self.render(checksums))
+
+    def write_element_tree(self, file_name, checksums: bool = False):
+        '''
+        Create MPH and write to file, by serializing the element tree.
+        Slower than write(), with identical output. Used as reference.
+        '''
+        values = self._write_values(checksums)
+        xml_template.write_file(file_name, xml_template.serialize(self._create_element_tree(values)))
+
+    # Parsers of the top level elements of the MPH, in document order, and
+    # the fields they set.
+    _SECTIONS = [
+        (om + 'phenomenonTime', '_parse_phenomenon_time', {'begin_position', 'end_position'}),
+        (om + 'resultTime', '_parse_result_time', {'time_position'}),
+        (om + 'procedure', '_parse_procedure', {'sensor_mode', 'acquisitions'}),
+        (om + 'featureOfInterest', '_parse_feature_of_interest', {'footprint_polygon', 'center_points'}),
+        (om + 'result', '_parse_result', {'browse_ref_id', 'browse_image_filename', 'products', 'product_baseline'}),
+        (eop + 'metaDataProperty', '_parse_meta_data_property', {
+            'eop_identifier', 'doi', 'acquisition_type', 'acquisition_subtype', 'product_type', 'product_status',
+            'acquisition_station', 'acquisition_date', 'processing_centre_code', 'processing_date', 'processor_name',
+            'processor_version', 'auxiliary_ds_file_names', 'nr_transfer_frames', 'nr_transfer_frames_erroneous',
+            'nr_transfer_frames_corrupt', 'nr_instrument_source_packets', 'nr_instrument_source_packets_erroneous',
+            'nr_instrument_source_packets_corrupt', 'reference_documents', 'mission_phase', 'cycle_number',
+            'relative_orbit_number', 'data_take_id', 'calibration_id', 'slice_frame_nr', 'along_track_coordinate',
+            'anx_elapsed', 'product_baseline', 'apid', 'sensor_detector', 'completeness_assesment',
+            'slice_start_position', 'slice_stop_position'}),
+    ]
+
+    def parse(self, file_name, fields: Optional[Iterable[str]] = None):
+        '''
+        Open MPH file (a path or a binary file object) and parse contents.
+        Does not check for ID's.
+
+        If fields is set, only the top level elements containing these
+        fields (MainProductHeader attribute names) are parsed. The file is
+        then streamed and reading stops once all fields are collected. The
+        values are the same as with a full parse.
+        '''
+        if fields is None:
+            root = et.parse(file_name).getroot()
+            for tag, parse_section, _ in self._SECTIONS:
+                getattr(self, parse_section)(root.find(tag))
+            return
+        sections = {}
+        for field in fields:
+            tags = [tag for tag, _, section_fields in self._SECTIONS if field in section_fields]
+            if not tags:
+                raise ValueError('Cannot parse MPH field {}'.format(field))
+            sections.update((tag, None) for tag in tags)
+        for element in utils.iter_top_level_elements(file_name, sections):
+            sections[element.tag] = element
+        for tag, parse_section, _ in self._SECTIONS:
+            if tag in sections:
+                getattr(self, parse_section)(sections[tag])
+
+    def _parse_phenomenon_time(self, phenomenon_time):
         begin_position, end_position = self._parse_time_period(phenomenon_time, 2)
         if begin_position is None:
             raise ParseError(begin_position)
@@ -561,7 +713,7 @@ class MainProductHeader:
             raise ParseError(end_position)
         self.begin_position, self.end_position = begin_position, end_position
 
-        result_time = root.find(om + 'resultTime')
+    def _parse_result_time(self, result_time):
         if result_time is None:
             raise ParseError(result_time)
         time_instant = result_time.find(gml + 'TimeInstant')
@@ -573,7 +725,8 @@ class MainProductHeader:
             raise ParseError(time_position)
         self.time_position = time_position
 
-        procedure = root.find(om + 'procedure')  # Procedure used to sense the data
+    def _parse_procedure(self, procedure):
+        # Procedure used to sense the data
         if procedure is None:
             raise ParseError(procedure)
         earth_observation_equipment = procedure.find(eop + 'EarthObservationEquipment')  # Equipment used to sense the data
@@ -628,10 +781,11 @@ class MainProductHeader:
                 acq.orbit_direction = acquisition.findtext(eop + 'orbitDirection') or acq.orbit_direction
                 self.acquisitions.append(acq)
 
+    def _parse_feature_of_interest(self, feature_of_interest):
+        # Observed area
         # observed_property = root.find(om + 'observedProperty')  # Observed property (Mandatory but empty)
         # observed_property.set(xsi + 'nil', 'true')
         # observed_property.set('nilReason', 'inapplicable')
-        feature_of_interest = root.find(om + 'featureOfInterest')  # Observed area
         if feature_of_interest is None:
             raise ParseError(feature_of_interest)
 
@@ -676,7 +830,8 @@ class MainProductHeader:
             # point.set(gml + 'id', self.eop_identifier + '_9')
             self.center_points = point.findtext(gml + 'pos')  # Coordinates of the centre of the acquisition
 
-        result = root.find(om + 'result')  # Observation result
+    def _parse_result(self, result):
+        # Observation result
         if result is None:
             raise ParseError(result)
         earth_observation_result = result.find(eop + 'EarthObservationResult')
@@ -711,9 +866,14 @@ class MainProductHeader:
                 self.products.append({'file_name': file_name})
             else:
                 size = int(product_information.findtext(eop + 'size', '0'))  # attrib={'uom': 'bytes'}
-                self.products.append({'file_name': file_name, 'size': size})
-
-        meta_data_property = root.find(eop + 'metaDataProperty')  # Observation metadata
+                product = {'file_name': file_name, 'size': size}
+                checksums = {el.get('algorithm'): el.text for el in product_information.findall(eop + 'checksum')}
+                if checksums:
+                    product['checksums'] = checksums
+                self.products.append(product)
+
+    def _parse_meta_data_property(self, meta_data_property):
+        # Observation metadata
         if meta_data_property is None:
             raise ParseError(meta_data_property)
         earth_observation_meta_data = meta_data_property.find(eop + 'EarthObservationMetaData')
@@ -10,7 +10,7 @@ import re
 from typing import Optional
 
 from procsim.core.exceptions import GeneratorError, ScenarioError
-from procsim.core import utils
+from procsim.core import timestamps, utils
 
 from . import constants, product_types
 
@@ -66,11 +66,9 @@ class ProductName:
     '''
     This class is responsible for creating and parsing directory/file names.
     '''
-    DATETIME_FORMAT = '%Y%m%dT%H%M%S'
-
     @classmethod
     def str_to_time(cls, s):
-        return datetime.datetime.strptime(s, cls.DATETIME_FORMAT).replace(tzinfo=datetime.timezone.utc) if s else None
+        return timestamps.from_compact(s) if s else None
 
     @classmethod
     def str_to_int(cls, s):
@@ -78,7 +76,7 @@ class ProductName:
 
     @classmethod
     def time_to_str(cls, t):
-        return t.strftime(cls.DATETIME_FORMAT)
+        return timestamps.to_compact(t)
 
     def __init__(self):
         # Common
@@ -3,16 +3,16 @@ Copyright (C) 2021-2023 S[&]T, The Netherlands.
 
 Flex raw output product generators, according to ESA-EOPG-EOEP-TN-0027
 '''
-import bisect
-import collections
 import datetime
 import os
-from typing import List, Optional, Tuple, Iterable
+from typing import Any, Callable, List, Optional, Tuple, Iterable
 
 from procsim.core.exceptions import ScenarioError
+from procsim.core.interval_merge import merge_intervals
 from procsim.core.job_order import JobOrderInput
+from procsim.core.slice_grid import SliceGrid
 
-from . import main_product_header, constants, product_generator, product_name
+from . import constants, product_generator, product_name
 
 _GENERATOR_PARAMS = [
     ('zip_output', '_zip_output', 'bool')
@@ -40,10 +40,81 @@ class RawProductGeneratorBase(product_generator.ProductGeneratorBase):
         gen, hdr, acq = super().get_params()
         return gen + _GENERATOR_PARAMS, hdr + _HDR_PARAMS, acq + _ACQ_PARAMS
 
+    def _parse_raw_periods(self, input_products: Iterable[JobOrderInput], file_types: Iterable[str]) -> None:
+        '''
+        Store the begin/end time and sensor of the raw products of file_types,
+        which are sliced (step 1), in _raw_periods.
+        '''
+        # Skip non-directory products. These have already been parsed in the superclass.
+        files = [(input.file_type, file) for input in input_products if input.file_type in file_types
+                 for file in input.file_names if self._is_input_product(file)]
+        mphs = self._parse_input_mphs([file for _, file in files], ('begin_position', 'end_position'))
+        for (file_type, _), (mph_file_name, hdr) in zip(files, mphs):
+            if hdr.begin_position is None or hdr.end_position is None:
+                raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
+            start = hdr.begin_position
+            stop = hdr.end_position
+            if self._raw_periods is None:
+                self._raw_periods = []
+            sensor = file_type[-3:].strip('_')
+            self._raw_periods.append((start, stop, sensor))
+
+    def _parse_partial_periods(self, input_products: Iterable[JobOrderInput], file_types: Iterable[str],
+                               key: Callable[[Any], tuple], first_position: str, last_position: str) -> None:
+        '''
+        Merge the partial products of file_types into complete ones (step 2),
+        per key of their headers, see _merge_partial_periods.
+        '''
+        partials = []
+
+        # Skip non-directory products. These have already been parsed in the superclass.
+        files = [file for input in input_products if input.file_type in file_types
+                 for file in input.file_names if self._is_input_product(file)]
+        for mph_file_name, hdr in self._parse_input_mphs(files):
+            if hdr.begin_position is None or hdr.end_position is None:
+                raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
+            positions = (hdr.slice_start_position, hdr.slice_stop_position)
+            partials.append((key(hdr), hdr.begin_position, hdr.end_position, positions))
+
+        self._merge_partial_periods(partials, first_position, last_position)
+
+    def _merge_partial_periods(self, partials: Iterable[tuple], first_position: str, last_position: str) -> None:
+        '''
+        Merge the periods of partial slices per key. Partials are tuples of
+        key, start, stop and (slice start position, slice stop position). If
+        the partials of a key cover one period without gaps, from a partial
+        starting at first_position to one ending at last_position, the period
+        is stored in _key_periods.
+        '''
+        for key, coverage in merge_intervals(partials).items():
+            if coverage.count > 1 and coverage.is_contiguous and \
+                    coverage.first[0] == first_position and coverage.last[1] == last_position:
+                if self._key_periods is None:
+                    self._key_periods = {}
+                self._key_periods[key] = coverage.spans[0]
+
+    def _set_carried_over(self, acq_start: datetime.datetime, apid=None) -> None:
+        '''
+        Set the header fields that are only set when known, and otherwise keep
+        the value of the preceding product: the orbit number of the product(s)
+        starting at acq_start, and the APID. These are set before a product is
+        emitted, in the emitting thread, so that the values carry over between
+        products in the same way if these are created by output workers.
+        '''
+        _, orbit_index = self._orbit_timeline.anx_orbit(acq_start)
+        orbitnum = self._orbit_number(orbit_index)
+        if orbitnum is not None:
+            self._hdr.acquisitions[0].orbit_number = orbitnum
+        if apid is not None:
+            self._hdr.apid = apid
+
     def _create_raw_product(self, dir_name, name_gen):
         self._logger.info('Create {}'.format(dir_name))
         full_dir_name = os.path.join(self._output_path, dir_name)
-        os.makedirs(full_dir_name, exist_ok=True)
+        if self._zip_output:
+            self._start_zip_archive(full_dir_name)
+        else:
+            os.makedirs(full_dir_name, exist_ok=True)
 
         bin_file_name = name_gen.generate_binary_file_name()
         full_bin_file_name = os.path.join(full_dir_name, bin_file_name)
@@ -52,10 +123,7 @@ class RawProductGeneratorBase(product_generator.ProductGeneratorBase):
         if True:  # self._output_type != 'RAW___HKTM':
             mph_file_name = name_gen.generate_mph_file_name()
             full_mph_file_name = os.path.join(full_dir_name, mph_file_name)
-            self._hdr.write(full_mph_file_name)
-
-        if self._zip_output:
-            self.zip_folder(full_dir_name, self._zip_extension)
+            self._write_mph(full_mph_file_name)
 
     def _create_name_generator(self, acq_start, acq_stop):
         name_gen = product_name.ProductName()
@@ -235,86 +303,25 @@ class RWS_EO(RawProductGeneratorBase):
         gen, hdr, acq = super().get_params()
         return gen + self.GENERATOR_PARAMS, hdr + self.HDR_PARAMS, acq + self.ACQ_PARAMS
 
-    def parse_inputs(self, input_products: Iterable[JobOrderInput]) -> bool:  # TODO merge/superclassify with CAL/ANC
+    def parse_inputs(self, input_products: Iterable[JobOrderInput]) -> bool:
         if not super()._parse_inputs(input_products, ignore_missing=True):
             return False
 
         # slice raw products (step1)
-        INPUTS = ['RAW_XS_HR1', 'RAW_XS_HR2', 'RAW_XS_LR_', 'RAW_XS_OBC']
-
-        for input in input_products:
-            if input.file_type in INPUTS:
-                for file in input.file_names:
-                    # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
-                        continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-
-                    hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
-                    if hdr.begin_position is None or hdr.end_position is None:
-                        raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
-                    start = hdr.begin_position
-                    stop = hdr.end_position
-                    if self._raw_periods is None:
-                        self._raw_periods = []
-                    sensor = input.file_type[-3:].strip('_')
-                    self._raw_periods.append((start, stop, sensor))
-
-        # merge partial into complete (step2)
-        key_periods = collections.defaultdict(list)
-
-        INPUTS = ['RWS_H1POBS', 'RWS_H2POBS', 'RWS_LRPOBS']
-
-        for input in input_products:
-            if input.file_type in INPUTS:
-                for file in input.file_names:
-                    # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
-                        continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-                    hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
-                    if hdr.begin_position is None or hdr.end_position is None:
-                        raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
-                    key = (hdr.data_take_id, hdr.sensor_detector, hdr.slice_frame_nr)
-                    start = hdr.begin_position
-                    stop = hdr.end_position
-                    start_pos = hdr.slice_start_position
-                    stop_pos = hdr.slice_stop_position
-                    key_periods[key].append((start, stop, start_pos, stop_pos))
-
-        # check completeness for periods per (cal_id, sensor)
-        for key, periods in key_periods.items():
-            periods = sorted(periods)
-
-            if len(periods) > 1 and periods[0][2] == 'on_grid' and periods[-1][3] == 'on_grid':
-                overlap = True
-
-                for i in range(len(periods)-1):
-                    period_end = periods[i][1]
-                    next_period_start = periods[i+1][0]
-                    if next_period_start > period_end:
-                        overlap = False
-                        break
-
-                if overlap:
-                    if self._key_periods is None:
-                        self._key_periods = {}
-                    self._key_periods[key] = (periods[0][0], periods[-1][1])
+        self._parse_raw_periods(input_products, ['RAW_XS_HR1', 'RAW_XS_HR2', 'RAW_XS_LR_', 'RAW_XS_OBC'])
 
+        # merge partial into complete (step2), per (data take, sensor, slice)
+        self._parse_partial_periods(input_products, ['RWS_H1POBS', 'RWS_H2POBS', 'RWS_LRPOBS'],
+                                    lambda hdr: (hdr.data_take_id, hdr.sensor_detector, hdr.slice_frame_nr),
+                                    'on_grid', 'on_grid')
         return True
 
     def generate_output(self):
         super().generate_output()
+        with self._product_emission():
+            self._generate_products()
 
+    def _generate_products(self):
         # step2
         if self._key_periods is not None:
             output_sensor = {'H1': 'HR1', 'H2': 'HR2', 'LR': 'LR'}[self._output_type[4:6]]
@@ -322,7 +329,7 @@ class RWS_EO(RawProductGeneratorBase):
                 self._hdr.data_take_id, sensor, self._hdr.slice_frame_nr = key
                 if sensor == output_sensor:
                     self._hdr.slice_start_position = self._hdr.slice_stop_position = 'on_grid'
-                    self._create_product(period[0], period[1], 'complete', sensor)
+                    self._emit_raw_product(period[0], period[1], 'complete', sensor)
             return
 
         if 'data_takes' not in self._scenario_config:
@@ -343,14 +350,10 @@ class RWS_EO(RawProductGeneratorBase):
         last_overlap = None
         if raw_period and self._output_type.endswith('IOBS'):
             raw_start, raw_end, _ = raw_period
-            for data_take_config in self._scenario_config['data_takes']:
-                data_take_start = self._time_from_iso(data_take_config['start'])
-                data_take_stop = self._time_from_iso(data_take_config['stop'])
-                if data_take_start < raw_end and data_take_stop > raw_start:
-                    if first_overlap is None or data_take_start < first_overlap:
-                        first_overlap = data_take_start
-                    if last_overlap is None or data_take_start > last_overlap:
-                        last_overlap = data_take_start
+            overlaps = self._get_event_index('data_takes').overlapping(raw_start, raw_end, closed=False)
+            if overlaps:
+                first_overlap = overlaps[0][0]
+                last_overlap = overlaps[-1][0]
 
         # now slice each data-take
         for data_take_config in self._scenario_config['data_takes']:
@@ -360,7 +363,12 @@ class RWS_EO(RawProductGeneratorBase):
             data_take_stop = self._time_from_iso(data_take_config['stop'])
             self._generate_sliced_output(data_take_config, data_take_start, data_take_stop, apid, raw_period, first_overlap, last_overlap)
 
-    def _create_product(self, acq_start: datetime.datetime, acq_stop: datetime.datetime, completeness, for_sensor=None, apid=None):
+    def _emit_raw_product(self, acq_start: datetime.datetime, acq_stop: datetime.datetime, completeness, for_sensor=None, apid=None):
+        # The orbit number and APID are set in this thread, see _set_carried_over.
+        self._set_carried_over(acq_start, apid)
+        self._emit_product(self._create_product, acq_start, acq_stop, completeness, for_sensor)
+
+    def _create_product(self, acq_start: datetime.datetime, acq_stop: datetime.datetime, completeness, for_sensor=None):
         name_gen = self._create_name_generator(acq_start, acq_stop)
         if for_sensor is not None:
             name_gen.downlink_time = acq_start  # TODO why needed for merged partial?
@@ -370,7 +378,7 @@ class RWS_EO(RawProductGeneratorBase):
                 continue
 
             # anx_elapsed
-            anx, orbitnum = self._get_anx_orbit(acq_start)
+            anx, _ = self._get_anx_orbit(acq_start)
             if anx is not None:  # step1
                 self._hdr.anx_elapsed = name_gen.anx_elapsed = (acq_start - anx).total_seconds()
             elif self._hdr.slice_frame_nr is not None:  # step2
@@ -385,61 +393,18 @@ class RWS_EO(RawProductGeneratorBase):
             self._hdr.set_phenomenon_times(acq_start, acq_stop)
             self._hdr.sensor_detector = sensor
             self._hdr.sensor_mode = 'EO'
-            if orbitnum is not None:
-                self._hdr.acquisitions[0].orbit_number = orbitnum
-
-            if apid is not None:
-                self._hdr.apid = apid
-
             self._hdr.completeness_assesment = completeness
 
             self._create_raw_product(dir_name, name_gen)
 
     def _get_slice_edges(self, segment_start: datetime.datetime, segment_end: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
-        # If insufficient ANX are specified, infer the others.
-        anx_list = self._anx_list.copy()
-        while segment_start < anx_list[0]:
-            anx_list.insert(0, anx_list[0] - self._orbital_period)
-        while segment_end > anx_list[-1]:
-            anx_list.append(anx_list[-1] + self._orbital_period)
-
-        # Find ANX list that covers the segment duration.
-        anx_idx_start = bisect.bisect_right(anx_list, segment_start) - 1
-        anx_idx_end = bisect.bisect_left(anx_list, segment_end) + 1
-
-        # Determine the slices that make up the space between ANX.
-        slice_edges = []
-        slices_per_orbit = int(round(self._orbital_period / self._slice_grid_spacing))
-        for anx in anx_list[anx_idx_start:anx_idx_end - 1]:
-            new_slice_edges = [(anx + i * self._slice_grid_spacing, anx + (i + 1) * self._slice_grid_spacing) for i in range(slices_per_orbit)]
-            slice_edges.extend(new_slice_edges)
-
-        # Only keep the slices that overlap the segment.
-        slice_edges = [slice for slice in slice_edges if slice[1] >= segment_start and slice[0] <= segment_end]
-
-        # Merge the first and last slice with their neighbour if they are going to be too short.
-        if slice_edges[0][1] - segment_start < self._slice_minimum_duration:
-            slice_edges[1] = (slice_edges[0][0], slice_edges[1][1])
-            del slice_edges[0]
-        if segment_end - slice_edges[-1][0] < self._slice_minimum_duration:
-            slice_edges[-2] = (slice_edges[-2][0], slice_edges[-1][1])
-            del slice_edges[-1]
-
-        return slice_edges
+        # ANX before the first and after the last known ANX are inferred.
+        grid = SliceGrid(self._anx_list, self._orbital_period, self._slice_grid_spacing)
+        return grid.slice_edges(segment_start, segment_end, self._slice_minimum_duration)
 
     def _get_slice_edges2(self, segment_start, segment_end):
         slice_edges = self._get_slice_edges(segment_start, segment_end)
-        for slice_start, slice_end in slice_edges:
-            # Get the ANX and slice number from the middle of the slice to treat merged slices accurately.
-            slice_middle = slice_start + (slice_end - slice_start) / 2
-            anx, orbitnum = self._get_anx_orbit(slice_middle)
-
-            slice_nr = self._get_slice_frame_nr(slice_middle, self._slice_grid_spacing)
-
-            if anx is None or slice_nr is None:
-                continue
-
-            yield (slice_start, slice_end, anx, slice_nr)
+        yield from self._get_slice_positions(slice_edges, self._slice_grid_spacing)
 
     def _generate_sliced_output(self, data_take_config: dict, segment_start: datetime.datetime,
                                 segment_end: datetime.datetime, apid, raw_period, first_overlap, last_overlap) -> None:
@@ -491,18 +456,18 @@ class RWS_EO(RawProductGeneratorBase):
                             if raw_subslice_end == slice_end:
                                 if segment_start == first_overlap:
                                     self._hdr.slice_stop_position = 'on_grid'
-                                    self._create_product(raw_subslice_start, raw_subslice_end, 'intermediate', apid=apid, for_sensor=raw_sensor)
+                                    self._emit_raw_product(raw_subslice_start, raw_subslice_end, 'intermediate', apid=apid, for_sensor=raw_sensor)
 
                             # raw slice at start of grid frame
                             elif raw_subslice_start == slice_start:
                                 if segment_start == last_overlap:
                                     self._hdr.slice_start_position = 'on_grid'
-                                    self._create_product(raw_subslice_start, raw_subslice_end, 'intermediate', apid=apid, for_sensor=raw_sensor)
+                                    self._emit_raw_product(raw_subslice_start, raw_subslice_end, 'intermediate', apid=apid, for_sensor=raw_sensor)
 
                             # raw slice completely inside grid frame
                             else:
                                 if segment_start == first_overlap and segment_start == last_overlap:
-                                    self._create_product(raw_subslice_start, raw_subslice_end, 'intermediate', apid=apid, for_sensor=raw_sensor)
+                                    self._emit_raw_product(raw_subslice_start, raw_subslice_end, 'intermediate', apid=apid, for_sensor=raw_sensor)
 
                 # complete: covered by raw data (even if 'short')
                 complete = (raw_start <= subslice_start and subslice_end <= raw_end)
@@ -518,7 +483,7 @@ class RWS_EO(RawProductGeneratorBase):
                         else:
                             self._hdr.slice_stop_position = 'on_grid'
 
-                        self._create_product(subslice_start, subslice_end, 'complete', apid=apid, for_sensor=raw_sensor)
+                        self._emit_raw_product(subslice_start, subslice_end, 'complete', apid=apid, for_sensor=raw_sensor)
 
                 # partial: data-take is not covered by raw data
                 elif raw_overlap:
@@ -526,11 +491,11 @@ class RWS_EO(RawProductGeneratorBase):
                         if subslice_start > raw_start:
                             self._hdr.slice_start_position = 'on_grid'
                             self._hdr.slice_stop_position = 'inside_SA'
-                            self._create_product(subslice_start, raw_end, 'partial', apid=apid, for_sensor=raw_sensor)
+                            self._emit_raw_product(subslice_start, raw_end, 'partial', apid=apid, for_sensor=raw_sensor)
                         else:
                             self._hdr.slice_start_position = 'inside_SA'
                             self._hdr.slice_stop_position = 'on_grid'
-                            self._create_product(raw_start, subslice_end, 'partial', apid=apid, for_sensor=raw_sensor)
+                            self._emit_raw_product(raw_start, subslice_end, 'partial', apid=apid, for_sensor=raw_sensor)
 
 #            complete = (segment_start <= slice_start and slice_end <= segment_end)
 #
@@ -640,83 +605,26 @@ class RWS_CAL(RawProductGeneratorBase):
             return False
 
         # slice raw products (step1)
-        INPUTS = ['RAW_XS_HR1', 'RAW_XS_HR2', 'RAW_XS_LR_', 'RAW_XS_OBC']
-
-        for input in input_products:
-            if input.file_type in INPUTS:
-                for file in input.file_names:
-                    # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
-                        continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-                    hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
-                    if hdr.begin_position is None or hdr.end_position is None:
-                        raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
-                    start = hdr.begin_position
-                    stop = hdr.end_position
-                    if self._raw_periods is None:
-                        self._raw_periods = []
-                    sensor = input.file_type[-3:].strip('_')
-                    self._raw_periods.append((start, stop, sensor))
-
-        # merge partial into complete (step2)
-        INPUTS = ['RWS_H1PCAL', 'RWS_H2PCAL', 'RWS_LRPCAL']
-
-        key_periods = collections.defaultdict(list)
-
-        for input in input_products:
-            if input.file_type in INPUTS:
-                for file in input.file_names:
-                    # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
-                        continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-                    hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
-                    if hdr.begin_position is None or hdr.end_position is None:
-                        raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
-                    key = (hdr.calibration_id, hdr.sensor_detector)
-                    start = hdr.begin_position
-                    stop = hdr.end_position
-                    start_pos = hdr.slice_start_position
-                    stop_pos = hdr.slice_stop_position
-                    key_periods[key].append((start, stop, start_pos, stop_pos))
-
-        # check completeness for periods per (cal_id, sensor)
-        for key, periods in key_periods.items():
-            periods = sorted(periods)
-            if len(periods) > 1 and periods[0][2] == 'begin_of_SA' and periods[-1][3] == 'end_of_SA':
-                overlap = True
-                for i in range(len(periods)-1):
-                    period_end = periods[i][1]
-                    next_period_start = periods[i+1][0]
-                    if next_period_start > period_end:
-                        overlap = False
-                        break
-
-                if overlap:
-                    if self._key_periods is None:
-                        self._key_periods = {}
-                    self._key_periods[key] = (periods[0][0], periods[-1][1])
+        self._parse_raw_periods(input_products, ['RAW_XS_HR1', 'RAW_XS_HR2', 'RAW_XS_LR_', 'RAW_XS_OBC'])
 
+        # merge partial into complete (step2), per (cal_id, sensor)
+        self._parse_partial_periods(input_products, ['RWS_H1PCAL', 'RWS_H2PCAL', 'RWS_LRPCAL'],
+                                    lambda hdr: (hdr.calibration_id, hdr.sensor_detector),
+                                    'begin_of_SA', 'end_of_SA')
         return True
 
     def generate_output(self):
         super().generate_output()
+        with self._product_emission():
+            self._generate_products()
 
+    def _generate_products(self):
         if self._key_periods is not None:
             output_sensor = {'H1': 'HR1', 'H2': 'HR2', 'LR': 'LR'}[self._output_type[4:6]]
             for key, period in self._key_periods.items():
                 cal_id, sensor = key
                 if sensor == output_sensor:
-                    self._create_product(cal_id, period[0], period[1], True, 'begin_of_SA', 'end_of_SA', sensor)
+                    self._emit_raw_product(cal_id, period[0], period[1], True, 'begin_of_SA', 'end_of_SA', sensor)
             return
 
         if 'calibration_events' not in self._scenario_config:
@@ -733,26 +641,24 @@ class RWS_CAL(RawProductGeneratorBase):
         else:
             assert False
 
+        # calibration events overlapping raw data
+        raw_start, raw_end, _ = raw_period
+        calibration_events = self._get_event_index('calibration_events').overlapping(raw_start, raw_end, closed=False)
+
         # intermediate products: determine first/last data-take/calibration event overlapping raw data
         first_overlap = None
         last_overlap = None
         if self._output_type.endswith('ICAL'):
-            raw_start, raw_end, _ = raw_period
-            for events_config in (
-                self._scenario_config['data_takes'],
-                self._scenario_config['calibration_events'],
-            ):
-                for event_config in events_config:
-                    event_start = self._time_from_iso(event_config['start'])
-                    event_stop = self._time_from_iso(event_config['stop'])
-                    if event_start < raw_end and event_stop > raw_start:
-                        if first_overlap is None or event_start < first_overlap:
-                            first_overlap = event_start
-                        if last_overlap is None or event_start > last_overlap:
-                            last_overlap = event_start
+            data_takes = self._get_event_index('data_takes').overlapping(raw_start, raw_end, closed=False)
+            for overlaps in (data_takes, calibration_events):
+                if overlaps:
+                    if first_overlap is None or overlaps[0][0] < first_overlap:
+                        first_overlap = overlaps[0][0]
+                    if last_overlap is None or overlaps[-1][0] > last_overlap:
+                        last_overlap = overlaps[-1][0]
 
         # now slice each event
-        for calibration_config in self._scenario_config['calibration_events']:
+        for cal_start, cal_stop, calibration_config in calibration_events:
             self.read_scenario_parameters(calibration_config)
 
             cal_id = calibration_config['calibration_id']
@@ -760,13 +666,6 @@ class RWS_CAL(RawProductGeneratorBase):
             self._hdr.acquisition_subtype = cal_type
 
             apid = calibration_config['apid']
-            cal_start = self._time_from_iso(calibration_config['start'])
-            cal_stop = self._time_from_iso(calibration_config['stop'])
-
-            raw_start, raw_end, _ = raw_period
-            raw_overlap = cal_start < raw_end and cal_stop > raw_start
-            if not raw_overlap:
-                continue
 
             complete = (cal_start >= raw_start and cal_stop <= raw_end)
             intermediate = cal_start in (first_overlap, last_overlap)
@@ -776,16 +675,16 @@ class RWS_CAL(RawProductGeneratorBase):
 
             if complete:
                 if self._output_type.endswith('_CAL'):
-                    self._create_product(cal_id, cal_start, cal_stop, 'complete', slice_start_position,
-                                         slice_stop_position, apid=apid, for_sensor=output_sensor)
+                    self._emit_raw_product(cal_id, cal_start, cal_stop, 'complete', slice_start_position,
+                                           slice_stop_position, apid=apid, for_sensor=output_sensor)
 
                 elif intermediate and self._output_type.endswith('ICAL'):
                     if cal_start == first_overlap:
                         slice_start_position = 'undetermined'
                     else:
                         slice_stop_position = 'undetermined'
-                    self._create_product(cal_id, cal_start, cal_stop, 'intermediate', slice_start_position,
-                                         slice_stop_position, apid=apid, for_sensor=output_sensor)
+                    self._emit_raw_product(cal_id, cal_start, cal_stop, 'intermediate', slice_start_position,
+                                           slice_stop_position, apid=apid, for_sensor=output_sensor)
 
             else:
                 if self._output_type.endswith('PCAL') or (intermediate and self._output_type.endswith('ICAL')):
@@ -809,8 +708,8 @@ class RWS_CAL(RawProductGeneratorBase):
                     cal_start = max(cal_start, raw_start)
                     cal_stop = min(cal_stop, raw_end)
 
-                    self._create_product(cal_id, cal_start, cal_stop, completeness, slice_start_position,
-                                         slice_stop_position, apid=apid, for_sensor=output_sensor)
+                    self._emit_raw_product(cal_id, cal_start, cal_stop, completeness, slice_start_position,
+                                           slice_stop_position, apid=apid, for_sensor=output_sensor)
 
         '''
         for calibration_config in self._scenario_config['calibration_events']:
@@ -856,8 +755,15 @@ class RWS_CAL(RawProductGeneratorBase):
                     self._create_product(cal_id, cal_start, cal_stop, 'partial', slice_start_position, slice_stop_position, apid=apid)
         '''
 
+    def _emit_raw_product(self, cal_id: int, acq_start: datetime.datetime, acq_stop: datetime.datetime,
+                          completeness, slice_start_position, slice_stop_position, for_sensor=None, apid=None):
+        # The orbit number and APID are set in this thread, see _set_carried_over.
+        self._set_carried_over(acq_start, apid)
+        self._emit_product(self._create_product, cal_id, acq_start, acq_stop, completeness, slice_start_position,
+                           slice_stop_position, for_sensor)
+
     def _create_product(self, cal_id: int, acq_start: datetime.datetime, acq_stop: datetime.datetime,
-                        completeness, slice_start_position, slice_stop_position, for_sensor=None, apid=None):
+                        completeness, slice_start_position, slice_stop_position, for_sensor=None):
         name_gen = self._create_name_generator(acq_start, acq_stop)
         if for_sensor is not None:
             name_gen.downlink_time = acq_start  # TODO why needed for merged partial?
@@ -866,13 +772,11 @@ class RWS_CAL(RawProductGeneratorBase):
             if for_sensor is not None and sensor != for_sensor:
                 continue
 
-            anx, orbitnum = self._get_anx_orbit(acq_start)
+            anx, _ = self._get_anx_orbit(acq_start)
             if anx is not None:
                 self._hdr.anx_elapsed = name_gen.anx_elapsed = (acq_start - anx).total_seconds()
             else:
                 self._hdr.anx_elapsed = name_gen.anx_elapsed = 0  # TODO
-            if orbitnum is not None:
-                self._hdr.acquisitions[0].orbit_number = orbitnum
 
             dir_name = name_gen.generate_path_name()
             self._hdr.product_type = self._output_type
@@ -886,8 +790,6 @@ class RWS_CAL(RawProductGeneratorBase):
             self._hdr.calibration_id = cal_id
             self._hdr.sensor_detector = sensor
             self._hdr.sensor_mode = 'CAL'
-            if apid is not None:
-                self._hdr.apid = apid
 
             self._create_raw_product(dir_name, name_gen)
 
@@ -985,84 +887,31 @@ class RWS_ANC(RawProductGeneratorBase):
         else:
             return {'H1': 'HR1', 'H2': 'HR2', 'LR': 'LR'}[self._output_type[4:6]]
 
-    def parse_inputs(self, input_products: Iterable[JobOrderInput]) -> bool:  # TODO merge with CAL, OE parse_inputs when done
+    def parse_inputs(self, input_products: Iterable[JobOrderInput]) -> bool:
         # First copy the metadata from any input product (normally H or V)
         if not super()._parse_inputs(input_products, ignore_missing=True):
             return False
 
         # slice raw products (step1)
-        for input in input_products:
-            if input.file_type in self.INPUTS_STEP1:
-                for file in input.file_names:
-                    # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
-                        continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-                    hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
-                    if hdr.begin_position is None or hdr.end_position is None:
-                        raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
-                    start = hdr.begin_position
-                    stop = hdr.end_position
-                    if self._raw_periods is None:
-                        self._raw_periods = []
-                    sensor = input.file_type[-3:].strip('_')
-                    self._raw_periods.append((start, stop, sensor))
-
-        # merge partial into complete (step2)
-        key_periods = collections.defaultdict(list)
-
-        for input in input_products:
-            if input.file_type in self.INPUTS_STEP2:
-                for file in input.file_names:
-                    # Skip non-directory products. These have already been parsed in the superclass.
-                    if not os.path.isdir(file):
-                        continue
-                    file, _ = os.path.splitext(file)    # Remove possible extension
-                    gen = product_name.ProductName()
-                    gen.parse_path(file)
-                    mph_file_name = os.path.join(file, gen.generate_mph_file_name())
-                    hdr = main_product_header.MainProductHeader()
-                    hdr.parse(mph_file_name)
-                    if hdr.begin_position is None or hdr.end_position is None:
-                        raise ScenarioError('begin/end position not set in {}'.format(mph_file_name))
-                    key = (hdr.apid, hdr.sensor_detector)
-                    start = hdr.begin_position
-                    stop = hdr.end_position
-                    start_pos = hdr.slice_start_position
-                    stop_pos = hdr.slice_stop_position
-                    key_periods[key].append((start, stop, start_pos, stop_pos))
-
-        # check completeness for periods per (apid, sensor) TODO where to get absorbit?
-        for key, periods in key_periods.items():
-            periods = sorted(periods)
-            if len(periods) > 1 and periods[0][2] == 'anx' and periods[-1][3] == 'anx':
-                overlap = True
-                for i in range(len(periods)-1):
-                    period_end = periods[i][1]
-                    next_period_start = periods[i+1][0]
-                    if next_period_start > period_end:
-                        overlap = False
-                        break
-
-                if overlap:
-                    if self._key_periods is None:
-                        self._key_periods = {}
-                    self._key_periods[key] = (periods[0][0], periods[-1][1])
+        self._parse_raw_periods(input_products, self.INPUTS_STEP1)
 
+        # merge partial into complete (step2), per (apid, sensor) TODO where to get absorbit?
+        self._parse_partial_periods(input_products, self.INPUTS_STEP2,
+                                    lambda hdr: (hdr.apid, hdr.sensor_detector),
+                                    'anx', 'anx')
         return True
 
     def generate_output(self):
         super().generate_output()
+        with self._product_emission():
+            self._generate_products()
 
+    def _generate_products(self):
         if self._key_periods is not None:
             for key, period in self._key_periods.items():
                 apid, sensor = key
                 if sensor == self.input_sensor():
-                    self._create_product(apid, period[0], period[1], True, 'anx', 'anx', sensor)
+                    self._emit_raw_product(apid, period[0], period[1], True, 'anx', 'anx', sensor)
             return
 
         if 'anc_events' not in self._scenario_config:
@@ -1086,7 +935,7 @@ class RWS_ANC(RawProductGeneratorBase):
                         # complete overlap of anx-to-anx window
                         if start <= anx[i] and stop >= anx[i+1]:
                             if self._output_type[-4] == '_':
-                                self._create_product(apid, anx[i], anx[i+1], True, 'anx', 'anx', for_sensor=sensor)
+                                self._emit_raw_product(apid, anx[i], anx[i+1], True, 'anx', 'anx', for_sensor=sensor)
 
                         # partial overlap of anx-to-anx window
                         else:
@@ -1105,8 +954,8 @@ class RWS_ANC(RawProductGeneratorBase):
                                     slice_stop_position = 'anx'
                                     slice_stop = anx[i+1]
 
-                                self._create_product(apid, slice_start, slice_stop, False,
-                                                     slice_start_position, slice_stop_position, for_sensor=sensor)
+                                self._emit_raw_product(apid, slice_start, slice_stop, False,
+                                                       slice_start_position, slice_stop_position, for_sensor=sensor)
 
 #            else:
 #                assert False
@@ -1125,6 +974,13 @@ class RWS_ANC(RawProductGeneratorBase):
 #                    elif anx[i] <= stop <= anx[i+1] and self._output_type[-4] == 'P':
 #                        self._create_product(apid, anx[i], stop, False, 'anx', 'inside_orb')
 
+    def _emit_raw_product(self, apid, acq_start: datetime.datetime, acq_stop: datetime.datetime, complete,
+                          slice_start_position, slice_stop_position, for_sensor=None):
+        # The orbit number is set in this thread, see _set_carried_over.
+        self._set_carried_over(acq_start)
+        self._emit_product(self._create_product, apid, acq_start, acq_stop, complete, slice_start_position,
+                           slice_stop_position, for_sensor)
+
     def _create_product(self, apid, acq_start: datetime.datetime, acq_stop: datetime.datetime, complete,
                         slice_start_position, slice_stop_position, for_sensor=None):
         name_gen = self._create_name_generator(acq_start, acq_stop)
@@ -1138,13 +994,11 @@ class RWS_ANC(RawProductGeneratorBase):
             if for_sensor is not None and sensor != for_sensor:
                 continue
 
-            anx, orbitnum = self._get_anx_orbit(acq_start)
+            anx, _ = self._get_anx_orbit(acq_start)
             if anx is not None:
                 self._hdr.anx_elapsed = name_gen.anx_elapsed = (acq_start - anx).total_seconds()
             else:
                 self._hdr.anx_elapsed = name_gen.anx_elapsed = 0  # TODO
-            if orbitnum is not None:
-                self._hdr.acquisitions[0].orbit_number = orbitnum
 
             dir_name = name_gen.generate_path_name()
 
@@ -1,15 +1,19 @@
 '''
 Copyright (C) 2023 S[&]T, The Netherlands.
 '''
+import copy
 import datetime
+import io
 import os
 import shutil
 import tempfile
 import unittest
 from pathlib import Path
 from typing import List, Set, Tuple, Type, Union
+from unittest import mock
 from xml.etree import ElementTree as et
 
+from procsim.flex import product_types
 from procsim.flex.main_product_header import (MainProductHeader, opt, eop,
                                               om, ows, xlink)
 
@@ -170,6 +174,50 @@ class MphTest(unittest.TestCase):
         self.assertEqual(mph, mph2)
         self.assertEqual(mph.acquisitions, mph2.acquisitions)
 
+    def testParseFields(self):
+        filename, _ = get_l0_test_mph()
+        ref_mph = MainProductHeader()
+        ref_mph.parse(os.path.join(THIS_DIR, filename))
+        for fields in [['begin_position', 'end_position'], ['data_take_id', 'slice_frame_nr'], ['product_type', 'products']]:
+            mph = MainProductHeader()
+            mph.parse(os.path.join(THIS_DIR, filename), fields)
+            for field in fields:
+                self.assertEqual(getattr(mph, field), getattr(ref_mph, field))
+        with self.assertRaises(ValueError):
+            mph.parse(os.path.join(THIS_DIR, filename), ['unknown'])
+
+    @mock.patch.dict(os.environ, {'CURRENT_UTC_DATETIME': '20230112T140940'})
+    def testWriteTemplate(self):
+        # Golden test: the template output is identical to the element tree
+        # output, and to the checked-in MPHs.
+        _, ref_mph = get_l0_test_mph()
+        ref_mph.acquisition_date = datetime.datetime(2021, 1, 1, 1, 2, 3, 456789, tzinfo=datetime.timezone.utc)
+        ref_mph.acquisition_station = 'KSE'
+        special_mph = copy.deepcopy(ref_mph)
+        special_mph.products.append({'file_name': './a&b<c>"d.dat', 'size': 12, 'checksums': {'MD5': 'abc', 'SHA-256': 'def'}})
+        special_mph.acquisitions.append(copy.deepcopy(special_mph.acquisitions[0]))
+        special_mph.auxiliary_ds_file_names = []
+        special_mph.processing_centre_code = 'E\tS\nR'
+        for mph in [ref_mph, special_mph]:
+            for product_type in product_types.PRODUCT_TYPES:
+                mph.product_type = product_type.type
+                for checksums in (False, True):
+                    template_file, tree_file = io.BytesIO(), io.BytesIO()
+                    mph.write(template_file, checksums)
+                    mph.write_element_tree(tree_file, checksums)
+                    self.assertEqual(template_file.getvalue(), tree_file.getvalue(), product_type.type)
+
+        # MPHs written by the element tree writer before templates were
+        # introduced, named <product type>[_special].xml.
+        golden_dir = os.path.join(THIS_DIR, 'golden_mph')
+        for file_name in sorted(os.listdir(golden_dir)):
+            mph = special_mph if file_name.endswith('_special.xml') else ref_mph
+            mph.product_type = file_name[:10].upper()
+            template_file = io.BytesIO()
+            mph.write(template_file)
+            with open(os.path.join(golden_dir, file_name), 'rb') as f:
+                self.assertEqual(template_file.getvalue(), f.read(), file_name)
+
     '''
     def testFilesInMPHFromRAW(self):
         raw_generator_classes: List[Type[RawProductGeneratorBase]] = [RAW_xxx_10, RAWSxxx_10]